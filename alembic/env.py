@@ -17,7 +17,10 @@ from alembic import context
 
 from cpvt_database_models.database.base import Base
 from cpvt_database_models.settings import get_settings
-from cpvt_database_models import models  # noqa: F401, F403
+from cpvt_database_models.models import load_models
+
+# the models are imported lazily, register all their tables
+load_models()
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
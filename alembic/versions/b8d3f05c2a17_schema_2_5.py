@@ -0,0 +1,114 @@
+"""schema_0.2.5
+
+Revision ID: b8d3f05c2a17
+Revises: e4b1f7a93c62
+Create Date: 2026-10-18 19:02:11.318540
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "b8d3f05c2a17"
+down_revision: Union[str, None] = "e4b1f7a93c62"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# a copy of the tables and triggers in the variant_view_dirty model at this
+# revision
+TRACKED_TABLES = (
+    ("variant", "variant_id", "variant"),
+    ("variant_clinvar_info", "variant_id", "variant"),
+    ("variants_dataset_to_variant", "variant_id", "variant"),
+    ("clinvar_variant_linked_condition", "variant_id", "variant"),
+    ("individual_variant", "variant_id", "variant"),
+    ("individual_condition", "individual_id", "individual"),
+    ("treatment_record", "patient_id", "individual"),
+    ("sequence_variant", "sequence_variant_id", "sequence_variant"),
+    ("protein_consequence", "protein_consequence_id", "sequence_variant"),
+)
+
+TRIGGERS_DDL = (
+    """
+    CREATE OR REPLACE FUNCTION variant_view_mark_dirty() RETURNS TRIGGER
+        LANGUAGE plpgsql AS
+    $$
+    DECLARE
+        key_column TEXT      := TG_ARGV[0];
+        key_kind   TEXT      := TG_ARGV[1];
+        keys       INTEGER[] := ARRAY []::INTEGER[];
+    BEGIN
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            keys := keys || (to_jsonb(NEW) ->> key_column)::INTEGER;
+        END IF;
+
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            keys := keys || (to_jsonb(OLD) ->> key_column)::INTEGER;
+        END IF;
+
+        INSERT INTO variant_view_dirty (variant_id)
+        SELECT DISTINCT dirty.variant_id
+        FROM (SELECT unnest(keys) AS variant_id
+              WHERE key_kind = 'variant'
+              UNION ALL
+              SELECT iv.variant_id
+              FROM individual_variant iv
+              WHERE key_kind = 'individual'
+                AND iv.individual_id = ANY (keys)
+              UNION ALL
+              SELECT v.variant_id
+              FROM variant v
+              WHERE key_kind = 'sequence_variant'
+                AND v.sequence_variant_id = ANY (keys)) dirty
+        WHERE dirty.variant_id IS NOT NULL
+        ON CONFLICT (variant_id) DO NOTHING;
+
+        RETURN NULL;
+    END;
+    $$
+    """,
+    *(
+        f"""
+    CREATE OR REPLACE TRIGGER variant_view_dirty_trg
+        AFTER INSERT OR UPDATE OR DELETE
+        ON {table}
+        FOR EACH ROW
+    EXECUTE FUNCTION variant_view_mark_dirty('{key_column}', '{key_kind}')
+    """
+        for table, key_column, key_kind in TRACKED_TABLES
+    ),
+)
+
+
+def upgrade() -> None:
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_table(
+        "variant_view_dirty",
+        sa.Column("variant_id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column(
+            "marked_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("variant_id", name=op.f("pk_variant_view_dirty")),
+        comment="The variants whose rows in variant_view_t are out of date. Maintained by triggers, emptied by refresh_variant_view_incremental.",
+    )
+    # ### end Alembic commands ###
+
+    for statement in TRIGGERS_DDL:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    for table, _, _ in TRACKED_TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS variant_view_dirty_trg ON {table}")
+
+    op.execute("DROP FUNCTION IF EXISTS variant_view_mark_dirty()")
+
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_table("variant_view_dirty")
+    # ### end Alembic commands ###
@@ -0,0 +1,191 @@
+"""schema_0.2.4
+
+Revision ID: e4b1f7a93c62
+Revises: 9c41d2a7e3b6
+Create Date: 2026-10-18 16:21:37.645018
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "e4b1f7a93c62"
+down_revision: Union[str, None] = "9c41d2a7e3b6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# a copy of the triggers in the variant_individual_count model at this revision
+TRIGGERS_DDL = (
+    """
+    CREATE OR REPLACE FUNCTION variant_individual_count_update() RETURNS TRIGGER
+        LANGUAGE plpgsql AS
+    $$
+    BEGIN
+        IF TG_TABLE_NAME = 'variant' THEN
+            INSERT INTO variant_individual_count (variant_id)
+            SELECT variant_id
+            FROM new_rows
+            ON CONFLICT (variant_id) DO NOTHING;
+        ELSIF TG_OP = 'TRUNCATE' THEN
+            UPDATE variant_individual_count
+            SET num_individuals = 0
+            WHERE num_individuals <> 0;
+        ELSIF TG_OP = 'INSERT' THEN
+            UPDATE variant_individual_count c
+            SET num_individuals = c.num_individuals + d.delta
+            FROM (SELECT variant_id, COUNT(*) AS delta
+                  FROM new_rows
+                  GROUP BY variant_id) d
+            WHERE c.variant_id = d.variant_id;
+        ELSIF TG_OP = 'DELETE' THEN
+            UPDATE variant_individual_count c
+            SET num_individuals = c.num_individuals - d.delta
+            FROM (SELECT variant_id, COUNT(*) AS delta
+                  FROM old_rows
+                  GROUP BY variant_id) d
+            WHERE c.variant_id = d.variant_id;
+        ELSE
+            -- rows moved to another variant
+            UPDATE variant_individual_count c
+            SET num_individuals = c.num_individuals + d.delta
+            FROM (SELECT variant_id, SUM(delta) AS delta
+                  FROM (SELECT variant_id, 1 AS delta
+                        FROM new_rows
+                        UNION ALL
+                        SELECT variant_id, -1 AS delta
+                        FROM old_rows) changes
+                  GROUP BY variant_id) d
+            WHERE c.variant_id = d.variant_id
+              AND d.delta <> 0;
+        END IF;
+
+        RETURN NULL;
+    END;
+    $$
+    """,
+    """
+    CREATE OR REPLACE TRIGGER variant_individual_count_insert_trg
+        AFTER INSERT
+        ON variant
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT
+    EXECUTE FUNCTION variant_individual_count_update()
+    """,
+    """
+    CREATE OR REPLACE TRIGGER variant_individual_count_insert_trg
+        AFTER INSERT
+        ON individual_variant
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT
+    EXECUTE FUNCTION variant_individual_count_update()
+    """,
+    """
+    CREATE OR REPLACE TRIGGER variant_individual_count_update_trg
+        AFTER UPDATE
+        ON individual_variant
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT
+    EXECUTE FUNCTION variant_individual_count_update()
+    """,
+    """
+    CREATE OR REPLACE TRIGGER variant_individual_count_delete_trg
+        AFTER DELETE
+        ON individual_variant
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT
+    EXECUTE FUNCTION variant_individual_count_update()
+    """,
+    """
+    CREATE OR REPLACE TRIGGER variant_individual_count_truncate_trg
+        AFTER TRUNCATE
+        ON individual_variant
+        FOR EACH STATEMENT
+    EXECUTE FUNCTION variant_individual_count_update()
+    """,
+)
+
+BACKFILL_SQL = """
+    INSERT INTO variant_individual_count (variant_id, num_individuals)
+    SELECT variant.variant_id,
+           COUNT(individual_variant.individual_id)
+    FROM variant
+             LEFT JOIN individual_variant
+                       ON variant.variant_id = individual_variant.variant_id
+    GROUP BY variant.variant_id
+    ON CONFLICT (variant_id) DO UPDATE SET num_individuals = EXCLUDED.num_individuals
+    """
+
+# variant_num_individuals_v before this revision, cast to the column type of
+# variant_individual_count so the views that select from it can stay
+AGGREGATE_VIEW_SQL = """
+    CREATE OR REPLACE VIEW variant_num_individuals_v AS
+    SELECT variant.variant_id,
+           CAST(COUNT(DISTINCT individual_id) AS INTEGER) AS num_individuals
+    FROM variant
+             LEFT JOIN individual_variant
+                       ON variant.variant_id = individual_variant.variant_id
+    GROUP BY variant.variant_id
+    """
+
+
+def upgrade() -> None:
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_table(
+        "variant_individual_count",
+        sa.Column("variant_id", sa.Integer(), nullable=False),
+        sa.Column(
+            "num_individuals",
+            sa.Integer(),
+            server_default="0",
+            nullable=False,
+            comment="The number of rows in individual_variant with the variant",
+        ),
+        sa.ForeignKeyConstraint(
+            ["variant_id"],
+            ["variant.variant_id"],
+            name=op.f("fk_variant_individual_count_variant_id_variant"),
+            onupdate="CASCADE",
+            ondelete="CASCADE",
+        ),
+        sa.PrimaryKeyConstraint("variant_id", name=op.f("pk_variant_individual_count")),
+        comment="The number of individuals with each variant. Maintained by triggers, do not write to it.",
+    )
+    op.create_index(
+        op.f("ix_variant_individual_count_num_individuals"),
+        "variant_individual_count",
+        ["num_individuals"],
+        unique=False,
+    )
+    # ### end Alembic commands ###
+
+    for statement in TRIGGERS_DDL:
+        op.execute(statement)
+
+    op.execute(BACKFILL_SQL)
+
+
+def downgrade() -> None:
+    # the views (see add_views) select from variant_individual_count
+    if op.get_bind().scalar(sa.text("SELECT to_regclass('variant_num_individuals_v')")):
+        op.execute(AGGREGATE_VIEW_SQL)
+
+    op.execute("DROP TRIGGER IF EXISTS variant_individual_count_insert_trg ON variant")
+
+    for trigger in ("insert", "update", "delete", "truncate"):
+        op.execute(
+            f"DROP TRIGGER IF EXISTS variant_individual_count_{trigger}_trg "
+            f"ON individual_variant"
+        )
+
+    op.execute("DROP FUNCTION IF EXISTS variant_individual_count_update()")
+
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_index(
+        op.f("ix_variant_individual_count_num_individuals"),
+        table_name="variant_individual_count",
+    )
+    op.drop_table("variant_individual_count")
+    # ### end Alembic commands ###
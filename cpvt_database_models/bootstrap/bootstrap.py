@@ -1,57 +1,255 @@
 import asyncio
+import contextlib
+import gzip
+import hashlib
 import os.path
 import sys
+import time
+import urllib.parse
+import urllib.request
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
+from typing import Any, BinaryIO, NamedTuple
 
 import sqlalchemy as sa
 
-import pandas as pd
 import argparse
 
+from cpvt_database_models.bootstrap.manifest import (
+    BootstrapManifest,
+    TableArtifact,
+    file_sha1,
+    text_sha1,
+)
 
-def get_uta(*, version: str, dl_url: str, data_dir: str):
+_PANDAS_ERROR_MESSAGE = (
+    "Extracting the UTA tables with pandas requires that the pandas library "
+    "is installed. In order to ensure it is installed, please run the "
+    "following command:\n"
+    "'pip install cpvt_database_models[bootstrap] --index-url https://gitlab.com/api/v4/projects/60969577/packages/pypi/simple'\n"
+    "Or leave out --use_pandas to stream the tables with COPY instead."
+)
+
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+class UtaDump(NamedTuple):
+    """
+    Where to read the gzipped UTA dump from.
+    """
+
+    # local dump, or where to cache the dump while it is downloaded
+    path: str
+    # set if the dump still has to be downloaded
+    url: str | None
+    # expected sha1 of the gzipped dump (None skips the check)
+    sha1: str | None
+
+
+def _local_path(url: str) -> str | None:
+    """
+    The local path of a file:// url or plain path. None for remote urls.
+    """
+    parsed = urllib.parse.urlparse(url)
+
+    if parsed.scheme == "file":
+        return urllib.request.url2pathname(parsed.path)
+
+    if parsed.scheme in ("http", "https", "ftp"):
+        return None
+
+    return url
+
+
+def _read_sha1(path_or_url: str) -> str | None:
+    local_path = _local_path(path_or_url)
+
+    if local_path is not None:
+        if not os.path.exists(local_path):
+            return None
+
+        with open(local_path) as f:
+            return f.read().split()[0]
+
+    with urllib.request.urlopen(path_or_url) as response:
+        sha1: bytes = response.read()
+
+    return sha1.decode().split()[0]
+
+
+def get_uta(*, version: str, dl_url: str, data_dir: str) -> UtaDump:
+    """
+    Find the UTA dump - a dump already downloaded into data_dir, a local
+    directory / file:// mirror, or the dump to download from dl_url.
+
+    Nothing is downloaded here, the dump is streamed by split_uta_dump.
+    """
     print("Checking for UTA database")
 
-    # Check if UTA database exists
-    if os.path.exists(os.path.join(data_dir, f"{version}.pgd.gz")) or os.path.exists(
-        os.path.join(data_dir, f"{version}.sql.gz")
-    ):
-        print("UTA database found, skipping download")
-        return
+    # .sql.gz is the name older versions of this script renamed the dump to
+    for filename in [f"{version}.pgd.gz", f"{version}.sql.gz"]:
+        path = os.path.join(data_dir, filename)
 
-    print("UTA database not found, downloading")
-    # Download UTA database
+        if os.path.exists(path):
+            print("UTA database found, skipping download")
+            return UtaDump(path=path, url=None, sha1=_read_sha1(f"{path}.sha1"))
 
-    for f in ["", ".sha1"]:
-        filename = f"{version}.pgd.gz{f}"
+    url = f"{dl_url.rstrip('/')}/{version}.pgd.gz"
+    local_path = _local_path(url)
 
-        fullpath_name = os.path.join(data_dir, filename)
+    if local_path is not None:
+        print(f"Reading UTA database from {local_path}")
+        return UtaDump(path=local_path, url=None, sha1=_read_sha1(f"{url}.sha1"))
 
-        os.system(
-            f"cd {data_dir} && test -e {os.path.join(fullpath_name)} || curl -O {dl_url}/{filename}"
-        )
+    print("UTA database not found, it will be downloaded")
 
+    return UtaDump(
+        path=os.path.join(data_dir, f"{version}.pgd.gz"),
+        url=url,
+        sha1=_read_sha1(f"{url}.sha1"),
+    )
 
-def rename_and_unzip(*, version: str, data_dir: str):
-    print("Renaming the UTA dump to .sql.gz")
 
-    # rename {version}.pgd.gz to {version}.sql.gz if it exists otherwise skip
-    if os.path.exists(os.path.join(data_dir, f"{version}.pgd.gz")):
-        os.rename(
-            os.path.join(data_dir, f"{version}.pgd.gz"),
-            os.path.join(data_dir, f"{version}.sql.gz"),
-        )
+class _HashingReader:
+    """
+    Updates a sha1 with every byte read from a binary file, and optionally
+    copies the bytes into a cache file.
+    """
+
+    def __init__(self, f: BinaryIO, cache: BinaryIO | None = None):
+        self._f = f
+        self._cache = cache
+        self.sha1 = hashlib.sha1()
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._f.read(size)
+        self.sha1.update(data)
+
+        if self._cache is not None:
+            self._cache.write(data)
+
+        return data
+
+    def drain(self):
+        while self.read(_CHUNK_SIZE):
+            pass
+
+
+def _split_lines(lines: Iterable[bytes], *, head: BinaryIO, tail: BinaryIO):
+    """
+    Everything before the first COPY command goes into head, and everything
+    from the first ALTER TABLE after the last COPY data block into tail.
+    The COPY data is skipped.
+    """
+    lines = iter(lines)
+
+    for line in lines:
+        if b"COPY" in line:
+            break
+        head.write(line)
     else:
-        print("No .pgd.gz file found, skipping renaming")
+        return
+
+    in_copy = line.startswith(b"COPY ")
+    tail_lines: list[bytes] = []
+
+    for line in lines:
+        if in_copy:
+            in_copy = line.rstrip(b"\r\n") != b"\\."
+        elif line.startswith(b"COPY "):
+            in_copy = True
+            tail_lines.clear()
+        elif tail_lines or line.startswith(b"ALTER TABLE "):
+            tail_lines.append(line)
+
+    tail.writelines(tail_lines)
+
+
+def split_uta_dump(dump: UtaDump, *, sql_dir: str) -> str:
+    """
+    Stream the gzipped UTA dump once - downloading it if needed, checking
+    its sha1 and writing 02_schema_head.sql and 04_schema.sql. The
+    uncompressed dump is never written to disk.
+
+    Returns the sha1 of the gzipped dump.
+    """
+    print("Extracting the schema head and tail of the UTA database dump")
+
+    head_path = os.path.join(sql_dir, "02_schema_head.sql")
+    tail_path = os.path.join(sql_dir, "04_schema.sql")
+    cache_path = f"{dump.path}.part"
+
+    with contextlib.ExitStack() as stack:
+        if dump.url is not None:
+            print(f"Downloading UTA database from {dump.url}")
+            source = stack.enter_context(urllib.request.urlopen(dump.url))
+            cache = stack.enter_context(open(cache_path, "wb"))
+        else:
+            source = stack.enter_context(open(dump.path, "rb"))
+            cache = None
+
+        reader = _HashingReader(source, cache)
+        head = stack.enter_context(open(f"{head_path}.part", "wb"))
+        tail = stack.enter_context(open(f"{tail_path}.part", "wb"))
+
+        with gzip.GzipFile(fileobj=reader, mode="rb") as gz:  # type: ignore[call-overload]
+            _split_lines(gz, head=head, tail=tail)
+
+        # the rest of the gzip stream still counts towards the sha1
+        reader.drain()
+
+    if dump.sha1 is None:
+        print("No .sha1 checksum found for the UTA dump, skipping verification")
+    elif reader.sha1.hexdigest() != dump.sha1:
+        for path in [f"{head_path}.part", f"{tail_path}.part", cache_path]:
+            if os.path.exists(path):
+                os.remove(path)
+
+        raise ValueError(
+            f"sha1 checksum mismatch for the UTA dump {dump.url or dump.path}: "
+            f"expected {dump.sha1}, got {reader.sha1.hexdigest()}"
+        )
+
+    os.replace(f"{head_path}.part", head_path)
+    os.replace(f"{tail_path}.part", tail_path)
+
+    if dump.url is not None:
+        os.replace(cache_path, dump.path)
+
+        if dump.sha1 is not None:
+            with open(f"{dump.path}.sha1", "w") as f:
+                f.write(f"{dump.sha1}  {os.path.basename(dump.path)}\n")
+
+    return reader.sha1.hexdigest()
+
 
-    print("Unzipping the UTA dump if not already unzipped")
+def setup_schema(dump: UtaDump, *, version: str, sql_dir: str, manifest_path: str):
+    """
+    Split the UTA dump into the schema files, unless the manifest shows they
+    were already split from a dump with the same sha1.
+    """
+    manifest = BootstrapManifest.load(manifest_path, version=version)
+    schema_paths = [
+        os.path.join(sql_dir, "02_schema_head.sql"),
+        os.path.join(sql_dir, "04_schema.sql"),
+    ]
 
-    # Unzip the UTA dump
-    if os.path.exists(os.path.join(data_dir, f"{version}.sql")):
-        print("UTA dump already unzipped, skipping")
+    if (
+        dump.sha1 is not None
+        and manifest.dump_sha1 == dump.sha1
+        and all(manifest.schema_file_valid(path) for path in schema_paths)
+    ):
+        print("UTA schema files are up to date, skipping")
         return
 
-    os.system(f"cd {data_dir} && gunzip {os.path.join(data_dir, f'{version}.sql.gz')}")
+    manifest.dump_sha1 = split_uta_dump(dump, sql_dir=sql_dir)
+
+    for path in schema_paths:
+        manifest.record_schema_file(path)
+
+    manifest.save(manifest_path)
 
 
 def strip_whitespace_lines(string: str) -> str:
@@ -75,301 +273,585 @@ def setup_roles(*, sql_dir: str):
         )
 
 
-def setup_schema_head(*, sql_dir: str, version: str):
-    print("Extracting all sql commands before the first COPY command")
+class UtaTable(NamedTuple):
+    """
+    A UTA table to copy into the reduced database.
+    """
 
-    with open(os.path.join(sql_dir, "..", f"{version}.sql"), "r") as f:
-        with open(os.path.join(sql_dir, "02_schema_head.sql"), "w") as f2:
-            for line in f:
-                if "COPY" in line:
-                    break
-                f2.write(line)
+    table: str
+    csv_name: str
+    query: str
+    # column dtypes when reading the table with pandas
+    dtype: dict[str, Any]
 
 
-def add_data(*, version: str, sql_dir: str, genes: list[str]):
-    print(f"Adding selected data from {genes} to the database")
+class UtaClosure(NamedTuple):
+    """
+    The ids of every UTA row that belongs to a set of genes.
+    """
 
-    all_genes = genes.__str__().replace("[", "(").replace("]", ")")
+    # transcripts of the genes
+    tx_acs: frozenset[str]
+    # protein and reference sequence (e.g. NC_) accessions of the transcripts
+    other_acs: frozenset[str]
+    exon_set_ids: frozenset[int]
+    exon_ids: frozenset[int]
+    seq_ids: frozenset[str]
 
-    os.makedirs(os.path.join(sql_dir, "data"), exist_ok=True)
+    @property
+    def acs(self) -> frozenset[str]:
+        return self.tx_acs | self.other_acs
 
-    with open(os.path.join(sql_dir, "03_data.sql"), "w") as f:
-        with get_engine() as engine:
-            pd.read_sql(
-                f"""
-                SELECT o.origin_id, o.name, o.descr, o.updated, o.url, o.url_ac_fmt
-                FROM {version}.origin o
-                """,
-                engine,
-                dtype={
-                    "origin_id": "Int64",
-                    "name": str,
-                    "descr": str,
-                    "updated": str,
-                    "url": str,
-                    "url_ac_fmt": str,
-                },
-            ).to_csv(os.path.join(sql_dir, "data", "origin.csv"), index=False)
-
-            pd.read_sql(
-                f"""
-                SELECT m.key, m.value
-                FROM {version}.meta m
-                """,
-                engine,
-                dtype={"key": str, "value": str},
-            ).to_csv(os.path.join(sql_dir, "data", "meta.csv"), index=False)
+    def difference(self, other: "UtaClosure") -> "UtaClosure":
+        """
+        The ids in this closure that are not in the other closure.
+        """
+        return UtaClosure(
+            tx_acs=self.tx_acs - other.tx_acs,
+            other_acs=self.other_acs - other.other_acs,
+            exon_set_ids=self.exon_set_ids - other.exon_set_ids,
+            exon_ids=self.exon_ids - other.exon_ids,
+            seq_ids=self.seq_ids - other.seq_ids,
+        )
 
-            pd.read_sql(
-                f"""
-                SELECT g.hgnc, g.maploc, g.descr, g.summary, g.aliases, g.added
-                FROM {version}.gene g
-                WHERE g.hgnc IN {all_genes}
-                """,
-                engine,
-                dtype={
-                    "hgnc": str,
-                    "maploc": str,
-                    "descr": str,
-                    "summary": str,
-                    "aliases": str,
-                    "added": str,
-                },
-            ).to_csv(os.path.join(sql_dir, "data", "genes.csv"), index=False)
-
-            protein_ac_subquery = f"""
-            SELECT pro_ac AS ac
-            FROM {version}.associated_accessions
-            WHERE tx_ac IN (
-                SELECT ac
-                FROM {version}.transcript
-                WHERE hgnc IN {all_genes}
-            )
+
+def resolve_uta_closure(
+    engine: sa.Engine, *, version: str, genes: list[str]
+) -> UtaClosure:
+    """
+    Resolve the gene -> transcript -> accession -> seq_id closure once, so
+    the table queries don't have to re-evaluate the nested subqueries.
+    """
+
+    def ids(connection: sa.Connection, query: str, **params) -> frozenset:
+        stmt = sa.text(query).bindparams(
+            *[sa.bindparam(name, expanding=True) for name in params]
+        )
+        return frozenset(connection.execute(stmt, params).scalars())
+
+    with engine.connect() as connection:
+        tx_acs = ids(
+            connection,
+            f"SELECT ac FROM {version}.transcript WHERE hgnc IN :genes",
+            genes=genes,
+        )
+        other_acs = ids(
+            connection,
+            f"""
+            SELECT pro_ac FROM {version}.associated_accessions
+            WHERE tx_ac IN :tx_acs
             UNION
-            SELECT alt_ac AS ac
-            FROM {version}.exon_set
-            WHERE tx_ac IN (
-                SELECT ac
-                FROM {version}.transcript
-                WHERE hgnc IN {all_genes}
-            )
-            """
+            SELECT alt_ac FROM {version}.exon_set
+            WHERE tx_ac IN :tx_acs
+            """,
+            tx_acs=list(tx_acs),
+        )
+        exon_set_ids = ids(
+            connection,
+            f"SELECT exon_set_id FROM {version}.exon_set WHERE tx_ac IN :tx_acs",
+            tx_acs=list(tx_acs),
+        )
+        exon_ids = ids(
+            connection,
+            f"SELECT exon_id FROM {version}.exon WHERE exon_set_id IN :exon_set_ids",
+            exon_set_ids=list(exon_set_ids),
+        )
+        seq_ids = ids(
+            connection,
+            f"SELECT seq_id FROM {version}.seq_anno WHERE ac IN :acs",
+            acs=list(tx_acs | other_acs),
+        )
 
-            pd.read_sql(
-                f"""
-                SELECT t.ac, t.origin_id, t.hgnc, t.cds_start_i, t.cds_end_i, t.cds_md5, t.added
-                FROM {version}.transcript t
-                WHERE hgnc in {all_genes}
-                OR ac IN (
-                    {protein_ac_subquery}
-                )
-                """,
-                engine,
-                dtype={
-                    "ac": str,
-                    "origin_id": "Int64",
-                    "hgnc": str,
-                    "cds_start_i": "Int64",
-                    "cds_end_i": "Int64",
-                    "cds_md5": str,
-                    "added": str,
-                },
-            ).to_csv(os.path.join(sql_dir, "data", "transcripts.csv"), index=False)
-
-            pd.read_sql(
-                f"""
-                SELECT s.seq_anno_id, s.seq_id, s.origin_id, s.ac, s.descr, s.added
-                FROM {version}.seq_anno s
-                WHERE ac IN (SELECT ac FROM {version}.transcript WHERE hgnc IN {all_genes})
-                OR ac IN (
-                    {protein_ac_subquery}
-                )
-                """,
-                engine,
-                dtype={
-                    "seq_anno_id": "Int64",
-                    "seq_id": str,
-                    "origin_id": "Int64",
-                    "ac": str,
-                    "descr": str,
-                    "added": str,
-                },
-            ).to_csv(os.path.join(sql_dir, "data", "seq_anno.csv"), index=False)
-
-            # psql-uta "select seq_id from seq where seq_id in (select seq_id from seq_anno where ac in (select ac from transcript where hgnc in $PG_GENES));" >download/seq.tsv
-            pd.read_sql(
-                f"""
-                SELECT s.seq_id, s.len, s.seq
-                FROM {version}.seq s
-                WHERE seq_id IN (
-                    SELECT seq_id
-                    FROM {version}.seq_anno
-                    WHERE ac IN (
-                        SELECT ac
-                        FROM {version}.transcript
-                        WHERE hgnc IN {all_genes}
-                    ) OR ac IN (
-                        {protein_ac_subquery}
-                    )
-                )
-                """,
-                engine,
-                dtype={"seq_id": str, "len": "Int64", "seq": str},
-            ).to_csv(os.path.join(sql_dir, "data", "seq.csv"), index=False)
+    return UtaClosure(
+        tx_acs=tx_acs,
+        other_acs=other_acs,
+        exon_set_ids=exon_set_ids,
+        exon_ids=exon_ids,
+        seq_ids=seq_ids,
+    )
 
-            # psql-uta "select associated_accession_id from associated_accessions where tx_ac in (select ac from transcript where hgnc in $PG_GENES);" >download/associated_accessions.tsv
-            pd.read_sql(
-                f"""
-                SELECT a.associated_accession_id, a.tx_ac, a.pro_ac, a.origin, a.added
-                FROM {version}.associated_accessions a
-                WHERE tx_ac IN (
-                    SELECT ac
-                    FROM {version}.transcript
-                    WHERE hgnc IN {all_genes}
+
+def sql_list(values: Iterable[str | int]) -> str:
+    """
+    Render values as a sorted SQL list literal for an IN clause. COPY can't
+    take bind parameters, so the resolved ids are inlined.
+    """
+    literals = [
+        str(value)
+        if isinstance(value, int)
+        else "'" + str(value).replace("'", "''") + "'"
+        for value in sorted(values)
+    ]
+
+    # IN (NULL) never matches, but keeps the query valid
+    return f"({', '.join(literals) or 'NULL'})"
+
+
+def get_uta_tables(
+    *, version: str, genes: list[str], closure: UtaClosure
+) -> list[UtaTable]:
+    """
+    The SELECT queries for the rows of every UTA table that belong to the
+    genes, in the order they should be loaded.
+    """
+    all_genes = sql_list(genes)
+    tx_acs = sql_list(closure.tx_acs)
+    acs = sql_list(closure.acs)
+    exon_ids = sql_list(closure.exon_ids)
+
+    return [
+        UtaTable(
+            table="meta",
+            csv_name="meta.csv",
+            query=f"""
+            SELECT m.key, m.value
+            FROM {version}.meta m
+            """,
+            dtype={"key": str, "value": str},
+        ),
+        UtaTable(
+            table="origin",
+            csv_name="origin.csv",
+            query=f"""
+            SELECT o.origin_id, o.name, o.descr, o.updated, o.url, o.url_ac_fmt
+            FROM {version}.origin o
+            """,
+            dtype={
+                "origin_id": "Int64",
+                "name": str,
+                "descr": str,
+                "updated": str,
+                "url": str,
+                "url_ac_fmt": str,
+            },
+        ),
+        UtaTable(
+            table="gene",
+            csv_name="genes.csv",
+            query=f"""
+            SELECT g.hgnc, g.maploc, g.descr, g.summary, g.aliases, g.added
+            FROM {version}.gene g
+            WHERE g.hgnc IN {all_genes}
+            """,
+            dtype={
+                "hgnc": str,
+                "maploc": str,
+                "descr": str,
+                "summary": str,
+                "aliases": str,
+                "added": str,
+            },
+        ),
+        UtaTable(
+            table="transcript",
+            csv_name="transcripts.csv",
+            query=f"""
+            SELECT t.ac, t.origin_id, t.hgnc, t.cds_start_i, t.cds_end_i, t.cds_md5, t.added
+            FROM {version}.transcript t
+            WHERE ac IN {acs}
+            """,
+            dtype={
+                "ac": str,
+                "origin_id": "Int64",
+                "hgnc": str,
+                "cds_start_i": "Int64",
+                "cds_end_i": "Int64",
+                "cds_md5": str,
+                "added": str,
+            },
+        ),
+        UtaTable(
+            table="seq_anno",
+            csv_name="seq_anno.csv",
+            query=f"""
+            SELECT s.seq_anno_id, s.seq_id, s.origin_id, s.ac, s.descr, s.added
+            FROM {version}.seq_anno s
+            WHERE ac IN {acs}
+            """,
+            dtype={
+                "seq_anno_id": "Int64",
+                "seq_id": str,
+                "origin_id": "Int64",
+                "ac": str,
+                "descr": str,
+                "added": str,
+            },
+        ),
+        UtaTable(
+            table="seq",
+            csv_name="seq.csv",
+            query=f"""
+            SELECT s.seq_id, s.len, s.seq
+            FROM {version}.seq s
+            WHERE seq_id IN {sql_list(closure.seq_ids)}
+            """,
+            dtype={"seq_id": str, "len": "Int64", "seq": str},
+        ),
+        UtaTable(
+            table="associated_accessions",
+            csv_name="associated_accessions.csv",
+            query=f"""
+            SELECT a.associated_accession_id, a.tx_ac, a.pro_ac, a.origin, a.added
+            FROM {version}.associated_accessions a
+            WHERE tx_ac IN {tx_acs}
+            """,
+            dtype={
+                "associated_accession_id": "Int64",
+                "tx_ac": str,
+                "pro_ac": str,
+                "origin": str,
+                "added": str,
+            },
+        ),
+        UtaTable(
+            table="exon_set",
+            csv_name="exon_set.csv",
+            query=f"""
+            SELECT
+                e.exon_set_id,
+                e.tx_ac,
+                e.alt_ac,
+                e.alt_strand,
+                e.alt_aln_method,
+                e.added
+            FROM {version}.exon_set e
+            WHERE exon_set_id IN {sql_list(closure.exon_set_ids)}
+            """,
+            dtype={
+                "exon_set_id": "Int64",
+                "tx_ac": str,
+                "alt_ac": str,
+                "alt_strand": "Int64",
+                "alt_aln_method": str,
+                "added": str,
+            },
+        ),
+        UtaTable(
+            table="exon",
+            csv_name="exon.csv",
+            query=f"""
+            SELECT
+                e.exon_id,
+                e.exon_set_id,
+                e.start_i,
+                e.end_i,
+                e.ord,
+                e.name
+            FROM {version}.exon e
+            WHERE exon_id IN {exon_ids}
+            """,
+            dtype={
+                "exon_id": "Int64",
+                "exon_set_id": "Int64",
+                "start_i": "Int64",
+                "end_i": "Int64",
+                "ord": "Int64",
+                "name": str,
+            },
+        ),
+        UtaTable(
+            table="exon_aln",
+            csv_name="exon_aln.csv",
+            query=f"""
+            SELECT
+                e.exon_aln_id,
+                e.tx_exon_id,
+                e.alt_exon_id,
+                e.cigar,
+                e.added,
+                e.tx_aseq,
+                e.alt_aseq
+            FROM {version}.exon_aln e
+            WHERE tx_exon_id IN {exon_ids}
+            """,
+            dtype={
+                "exon_aln_id": "Int64",
+                "tx_exon_id": "Int64",
+                "alt_exon_id": "Int64",
+                "cigar": str,
+                "added": str,
+                "tx_aseq": str,
+                "alt_aseq": str,
+            },
+        ),
+    ]
+
+
+class _CsvRecordCounter:
+    """
+    Counts the csv records written through it to a binary file. Newlines
+    inside quoted fields do not end a record.
+    """
+
+    def __init__(self, f: BinaryIO):
+        self._f = f
+        self._quoted = False
+        self.records = 0
+
+    def write(self, data: bytes) -> int:
+        # every quote toggles, so an escaped quote ("") toggles twice
+        for i, part in enumerate(data.split(b'"')):
+            if i:
+                self._quoted = not self._quoted
+
+            if not self._quoted:
+                self.records += part.count(b"\n")
+
+        return self._f.write(data)
+
+
+def copy_to_csv(
+    engine: sa.Engine, *, query: str, csv_path: str, append: bool = False
+) -> int:
+    """
+    Stream the result of a query into a csv file with
+    COPY (...) TO STDOUT. The rows are never loaded into memory all at once.
+
+    With `append`, the rows are added to the end of the file without a
+    header. Returns the number of rows copied.
+    """
+    header = "false" if append else "true"
+    copy_sql = f"COPY ({query.strip()}) TO STDOUT WITH (FORMAT csv, HEADER {header})"
+
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+
+        with open(csv_path, "ab" if append else "wb") as f:
+            if hasattr(cursor, "copy"):
+                # psycopg 3
+                with cursor.copy(copy_sql) as copy:
+                    for block in copy:
+                        f.write(block)
+
+                rows = cursor.rowcount
+            else:
+                # psycopg2, whose rowcount may be -1 after a COPY
+                counter = _CsvRecordCounter(f)
+                cursor.copy_expert(copy_sql, counter)
+                rows = counter.records - (0 if append else 1)
+
+        cursor.close()
+    finally:
+        connection.close()
+
+    return rows
+
+
+def read_sql_to_csv(
+    engine: sa.Engine, *, uta_table: UtaTable, csv_path: str, append: bool = False
+) -> int:
+    """
+    Load the whole table into a pandas DataFrame and then write it to a
+    csv file. Returns the number of rows written.
+    """
+    try:
+        import pandas as pd
+    except ImportError as e:
+        raise ImportError(_PANDAS_ERROR_MESSAGE) from e
+
+    df = pd.read_sql(uta_table.query, engine, dtype=uta_table.dtype)
+    df.to_csv(csv_path, index=False, mode="a" if append else "w", header=not append)
+
+    return len(df)
+
+
+def extract_table(
+    engine: sa.Engine,
+    *,
+    uta_table: UtaTable,
+    csv_path: str,
+    use_pandas: bool,
+    append: bool = False,
+) -> int:
+    start = time.time()
+
+    if use_pandas:
+        rows = read_sql_to_csv(
+            engine, uta_table=uta_table, csv_path=csv_path, append=append
+        )
+    else:
+        rows = copy_to_csv(
+            engine, query=uta_table.query, csv_path=csv_path, append=append
+        )
+
+    print(
+        f"{'Appended' if append else 'Extracted'} {rows} rows of "
+        f"{uta_table.table} in {time.time() - start:.2f} seconds"
+    )
+
+    return rows
+
+
+class _ExtractJob(NamedTuple):
+    uta_table: UtaTable
+    # only the rows of the new genes, appended to the existing csv file
+    delta_table: UtaTable | None
+    previous: TableArtifact | None
+
+
+def _plan_extract_jobs(
+    engine: sa.Engine,
+    *,
+    version: str,
+    sql_dir: str,
+    genes: list[str],
+    closure: UtaClosure,
+    uta_tables: list[UtaTable],
+    manifest: BootstrapManifest | None,
+) -> list[_ExtractJob]:
+    """
+    Skip the tables whose csv file is up to date. If a csv file has the rows
+    of a subset of the genes, only the rows of the new genes are extracted.
+    """
+    if manifest is None:
+        return [_ExtractJob(uta_table, None, None) for uta_table in uta_tables]
+
+    jobs = []
+    delta_tables: dict[frozenset[str], dict[str, UtaTable]] = {}
+
+    for uta_table in uta_tables:
+        csv_path = os.path.join(sql_dir, "data", uta_table.csv_name)
+        previous = manifest.table_valid(uta_table.table, csv_path)
+
+        if previous is None:
+            jobs.append(_ExtractJob(uta_table, None, None))
+            continue
+
+        if previous.query_sha1 == text_sha1(uta_table.query):
+            print(f"{uta_table.table} is up to date, skipping")
+            continue
+
+        previous_genes = frozenset(previous.genes)
+
+        if not previous_genes < set(genes):
+            jobs.append(_ExtractJob(uta_table, None, None))
+            continue
+
+        if previous_genes not in delta_tables:
+            previous_closure = resolve_uta_closure(
+                engine, version=version, genes=sorted(previous_genes)
+            )
+            delta_tables[previous_genes] = {
+                delta_table.table: delta_table
+                for delta_table in get_uta_tables(
+                    version=version,
+                    genes=sorted(set(genes) - previous_genes),
+                    closure=closure.difference(previous_closure),
                 )
-                """,
-                engine,
-                dtype={
-                    "associated_accession_id": "Int64",
-                    "tx_ac": str,
-                    "pro_ac": str,
-                    "origin": str,
-                    "added": str,
-                },
-            ).to_csv(
-                os.path.join(sql_dir, "data", "associated_accessions.csv"), index=False
+            }
+
+        jobs.append(
+            _ExtractJob(
+                uta_table, delta_tables[previous_genes][uta_table.table], previous
             )
+        )
 
-            # psql-uta "select exon_set_id from exon_set where tx_ac in (select ac from transcript where hgnc in $PG_GENES);" >download/exon_set.tsv
-            pd.read_sql(
-                f"""
-                SELECT 
-                    e.exon_set_id,
-                    e.tx_ac,
-                    e.alt_ac,
-                    e.alt_strand,
-                    e.alt_aln_method,
-                    e.added
-                FROM {version}.exon_set e
-                WHERE tx_ac IN (
-                    SELECT ac
-                    FROM {version}.transcript
-                    WHERE hgnc IN {all_genes}
-                ) 
-                """,
-                engine,
-                dtype={
-                    "exon_set_id": "Int64",
-                    "tx_ac": str,
-                    "alt_ac": str,
-                    "alt_strand": "Int64",
-                    "alt_aln_method": str,
-                    "added": str,
-                },
-            ).to_csv(os.path.join(sql_dir, "data", "exon_set.csv"), index=False)
-
-            # psql-uta "select exon_id from exon where exon_set_id in (select exon_set_id from exon_set where tx_ac in (select ac from transcript where hgnc in $PG_GENES));" >download/exon.tsv
-            pd.read_sql(
-                f"""
-                SELECT 
-                    e.exon_id,
-                    e.exon_set_id,
-                    e.start_i,
-                    e.end_i,
-                    e.ord,
-                    e.name
-                FROM {version}.exon e
-                WHERE exon_set_id IN (
-                    SELECT exon_set_id
-                    FROM {version}.exon_set
-                    WHERE tx_ac IN (
-                        SELECT ac
-                        FROM {version}.transcript
-                        WHERE hgnc IN {all_genes}
-                    )
-                )
-                """,
+    return jobs
+
+
+def add_data(
+    *,
+    version: str,
+    sql_dir: str,
+    genes: list[str],
+    use_pandas: bool = False,
+    max_workers: int | None = None,
+    manifest_path: str | None = None,
+):
+    """
+    Extract the rows for the genes from the public UTA database into csv
+    files and write the psql commands that load them.
+
+    The ids belonging to the genes are resolved once, then the tables are
+    extracted concurrently with one connection each (`max_workers` defaults
+    to one thread per table).
+
+    By default, every table is streamed with COPY straight into its csv file.
+    Set `use_pandas` to read each table into a DataFrame first (needs pandas).
+
+    With a `manifest_path`, every extracted table is recorded in the
+    manifest. Tables that are still up to date are skipped on the next run,
+    and adding genes only appends the rows of the new genes.
+    """
+    print(f"Adding selected data from {genes} to the database")
+
+    os.makedirs(os.path.join(sql_dir, "data"), exist_ok=True)
+
+    manifest = (
+        BootstrapManifest.load(manifest_path, version=version)
+        if manifest_path is not None
+        else None
+    )
+
+    with open(os.path.join(sql_dir, "03_data.sql"), "w") as f:
+        with get_engine() as engine:
+            print("Resolving the transcripts, accessions and sequences of the genes")
+            closure = resolve_uta_closure(engine, version=version, genes=genes)
+            uta_tables = get_uta_tables(version=version, genes=genes, closure=closure)
+            jobs = _plan_extract_jobs(
                 engine,
-                dtype={
-                    "exon_id": "Int64",
-                    "exon_set_id": "Int64",
-                    "start_i": "Int64",
-                    "end_i": "Int64",
-                    "ord": "Int64",
-                    "name": str,
-                },
-            ).to_csv(os.path.join(sql_dir, "data", "exon.csv"), index=False)
-
-            # psql-uta "select exon_aln_id from exon_aln where tx_exon_id in (select exon_id from exon where exon_set_id in (select exon_set_id from exon_set where tx_ac in (select ac from transcript where hgnc in $PG_GENES)));" >download/exon_aln.tsv
-            pd.read_sql(
-                f"""
-                SELECT 
-                    e.exon_aln_id,
-                    e.tx_exon_id,
-                    e.alt_exon_id,
-                    e.cigar,
-                    e.added,
-                    e.tx_aseq,
-                    e.alt_aseq
-                FROM {version}.exon_aln e
-                WHERE tx_exon_id IN (
-                    SELECT exon_id
-                    FROM {version}.exon
-                    WHERE exon_set_id IN (
-                        SELECT exon_set_id
-                        FROM {version}.exon_set
-                        WHERE tx_ac IN (
-                            SELECT ac
-                            FROM {version}.transcript
-                            WHERE hgnc IN {all_genes}
-                        )
-                    )
+                version=version,
+                sql_dir=sql_dir,
+                genes=genes,
+                closure=closure,
+                uta_tables=uta_tables,
+                manifest=manifest,
+            )
+
+            def run(job: _ExtractJob):
+                csv_path = os.path.join(sql_dir, "data", job.uta_table.csv_name)
+
+                rows = extract_table(
+                    engine,
+                    uta_table=job.delta_table or job.uta_table,
+                    csv_path=csv_path,
+                    use_pandas=use_pandas,
+                    append=job.delta_table is not None,
                 )
-                """,
-                engine,
-                dtype={
-                    "exon_aln_id": "Int64",
-                    "tx_exon_id": "Int64",
-                    "alt_exon_id": "Int64",
-                    "cigar": str,
-                    "added": str,
-                    "tx_aseq": str,
-                    "alt_aseq": str,
-                },
-            ).to_csv(os.path.join(sql_dir, "data", "exon_aln.csv"), index=False)
 
-            # make it load data from the csv file
-            f.write(
-                strip_whitespace_lines(
-                    f"""
-                    \\COPY {version}.meta FROM '/docker-entrypoint-initdb.d/data/meta.csv' DELIMITER ',' CSV HEADER;
-                    \\COPY {version}.origin FROM '/docker-entrypoint-initdb.d/data/origin.csv' DELIMITER ',' CSV HEADER;
-                    \\COPY {version}.gene FROM '/docker-entrypoint-initdb.d/data/genes.csv' DELIMITER ',' CSV HEADER;
-                    \\COPY {version}.transcript FROM '/docker-entrypoint-initdb.d/data/transcripts.csv' DELIMITER ',' CSV HEADER;
-                    \\COPY {version}.seq_anno FROM '/docker-entrypoint-initdb.d/data/seq_anno.csv' DELIMITER ',' CSV HEADER;
-                    \\COPY {version}.seq FROM '/docker-entrypoint-initdb.d/data/seq.csv' DELIMITER ',' CSV HEADER;
-                    \\COPY {version}.associated_accessions FROM '/docker-entrypoint-initdb.d/data/associated_accessions.csv' DELIMITER ',' CSV HEADER;
-                    \\COPY {version}.exon_set FROM '/docker-entrypoint-initdb.d/data/exon_set.csv' DELIMITER ',' CSV HEADER;
-                    \\COPY {version}.exon FROM '/docker-entrypoint-initdb.d/data/exon.csv' DELIMITER ',' CSV HEADER;
-                    \\COPY {version}.exon_aln FROM '/docker-entrypoint-initdb.d/data/exon_aln.csv' DELIMITER ',' CSV HEADER;
-                    """
+                if manifest is None or manifest_path is None:
+                    return
+
+                if job.previous is not None:
+                    rows += job.previous.rows
+
+                manifest.record_table(
+                    manifest_path,
+                    job.uta_table.table,
+                    TableArtifact(
+                        csv_name=job.uta_table.csv_name,
+                        query_sha1=text_sha1(job.uta_table.query),
+                        genes=sorted(genes),
+                        rows=rows,
+                        sha1=file_sha1(csv_path) or "",
+                    ),
                 )
-            )
 
+            # each thread checks out its own connection from the engine pool
+            # (5 + 10 overflow connections by default)
+            workers = max_workers or len(uta_tables)
 
-def setup_schema_tail(*, data_dir: str, version: str):
-    print("Extracting tail of UTA database dump from ALTER TABLE onwards")
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(run, job) for job in jobs]
 
-    with open(os.path.join(data_dir, "sql", "04_schema.sql"), "w") as f:
-        f.write("")
+                for future in futures:
+                    future.result()
 
-    os.system(
-        f"""
-        cd {data_dir} &&
-        tail -1000 "{version}.sql" | \
-        awk '/ALTER TABLE / {{found=1}} found {{print}}' > {data_dir}/sql/04_schema.sql
-        """
-    )
+            if manifest is not None and manifest_path is not None:
+                manifest.genes = sorted(genes)
+                manifest.save(manifest_path)
+
+            # make it load data from the csv file
+            f.write(
+                "\n".join(
+                    f"\\COPY {version}.{uta_table.table} FROM "
+                    f"'/docker-entrypoint-initdb.d/data/{uta_table.csv_name}' "
+                    "DELIMITER ',' CSV HEADER;"
+                    for uta_table in uta_tables
+                )
+                + "\n"
+            )
 
 
 def setup_db(
@@ -413,7 +895,8 @@ def get_args():
         type=str,
         required=False,
         default="https://dl.biocommons.org/uta",
-        help="URL to download the UTA database from. Default is 'https://dl.biocommons.org/uta'",
+        help="URL to download the UTA database from. Default is 'https://dl.biocommons.org/uta'. "
+        "Can also be a local directory or a file:// mirror containing the dump to run offline",
     )
 
     parser.add_argument(
@@ -442,6 +925,29 @@ def get_args():
         f"Current directory is the directory where the script is run ({os.path.join(os.getcwd(), "data")})",
     )
 
+    parser.add_argument(
+        "--workers",
+        type=int,
+        required=False,
+        default=None,
+        help="Number of UTA tables to extract at the same time. "
+        "Default is one thread per table",
+    )
+
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Ignore the manifest of the previous run and regenerate every file",
+    )
+
+    parser.add_argument(
+        "--use_pandas",
+        action="store_true",
+        help="Load every UTA table into a pandas DataFrame before writing it to "
+        "a csv file. By default, the tables are streamed with COPY, which uses "
+        "constant memory and does not need pandas",
+    )
+
     if len(sys.argv) == 1:
         parser.print_help(sys.stderr)
         sys.exit(1)
@@ -454,16 +960,28 @@ async def main():
 
     os.makedirs(os.path.join(args.data_dir), exist_ok=True)
 
-    get_uta(version=args.version, dl_url=args.dl_url, data_dir=args.data_dir)
-    rename_and_unzip(version=args.version, data_dir=args.data_dir)
+    manifest_path = os.path.join(args.data_dir, "bootstrap_manifest.json")
+
+    if args.force and os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+    dump = get_uta(version=args.version, dl_url=args.dl_url, data_dir=args.data_dir)
 
     sql_dir = os.path.join(args.data_dir, "sql")
     os.makedirs(sql_dir, exist_ok=True)
 
     setup_roles(sql_dir=sql_dir)
-    setup_schema_head(sql_dir=sql_dir, version=args.version)
-    add_data(sql_dir=sql_dir, genes=args.genes, version=args.version)
-    setup_schema_tail(data_dir=args.data_dir, version=args.version)
+    setup_schema(
+        dump, version=args.version, sql_dir=sql_dir, manifest_path=manifest_path
+    )
+    add_data(
+        sql_dir=sql_dir,
+        genes=args.genes,
+        version=args.version,
+        use_pandas=args.use_pandas,
+        max_workers=args.workers,
+        manifest_path=manifest_path,
+    )
     setup_db(sql_dir=sql_dir, version=args.version)
 
 
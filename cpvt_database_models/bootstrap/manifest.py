@@ -0,0 +1,145 @@
+"""
+A manifest of the files the bootstrap generated, so that reruns only redo
+the work whose inputs changed.
+
+Every artifact is recorded with the sha1 of its contents. An artifact is
+only reused if the file on disk still has that sha1.
+"""
+
+import hashlib
+import os
+import threading
+
+from pydantic import BaseModel
+
+MANIFEST_FORMAT = 1
+
+
+def file_sha1(path: str) -> str | None:
+    """
+    The sha1 of a file, or None if the file does not exist.
+    """
+    if not os.path.exists(path):
+        return None
+
+    sha1 = hashlib.sha1()
+
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            sha1.update(chunk)
+
+    return sha1.hexdigest()
+
+
+def text_sha1(text: str) -> str:
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+class TableArtifact(BaseModel):
+    csv_name: str
+    query_sha1: str
+    """
+    sha1 of the query that extracts the whole table for `genes`
+    """
+
+    genes: list[str]
+    """
+    The genes the csv file has the rows of
+    """
+
+    rows: int
+    sha1: str
+    """
+    sha1 of the csv file
+    """
+
+
+class BootstrapManifest(BaseModel):
+    format: int = MANIFEST_FORMAT
+    version: str
+    """
+    The UTA version, e.g. uta_20210129
+    """
+
+    genes: list[str] = []
+    dump_sha1: str | None = None
+    """
+    sha1 of the gzipped UTA dump the schema files were split from
+    """
+
+    schema_files: dict[str, str] = {}
+    """
+    Schema file name -> sha1 of its contents
+    """
+
+    tables: dict[str, TableArtifact] = {}
+
+    @classmethod
+    def load(cls, path: str, *, version: str) -> "BootstrapManifest":
+        """
+        Load the manifest at `path`. A missing manifest, one with another
+        format or one for another UTA version gives an empty manifest.
+        """
+        if os.path.exists(path):
+            with open(path) as f:
+                manifest = cls.model_validate_json(f.read())
+
+            if manifest.format == MANIFEST_FORMAT and manifest.version == version:
+                return manifest
+
+        return cls(version=version)
+
+    def save(self, path: str):
+        """
+        Atomically write the manifest (safe to call from multiple threads).
+        """
+        with _save_lock:
+            self._write(path)
+
+    def _write(self, path: str):
+        with open(f"{path}.part", "w") as f:
+            f.write(self.model_dump_json(indent=2))
+
+        os.replace(f"{path}.part", path)
+
+    def schema_file_valid(self, path: str) -> bool:
+        expected = self.schema_files.get(os.path.basename(path))
+        return expected is not None and file_sha1(path) == expected
+
+    def record_schema_file(self, path: str):
+        sha1 = file_sha1(path)
+
+        if sha1 is not None:
+            self.schema_files[os.path.basename(path)] = sha1
+
+    def record_table(self, path: str, table: str, artifact: TableArtifact):
+        """
+        Record an extracted table and save the manifest right away, so an
+        interrupted bootstrap resumes from the tables it finished.
+        """
+        with _save_lock:
+            self.tables[table] = artifact
+            self._write(path)
+
+    def table_valid(self, table: str, csv_path: str) -> TableArtifact | None:
+        """
+        The recorded artifact of a table if its csv file is unchanged.
+        """
+        artifact = self.tables.get(table)
+
+        if artifact is None or file_sha1(csv_path) != artifact.sha1:
+            return None
+
+        return artifact
+
+
+_save_lock = threading.Lock()
+
+
+__all__ = [
+    "MANIFEST_FORMAT",
+    "BootstrapManifest",
+    "TableArtifact",
+    "file_sha1",
+    "text_sha1",
+]
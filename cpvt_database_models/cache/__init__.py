@@ -0,0 +1,5 @@
+from .kv_cache import CHANGED_CHANNEL, KVCache
+from .lru import LRUCache
+from .tiered import TieredKVCache
+
+__all__ = ["CHANGED_CHANNEL", "KVCache", "LRUCache", "TieredKVCache"]
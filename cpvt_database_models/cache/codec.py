@@ -0,0 +1,112 @@
+"""
+The binary encoding of large kv_store values.
+
+    | format version (1 byte) | codec (1 byte) | compressed JSON |
+
+The payload is always JSON, so a decoded value can be sent in an HTTP
+response as is. zstd (the zstandard package) is used when installed and
+zlib otherwise; orjson serializes the JSON when installed. Both are in the
+cache extra (pip install cpvt_database_models[cache]).
+"""
+
+import enum
+import json
+import zlib
+from collections.abc import Callable
+from typing import Any
+
+FORMAT_VERSION = 1
+
+_ZSTD_ERROR_MESSAGE = (
+    "This value was compressed with zstd, which requires the zstandard "
+    "library. Please run 'pip install cpvt_database_models[cache] "
+    "--index-url https://gitlab.com/api/v4/projects/60969577/packages/pypi/simple'"
+)
+
+
+class Codec(enum.IntEnum):
+    NONE = 0
+    ZLIB = 1
+    ZSTD = 2
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError(_ZSTD_ERROR_MESSAGE) from e
+
+    return zstandard
+
+
+def default_codec() -> Codec:
+    try:
+        import zstandard  # noqa: F401
+    except ImportError:
+        return Codec.ZLIB
+
+    return Codec.ZSTD
+
+
+def dumps_json(value: Any, default: Callable[[Any], Any] | None = None) -> bytes:
+    """
+    Compact JSON bytes of value. default converts the objects neither
+    serializer supports (orjson also serializes datetimes by itself).
+    """
+    try:
+        import orjson
+    except ImportError:
+        return json.dumps(value, separators=(",", ":"), default=default).encode()
+
+    json_bytes: bytes = orjson.dumps(value, default=default)
+    return json_bytes
+
+
+def encode(json_bytes: bytes, codec: Codec | None = None) -> bytes:
+    """
+    Compress JSON bytes into the versioned binary format.
+    """
+    if codec is None:
+        codec = default_codec()
+
+    if codec == Codec.ZSTD:
+        payload = _zstd().ZstdCompressor().compress(json_bytes)
+    elif codec == Codec.ZLIB:
+        payload = zlib.compress(json_bytes)
+    else:
+        payload = json_bytes
+
+    return bytes([FORMAT_VERSION, codec]) + payload
+
+
+def decode(data: bytes) -> bytes:
+    """
+    The JSON bytes of a value in the versioned binary format.
+    """
+    if len(data) < 2 or data[0] != FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported kv_store value format {data[:1]!r} "
+            f"(expected version {FORMAT_VERSION})"
+        )
+
+    codec = Codec(data[1])
+    payload = memoryview(data)[2:]
+
+    if codec == Codec.ZSTD:
+        json_bytes: bytes = _zstd().ZstdDecompressor().decompress(payload)
+        return json_bytes
+
+    if codec == Codec.ZLIB:
+        return zlib.decompress(payload)
+
+    return bytes(payload)
+
+
+__all__ = [
+    "FORMAT_VERSION",
+    "Codec",
+    "default_codec",
+    "dumps_json",
+    "encode",
+    "decode",
+]
@@ -0,0 +1,321 @@
+"""
+An async cache client over the kv_store table.
+
+Every key is stored with the cache's prefix, so the sweeper only ever
+evicts cache entries and never other kv_store rows (e.g. the filters).
+"""
+
+import datetime
+import json
+import uuid
+from collections.abc import Awaitable, Callable, Iterable, Mapping
+from typing import Any
+
+from sqlalchemy import Text, cast, delete, func, null, or_, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from cpvt_database_models.models.kv_store import KVStore
+
+from . import codec
+
+_MISSING: Any = object()
+
+Ttl = float | datetime.timedelta | None
+
+# every write notifies this channel with "<origin>:<key>"
+CHANGED_CHANNEL = "kv_store_changed"
+
+
+class KVCache:
+    """
+    get/set/get_or_compute on kv_store with a per-key TTL (in seconds or a
+    timedelta, None never expires).
+
+    get_or_compute computes a missing key once across all processes: the
+    first caller holds a transaction level advisory lock on the key while
+    computing, the others wait for it and read its value.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        *,
+        prefix: str = "cache:",
+        default_ttl: Ttl = None,
+        binary_threshold: int | None = 64 * 1024,
+    ):
+        self.engine = engine
+        self.prefix = prefix
+        self.default_ttl = default_ttl
+        # values that are at least this large as JSON are stored compressed
+        # in value_bytes instead of as JSONB (None always stores JSONB)
+        self.binary_threshold = binary_threshold
+        # identifies the notifications this client sent
+        self.origin = uuid.uuid4().hex
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        async with self.engine.connect() as conn:
+            found = await self._fetch(conn, [key])
+
+        return found[key][0] if key in found else default
+
+    async def mget(self, keys: Iterable[str]) -> dict[str, Any]:
+        """
+        The values of the keys that are cached and did not expire.
+        """
+        async with self.engine.connect() as conn:
+            found = await self._fetch(conn, list(keys))
+
+        return {key: value for key, (value, _) in found.items()}
+
+    async def get_json(self, key: str) -> bytes | None:
+        """
+        The value of key as JSON bytes, without parsing it.
+        """
+        return (await self.mget_json([key])).get(key)
+
+    async def mget_json(self, keys: Iterable[str]) -> dict[str, bytes]:
+        async with self.engine.connect() as conn:
+            rows = (
+                await conn.execute(
+                    select(
+                        KVStore.key,
+                        cast(KVStore.value, Text),
+                        KVStore.value_bytes,
+                    ).where(
+                        KVStore.key.in_([self.prefix + key for key in keys]),
+                        _not_expired(),
+                    )
+                )
+            ).all()
+
+        return {
+            key[len(self.prefix) :]: (
+                codec.decode(value_bytes) if value_bytes is not None else value.encode()
+            )
+            for key, value, value_bytes in rows
+        }
+
+    async def set(self, key: str, value: Any, *, ttl: Ttl = _MISSING):
+        await self.mset({key: value}, ttl=ttl)
+
+    async def mset(self, values: Mapping[str, Any], *, ttl: Ttl = _MISSING):
+        """
+        Upsert all the values in a single INSERT ... ON CONFLICT.
+        """
+        if not values:
+            return
+
+        async with self.engine.begin() as conn:
+            await self._upsert(conn, values, ttl)
+
+    async def delete(self, *keys: str):
+        async with self.engine.begin() as conn:
+            await conn.execute(
+                delete(KVStore).where(
+                    KVStore.key.in_([self.prefix + key for key in keys])
+                )
+            )
+            await self._notify(conn, keys)
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        *,
+        ttl: Ttl = _MISSING,
+    ) -> Any:
+        """
+        The cached value of key, or the value of compute() which is then
+        cached. compute holds a database connection while it runs.
+        """
+        value = await self.get(key, _MISSING)
+
+        if value is not _MISSING:
+            return value
+
+        async with self.engine.begin() as conn:
+            await conn.execute(
+                text("SELECT pg_advisory_xact_lock(hashtextextended(:key, 0))"),
+                {"key": self.prefix + key},
+            )
+
+            # another process may have computed it while we waited on the lock
+            found = await self._fetch(conn, [key])
+
+            if key in found:
+                return found[key][0]
+
+            value = await compute()
+            await self._upsert(conn, {key: value}, ttl)
+
+        return value
+
+    async def sweep(
+        self,
+        *,
+        max_age: datetime.timedelta | None = None,
+        max_rows: int | None = None,
+    ) -> int:
+        """
+        Evict the expired entries, the entries not written in max_age and the
+        least recently written entries beyond max_rows. The age based
+        evictions are range scans on the BRIN index on updated_at.
+
+        Returns the number of entries evicted.
+        """
+        is_cache_key = KVStore.key.startswith(self.prefix, autoescape=True)
+        evicted = 0
+
+        async with self.engine.begin() as conn:
+            result = await conn.execute(
+                delete(KVStore).where(
+                    KVStore.expires_at <= func.now(),
+                    is_cache_key,
+                )
+            )
+            evicted += result.rowcount
+
+            if max_age is not None:
+                result = await conn.execute(
+                    delete(KVStore).where(
+                        KVStore.updated_at < func.now() - max_age,
+                        is_cache_key,
+                    )
+                )
+                evicted += result.rowcount
+
+            if max_rows is not None:
+                # the key breaks the ties between the entries of one mset,
+                # which all have the updated_at of its transaction
+                evicted_keys = (
+                    select(KVStore.key)
+                    .where(is_cache_key)
+                    .order_by(KVStore.updated_at.desc(), KVStore.key.desc())
+                    .offset(max_rows)
+                )
+                result = await conn.execute(
+                    delete(KVStore).where(KVStore.key.in_(evicted_keys))
+                )
+                evicted += result.rowcount
+
+        print(f"Evicted {evicted} entries from the {self.prefix} cache")
+
+        return evicted
+
+    async def _fetch(
+        self, conn: AsyncConnection, keys: list[str]
+    ) -> dict[str, tuple[Any, float | None]]:
+        """
+        The value and the seconds until it expires (None if never) of the
+        keys that are cached and did not expire.
+        """
+        rows = (
+            await conn.execute(
+                select(
+                    KVStore.key,
+                    KVStore.value,
+                    KVStore.value_bytes,
+                    func.extract("epoch", KVStore.expires_at - func.now()),
+                ).where(
+                    KVStore.key.in_([self.prefix + key for key in keys]),
+                    _not_expired(),
+                )
+            )
+        ).all()
+
+        return {
+            key[len(self.prefix) :]: (
+                (
+                    json.loads(codec.decode(value_bytes))
+                    if value_bytes is not None
+                    else value
+                ),
+                None if ttl is None else float(ttl),
+            )
+            for key, value, value_bytes, ttl in rows
+        }
+
+    async def _notify(self, conn: AsyncConnection, keys: Iterable[str]):
+        """
+        Tell the other processes the keys changed, once the transaction
+        commits (see TieredKVCache).
+        """
+        await conn.execute(
+            text(
+                """
+                SELECT pg_notify(:channel, :origin || k)
+                FROM unnest(CAST(:keys AS TEXT[])) k
+                """
+            ),
+            {
+                "channel": CHANGED_CHANNEL,
+                "origin": f"{self.origin}:",
+                "keys": [self.prefix + key for key in keys],
+            },
+        )
+
+    async def _upsert(
+        self,
+        conn: AsyncConnection,
+        values: Mapping[str, Any],
+        ttl: Ttl,
+        json_bytes: Mapping[str, bytes] | None = None,
+    ):
+        """
+        json_bytes can hold the values already serialized with
+        codec.dumps_json, by key.
+        """
+        expires_at = self._expires_at(self.default_ttl if ttl is _MISSING else ttl)
+        stmt = pg_insert(KVStore).values(
+            [
+                {"key": self.prefix + key, "expires_at": expires_at}
+                | self._encode(value, json_bytes.get(key) if json_bytes else None)
+                for key, value in values.items()
+            ]
+        )
+
+        await conn.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[KVStore.key],
+                set_={
+                    "value": stmt.excluded.value,
+                    "value_bytes": stmt.excluded.value_bytes,
+                    "expires_at": stmt.excluded.expires_at,
+                    "updated_at": func.now(),
+                },
+            )
+        )
+        await self._notify(conn, values)
+
+    def _encode(self, value: Any, json_bytes: bytes | None = None) -> dict[str, Any]:
+        """
+        The value and value_bytes columns of a value.
+        """
+        if self.binary_threshold is not None:
+            if json_bytes is None:
+                json_bytes = codec.dumps_json(value)
+
+            if len(json_bytes) >= self.binary_threshold:
+                return {"value": null(), "value_bytes": codec.encode(json_bytes)}
+
+        return {"value": value, "value_bytes": null()}
+
+    @staticmethod
+    def _expires_at(ttl: Ttl):
+        if ttl is None:
+            return None
+
+        if not isinstance(ttl, datetime.timedelta):
+            ttl = datetime.timedelta(seconds=ttl)
+
+        # the database clock decides when an entry expired
+        return func.now() + ttl
+
+
+def _not_expired():
+    return or_(KVStore.expires_at.is_(None), KVStore.expires_at > func.now())
+
+
+__all__ = ["CHANGED_CHANNEL", "KVCache"]
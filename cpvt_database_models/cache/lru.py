@@ -0,0 +1,85 @@
+"""
+A bounded in-process LRU cache, capped by the total size of its values.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, NamedTuple
+
+
+class _Entry(NamedTuple):
+    value: Any
+    size: int
+    expires: float | None
+    """
+    time.monotonic() deadline
+    """
+
+
+class LRUCache:
+    """
+    Keeps the most recently used values while their sizes add up to at most
+    max_bytes. Values larger than max_bytes are never cached.
+    """
+
+    def __init__(self, max_bytes: int, *, max_age: float | None = None):
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.nbytes = 0
+
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def get(self, key: str, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+
+        if entry is None:
+            return default
+
+        if entry.expires is not None and entry.expires <= time.monotonic():
+            self.pop(key)
+            return default
+
+        self._entries.move_to_end(key)
+
+        return entry.value
+
+    def put(self, key: str, value: Any, *, size: int, ttl: float | None = None):
+        """
+        Cache value for at most ttl (and max_age) seconds.
+        """
+        self.pop(key)
+
+        if size > self.max_bytes:
+            return
+
+        ttls = [t for t in (ttl, self.max_age) if t is not None]
+        expires = time.monotonic() + min(ttls) if ttls else None
+
+        self._entries[key] = _Entry(value=value, size=size, expires=expires)
+        self.nbytes += size
+
+        while self.nbytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.nbytes -= evicted.size
+
+    def pop(self, key: str):
+        entry = self._entries.pop(key, None)
+
+        if entry is not None:
+            self.nbytes -= entry.size
+
+    def clear(self):
+        self._entries.clear()
+        self.nbytes = 0
+
+
+_MISSING: Any = object()
+
+
+__all__ = ["LRUCache"]
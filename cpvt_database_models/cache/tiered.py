@@ -0,0 +1,173 @@
+"""
+A two tier cache: an in-process LRU (L1) in front of the kv_store table.
+
+Every KVCache write notifies the kv_store_changed channel with the key.
+TieredKVCache.listen drops those keys from the LRU, so the LRU of every
+worker process stays coherent with kv_store. The LRU is only used while
+the listener is connected - notifications sent while it was not could
+have been missed.
+
+    cache = TieredKVCache(engine, l1=LRUCache(64 * 1024 * 1024))
+    listener = asyncio.create_task(cache.listen())
+"""
+
+import asyncio
+import datetime
+from collections.abc import Iterable, Mapping
+from typing import Any
+
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from . import codec
+from .kv_cache import _MISSING, CHANGED_CHANNEL, KVCache, Ttl
+from .lru import LRUCache
+
+
+class TieredKVCache(KVCache):
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        *,
+        l1: LRUCache,
+        prefix: str = "cache:",
+        default_ttl: Ttl = None,
+        binary_threshold: int | None = 64 * 1024,
+        reconnect_delay: float = 1,
+    ):
+        super().__init__(
+            engine,
+            prefix=prefix,
+            default_ttl=default_ttl,
+            binary_threshold=binary_threshold,
+        )
+
+        self.l1 = l1
+        self.reconnect_delay = reconnect_delay
+        self.listening = asyncio.Event()
+        # counts the keys dropped by the listener, a value read before a key
+        # was dropped may be stale and is not cached
+        self._invalidations = 0
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        return (await self.mget([key])).get(key, default)
+
+    async def mget(self, keys: Iterable[str]) -> dict[str, Any]:
+        keys = list(keys)
+        found = {}
+
+        if self.listening.is_set():
+            for key in keys:
+                value = self.l1.get(key, _MISSING)
+
+                if value is not _MISSING:
+                    found[key] = value
+
+        missing = [key for key in keys if key not in found]
+
+        if missing:
+            invalidations = self._invalidations
+
+            async with self.engine.connect() as conn:
+                fetched = await self._fetch(conn, missing)
+
+            for key, (value, ttl) in fetched.items():
+                found[key] = value
+                self._put(key, value, ttl, invalidations)
+
+        return found
+
+    async def mset(self, values: Mapping[str, Any], *, ttl: Ttl = _MISSING):
+        if not values:
+            return
+
+        invalidations = self._invalidations
+        # serialized once for both the binary_threshold and the size in the LRU
+        json_bytes = {key: codec.dumps_json(value) for key, value in values.items()}
+
+        async with self.engine.begin() as conn:
+            await self._upsert(conn, values, ttl, json_bytes)
+
+        ttl = self.default_ttl if ttl is _MISSING else ttl
+
+        for key, value in values.items():
+            self._put(
+                key,
+                value,
+                ttl.total_seconds() if isinstance(ttl, datetime.timedelta) else ttl,
+                invalidations,
+                size=len(json_bytes[key]),
+            )
+
+    async def delete(self, *keys: str):
+        await super().delete(*keys)
+
+        for key in keys:
+            self.l1.pop(key)
+
+    async def listen(self):
+        """
+        Drop the keys other processes changed from the LRU until cancelled,
+        reconnecting if the connection is lost. Run it as a background task.
+
+        Requires the psycopg driver.
+        """
+        while True:
+            try:
+                await self._listen()
+            except (OSError, DBAPIError) as e:
+                print(f"Lost the {CHANGED_CHANNEL} listener, reconnecting: {e}")
+            finally:
+                self.listening.clear()
+                self.l1.clear()
+
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def _listen(self):
+        async with self.engine.connect() as conn:
+            try:
+                await conn.execution_options(isolation_level="AUTOCOMMIT")
+                await conn.exec_driver_sql(f"LISTEN {CHANGED_CHANNEL}")
+
+                driver_connection: Any = (
+                    await conn.get_raw_connection()
+                ).driver_connection
+
+                # anything cached before was not covered by the listener
+                self.l1.clear()
+                self.listening.set()
+
+                async for notify in driver_connection.notifies():
+                    origin, _, key = notify.payload.partition(":")
+
+                    if origin != self.origin and key.startswith(self.prefix):
+                        self.l1.pop(key[len(self.prefix) :])
+                        self._invalidations += 1
+            finally:
+                # never hand a listening connection back to the pool
+                await conn.invalidate()
+
+    def _put(
+        self,
+        key: str,
+        value: Any,
+        ttl: float | None,
+        invalidations: int,
+        *,
+        size: int | None = None,
+    ):
+        if self.listening.is_set() and invalidations == self._invalidations:
+            if size is None:
+                size = _value_size(value)
+
+            self.l1.put(key, value, size=size, ttl=ttl)
+
+
+def _value_size(value: Any) -> int:
+    """
+    The size of the value as compact JSON, roughly what it takes in memory.
+    """
+    return len(codec.dumps_json(value))
+
+
+__all__ = ["TieredKVCache"]
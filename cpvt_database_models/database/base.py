@@ -1,8 +1,11 @@
 import datetime
-from typing import Any
+import decimal
+from functools import lru_cache
+from typing import Any, NamedTuple
 
 from sqlalchemy import DateTime, MetaData, func
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import Range
+from sqlalchemy.orm import DeclarativeBase, Mapped, Mapper, mapped_column
 
 meta = MetaData(
     naming_convention={
@@ -24,6 +27,36 @@ class CreatedAtMixin:
     )
 
 
+class _MappedKeys(NamedTuple):
+    columns: tuple[str, ...]
+    relationships: tuple[str, ...]
+
+
+@lru_cache(maxsize=None)
+def _mapped_keys(mapper: Mapper) -> _MappedKeys:
+    return _MappedKeys(
+        columns=tuple(attr.key for attr in mapper.column_attrs),
+        relationships=tuple(rel.key for rel in mapper.relationships),
+    )
+
+
+def _json_default(value: Any) -> Any:
+    """
+    The JSON of the column values json (and orjson) cannot serialize.
+    """
+    if isinstance(value, Range):
+        # the same text as to_jsonb of a postgres range, e.g. "[1,5)"
+        return str(value)
+
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
 class BaseBase(DeclarativeBase):
     metadata = meta
 
@@ -33,20 +66,66 @@ class BaseBase(DeclarativeBase):
     def __repr__(self):
         return str(self)
 
-    def to_dict(self, include_relationships: bool = False) -> dict[str, Any]:
-        keys = self.__dict__.keys()
-        relationship_keys = {rel.key for rel in self.__mapper__.relationships}
-
-        exclude = {"_sa_instance_state"}
-        if not include_relationships:
-            exclude |= relationship_keys
-
-        return {
-            # if its an object, recurse
-            c: (getattr(self, c))
-            for c in keys
-            if c not in exclude and not c.startswith("_")
-        }
+    def to_dict(
+        self,
+        include_relationships: bool = False,
+        *,
+        max_depth: int = 1,
+        _path: frozenset[int] = frozenset(),
+    ) -> dict[str, Any]:
+        """
+        The loaded column values, never lazy loading an attribute.
+
+        include_relationships adds the loaded relationships as dicts, up to
+        max_depth relationships deep. An object already being converted
+        higher up (e.g. the other side of a back_populates) is left out.
+        """
+        loaded = self.__dict__
+        keys = _mapped_keys(self.__mapper__)
+
+        values = {c: loaded[c] for c in keys.columns if c in loaded}
+
+        if not include_relationships or max_depth < 1:
+            return values
+
+        path = _path | {id(self)}
+
+        for rel in keys.relationships:
+            if rel not in loaded:
+                continue
+
+            related = loaded[rel]
+
+            if related is None:
+                values[rel] = None
+            elif isinstance(related, BaseBase):
+                if id(related) not in path:
+                    values[rel] = related.to_dict(
+                        True, max_depth=max_depth - 1, _path=path
+                    )
+            else:
+                values[rel] = [
+                    r.to_dict(True, max_depth=max_depth - 1, _path=path)
+                    for r in related
+                    if id(r) not in path
+                ]
+
+        return values
+
+    def to_json_bytes(
+        self, include_relationships: bool = False, *, max_depth: int = 1
+    ) -> bytes:
+        """
+        to_dict as compact JSON bytes. Ranges are written like postgres
+        writes them, datetimes as ISO 8601 and JSONB values as is.
+        """
+        # imported here as the cache package imports the models
+        from cpvt_database_models.cache.codec import dumps_json
+
+        return dumps_json(
+            self.to_dict(include_relationships, max_depth=max_depth),
+            default=_json_default,
+        )
 
 
 class Base(BaseBase, CreatedAtMixin):
@@ -0,0 +1,291 @@
+"""
+The engines and session factory shared by everything in a process.
+
+    async with get_sessionmaker()() as session:
+        ...
+
+    async with read_session() as session:
+        ...
+
+Both are built from the Settings once. Sessions from get_sessionmaker are
+always on the primary, so writes and view rebuilds are too. read_session
+goes to the postgresql_replica_dsns in turn, skipping the replicas that
+lag behind, and to the primary when there are none.
+"""
+
+import asyncio
+import time
+from collections.abc import AsyncIterator, Sequence
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Any
+
+from sqlalchemy import event, make_url, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+
+from cpvt_database_models.settings import Settings, get_settings
+
+
+def _connect_args(driver: str, settings: Settings) -> dict[str, Any]:
+    """
+    The statement timeout and prepared statement cache of the driver.
+    """
+    if "asyncpg" in driver:
+        server_settings = {}
+
+        if settings.statement_timeout is not None:
+            server_settings["statement_timeout"] = str(settings.statement_timeout)
+
+        return {
+            "server_settings": server_settings,
+            "prepared_statement_cache_size": settings.prepared_statement_cache_size,
+        }
+
+    connect_args: dict[str, Any] = {}
+
+    if settings.statement_timeout is not None:
+        connect_args["options"] = f"-c statement_timeout={settings.statement_timeout}"
+
+    if settings.prepared_statement_cache_size == 0:
+        connect_args["prepare_threshold"] = None
+
+    return connect_args
+
+
+def create_engine_from_settings(
+    dsn: str, settings: Settings | None = None
+) -> AsyncEngine:
+    """
+    An engine for dsn with the pool and connection settings.
+    """
+    if settings is None:
+        settings = get_settings()
+
+    # the dsn (e.g. a replica's) need not use the driver of the settings
+    driver = make_url(dsn).drivername
+
+    engine = create_async_engine(
+        dsn,
+        pool_size=settings.pool_size,
+        max_overflow=settings.pool_max_overflow,
+        pool_recycle=settings.pool_recycle,
+        pool_pre_ping=settings.pool_pre_ping,
+        connect_args=_connect_args(driver, settings),
+    )
+
+    if "psycopg" in driver and settings.prepared_statement_cache_size:
+        prepared_max = settings.prepared_statement_cache_size
+
+        @event.listens_for(engine.sync_engine, "connect")
+        def _set_prepared_max(dbapi_connection, connection_record):
+            dbapi_connection.driver_connection.prepared_max = prepared_max
+
+    return engine
+
+
+@lru_cache()
+def get_async_engine() -> AsyncEngine:
+    """
+    The engine of the primary database, for writes and view rebuilds.
+    """
+    return create_engine_from_settings(get_settings().postgresql_dsn)
+
+
+class ReplicaRouter:
+    """
+    Hands out the replicas in round-robin order, skipping the ones more
+    than max_lag seconds behind the primary or that could not be reached.
+    Without a usable replica the primary is read from instead.
+
+    The lag of the replicas is checked at most every check_interval
+    seconds. All the engines are read-only.
+    """
+
+    def __init__(
+        self,
+        primary: AsyncEngine,
+        replicas: Sequence[AsyncEngine] = (),
+        *,
+        max_lag: float = 30,
+        check_interval: float = 5,
+    ):
+        self.primary = primary.execution_options(postgresql_readonly=True)
+        self.replicas = tuple(
+            replica.execution_options(postgresql_readonly=True) for replica in replicas
+        )
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+
+        self.lags: tuple[float | None, ...] = (None,) * len(self.replicas)
+        """
+        seconds every replica was behind at the last check, None if it
+        could not be reached
+        """
+
+        self._usable = self.replicas
+        self._next = 0
+        self._checked_at: float | None = None
+        self._lock = asyncio.Lock()
+
+    async def engine(self) -> AsyncEngine:
+        await self.refresh()
+
+        return self.choose()
+
+    def choose(self) -> AsyncEngine:
+        """
+        The next usable replica, as of the last check.
+        """
+        if not self._usable:
+            return self.primary
+
+        replica = self._usable[self._next % len(self._usable)]
+        self._next += 1
+
+        return replica
+
+    async def refresh(self, *, force: bool = False) -> bool:
+        """
+        Check the lag of the replicas if check_interval passed since the
+        last check. Returns whether they were checked.
+        """
+        if not self.replicas or (not force and not self._check_due()):
+            return False
+
+        async with self._lock:
+            # another task may have checked them while we waited on the lock
+            if not force and not self._check_due():
+                return False
+
+            primary_lsn = await _current_wal_lsn(self.primary)
+            self.lags = tuple(
+                await asyncio.gather(
+                    *(_replica_lag(r, primary_lsn) for r in self.replicas)
+                )
+            )
+            self._usable = tuple(
+                replica
+                for replica, lag in zip(self.replicas, self.lags)
+                if lag is not None and lag <= self.max_lag
+            )
+            self._checked_at = time.monotonic()
+
+            return True
+
+    async def dispose(self):
+        for replica in self.replicas:
+            await replica.dispose()
+
+    def _check_due(self) -> bool:
+        return (
+            self._checked_at is None
+            or time.monotonic() - self._checked_at >= self.check_interval
+        )
+
+
+async def _current_wal_lsn(primary: AsyncEngine) -> str | None:
+    try:
+        async with primary.connect() as conn:
+            lsn = (
+                await conn.execute(text("SELECT pg_current_wal_lsn()::text"))
+            ).scalar()
+    except (OSError, DBAPIError) as e:
+        print(f"Could not check the WAL position of the primary: {e}")
+        return None
+
+    return None if lsn is None else str(lsn)
+
+
+async def _replica_lag(replica: AsyncEngine, primary_lsn: str | None) -> float | None:
+    """
+    The seconds since the last transaction the replica replayed, 0 if it
+    replayed everything the primary wrote up to primary_lsn.
+
+    Not compared to the WAL the replica received: a replica that stopped
+    streaming has replayed all of it, but not what the primary wrote since.
+    """
+    try:
+        async with replica.connect() as conn:
+            lag = (
+                await conn.execute(
+                    text(
+                        """
+                        SELECT CASE
+                                   WHEN NOT pg_is_in_recovery() THEN 0
+                                   -- caught up, the primary may just be idle
+                                   WHEN pg_last_wal_replay_lsn() >=
+                                        CAST(:primary_lsn AS pg_lsn) THEN 0
+                                   ELSE extract(EPOCH FROM
+                                                now() - pg_last_xact_replay_timestamp())
+                                   END
+                        """
+                    ),
+                    {"primary_lsn": primary_lsn},
+                )
+            ).scalar()
+    except (OSError, DBAPIError) as e:
+        print(f"Could not check the lag of a replica: {e}")
+        return None
+
+    return None if lag is None else float(lag)
+
+
+@lru_cache()
+def get_replica_router() -> ReplicaRouter:
+    settings = get_settings()
+
+    return ReplicaRouter(
+        get_async_engine(),
+        [create_engine_from_settings(dsn) for dsn in settings.postgresql_replica_dsns],
+        max_lag=settings.replica_max_lag,
+        check_interval=settings.replica_check_interval,
+    )
+
+
+@lru_cache()
+def get_sessionmaker() -> async_sessionmaker[AsyncSession]:
+    return async_sessionmaker(get_async_engine(), expire_on_commit=False)
+
+
+@asynccontextmanager
+async def read_session() -> AsyncIterator[AsyncSession]:
+    """
+    A session for the read-heavy queries (e.g. on the materialized views),
+    in read-only transactions on the next usable replica.
+    """
+    read_engine = await get_replica_router().engine()
+
+    async with get_sessionmaker()(bind=read_engine) as session:
+        yield session
+
+
+async def dispose_engines():
+    """
+    Close the pooled connections, the next use creates new engines.
+    """
+    if get_replica_router.cache_info().currsize:
+        await get_replica_router().dispose()
+
+    if get_async_engine.cache_info().currsize:
+        await get_async_engine().dispose()
+
+    get_sessionmaker.cache_clear()
+    get_replica_router.cache_clear()
+    get_async_engine.cache_clear()
+
+
+__all__ = [
+    "ReplicaRouter",
+    "create_engine_from_settings",
+    "get_async_engine",
+    "get_replica_router",
+    "get_sessionmaker",
+    "read_session",
+    "dispose_engines",
+]
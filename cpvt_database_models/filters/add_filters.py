@@ -1,21 +1,109 @@
+import argparse
 import asyncio
 import os
+from collections.abc import Callable, Iterable
 
-from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
 
-from cpvt_database_models.models.views import add_views_pg
-from cpvt_database_models.settings import get_settings
+from cpvt_database_models.database.engine import get_async_engine
+from cpvt_database_models.models.views.add_views import StatementTiming, execute_file
+from cpvt_database_models.models.views.report import BuildReport
 
+_SQL_DIR = os.path.join(os.path.dirname(__file__), "sql")
 
-async def add_filters_main():  # pragma: no cover
-    asyncio_engine = create_async_engine(get_settings().postgresql_dsn)
-    base_dir = os.path.join(os.path.dirname(__file__), "sql")
+# defines build_ui_filter, which every filter group uses
+_UI_FILTER_FILE = "01_ui_filter.sql"
 
-    async with asyncio_engine.begin() as conn:
-        await add_views_pg(conn, base_dir)
+# the sql file that writes the filters of each group into kv_store
+FILTER_GROUPS = {
+    "variants": "02_variant_filters.sql",
+    "proteins": "03_protein_filters.sql",
+    "individuals": "04_individuals_filters.sql",
+}
+
+
+async def rebuild_filters(
+    session: AsyncSession | AsyncConnection,
+    only: Iterable[str] | None = None,
+    *,
+    single_round_trip: bool = True,
+    instrument: Callable[[StatementTiming], None] | None = None,
+) -> list[StatementTiming]:
+    """
+    Rebuild the filters of the groups in only (every group in FILTER_GROUPS
+    by default) and commit, e.g. only=["variants"] after variant_view_mv
+    was refreshed. Returns how long each statement took.
+    """
+    groups = list(FILTER_GROUPS) if only is None else list(only)
+    unknown = set(groups) - FILTER_GROUPS.keys()
+
+    if unknown:
+        raise ValueError(
+            f"Unknown filter groups {sorted(unknown)}, "
+            f"expected any of {list(FILTER_GROUPS)}"
+        )
+
+    sql_files = [_UI_FILTER_FILE] + [
+        sql_file for group, sql_file in FILTER_GROUPS.items() if group in groups
+    ]
+    timings = []
+
+    for sql_file in sql_files:
+        print(f"Executing {sql_file}")
+        timings += await execute_file(
+            session,
+            os.path.join(_SQL_DIR, sql_file),
+            single_round_trip=single_round_trip,
+            instrument=instrument,
+        )
+
+    await session.commit()
+
+    return timings
+
+
+async def add_filters_main(
+    *, only: list[str] | None = None, report_path: str | None = None
+):
+    """
+    Add the filters to the database in the settings. Every filter file is
+    sent as a single query, unless a report of the time every statement
+    took is written to report_path.
+    """
+    asyncio_engine = get_async_engine()
+    report = BuildReport()
+
+    # not engine.begin(), the build commits its own transaction
+    async with asyncio_engine.connect() as conn:
+        await rebuild_filters(
+            conn,
+            only,
+            single_round_trip=report_path is None,
+            instrument=report.record,
+        )
+        await report.describe_database(conn)
+
+    if report_path is not None:
+        report.save(report_path)
 
 
 if __name__ == "__main__":
-    asyncio.run(add_filters_main())
+    parser = argparse.ArgumentParser(description="Add the filters")
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        choices=list(FILTER_GROUPS),
+        default=None,
+        help="Only rebuild the filters of these groups",
+    )
+    parser.add_argument(
+        "--report",
+        type=str,
+        default=None,
+        help="Write the time every statement took as JSON to this path",
+    )
+    args = parser.parse_args()
+
+    asyncio.run(add_filters_main(only=args.only, report_path=args.report))
 
-__all__ = ["add_filters_main"]
+__all__ = ["FILTER_GROUPS", "rebuild_filters", "add_filters_main"]
@@ -0,0 +1,479 @@
+"""
+Faceted search over variant_view_mv.
+
+A selection is a list of the filters:variants filters whose values are the
+values the user selected. It is compiled into a single query that uses
+the GIN/GIST/btree indexes of variant_view_mv and returns a page of
+variants together with what the facet counts need, in one round trip.
+
+The low cardinality facets (the checkboxes) are counted in memory: the
+variant ids of every value are kept as a bitmap (a Python int with bit
+variant_id set), so a count is an AND and a popcount instead of a query.
+
+    search = FacetedSearch()
+    result = await search.search(session, selection, limit=25)
+"""
+
+import asyncio
+import datetime
+import math
+import time
+from collections.abc import Callable, Iterable, Sequence
+from typing import Any, NamedTuple
+
+from sqlalchemy import (
+    Integer,
+    Numeric,
+    Select,
+    Text,
+    and_,
+    column,
+    false,
+    func,
+    literal_column,
+    null,
+    or_,
+    select,
+    table,
+    text,
+    true,
+)
+from sqlalchemy.dialects.postgresql import INT4RANGE, JSONB, aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from sqlalchemy.sql.elements import ColumnElement
+
+from cpvt_database_models.models.kv_store import VIEWS_VERSION_KEY
+
+from .schema import FilterById, FilterByRange
+
+variant_view_mv = table(
+    "variant_view_mv",
+    column("variant_id", Integer),
+    column("hgvs_string", Text),
+    column("provenance", JSONB),
+    column("num_individuals", Integer),
+    column("avg_age_of_onset_cpvt", Numeric),
+    column("clinical_significance_id", Integer),
+    column("clinvar_conditions", JSONB),
+    column("individual_conditions", JSONB),
+    column("individual_treatments", JSONB),
+    column("g_edit_type_id", Integer),
+    column("g_pos_interval", INT4RANGE),
+    column("c_edit_type_id", Integer),
+    column("c_pos_interval", INT4RANGE),
+    column("p_edit_type_id", Integer),
+    column("p_pos_interval", INT4RANGE),
+    column("exons", INT4RANGE),
+    column("structure_domains", JSONB),
+)
+
+_c = variant_view_mv.c
+
+
+class Facet(NamedTuple):
+    query_param: str
+    where: Callable[[Any], ColumnElement[bool]]
+    """
+    The condition for the selected values: a list of ids for a FilterById,
+    the (min, max) of a FilterByRange (either may be None)
+    """
+
+    values: ColumnElement | None = None
+    """
+    The ids of a row as a JSONB array, for facets that are counted
+    """
+
+
+def _has_id(jsonb_column: ColumnElement, key: str) -> Callable[[list[int]], Any]:
+    # one @> per id, which the GIN index answers with a BitmapOr
+    return lambda ids: or_(*(jsonb_column.contains([{key: i}]) for i in ids))
+
+
+def _in(*columns: ColumnElement) -> Callable[[list[int]], Any]:
+    return lambda ids: or_(*(c.in_(ids) for c in columns))
+
+
+def _between(value_column: ColumnElement) -> Callable[[tuple], Any]:
+    def where(bounds: tuple[float | None, float | None]):
+        low, high = bounds
+
+        return and_(
+            value_column >= low if low is not None else true(),
+            value_column <= high if high is not None else true(),
+        )
+
+    return where
+
+
+def _overlaps(range_column: ColumnElement) -> Callable[[tuple], Any]:
+    def where(bounds: tuple[float | None, float | None]):
+        # the positions are integers and both bounds are inclusive
+        low = math.ceil(bounds[0]) if bounds[0] is not None else None
+        high = math.floor(bounds[1]) if bounds[1] is not None else None
+
+        # no integer in between, e.g. (3.5, 3.8) or min > max
+        if low is not None and high is not None and low > high:
+            return false()
+
+        return range_column.overlaps(func.int4range(low, high, "[]"))
+
+    return where
+
+
+def _contains_any(range_column: ColumnElement) -> Callable[[list[int]], Any]:
+    return lambda ids: or_(*(range_column.contains(i) for i in ids))
+
+
+# by the queryParam of the filters:variants filters
+VARIANT_FACETS = {
+    facet.query_param: facet
+    for facet in (
+        Facet(
+            "provenance",
+            _has_id(_c.provenance, "dataset_id"),
+            func.jsonb_path_query_array(
+                _c.provenance, literal_column("'$[*].dataset_id'::jsonpath")
+            ),
+        ),
+        Facet(
+            "editType",
+            _in(_c.g_edit_type_id, _c.c_edit_type_id, _c.p_edit_type_id),
+            func.jsonb_build_array(
+                _c.g_edit_type_id, _c.c_edit_type_id, _c.p_edit_type_id
+            ),
+        ),
+        Facet(
+            "clinicalSignificance",
+            _in(_c.clinical_significance_id),
+            func.jsonb_build_array(_c.clinical_significance_id),
+        ),
+        Facet("numIndividuals", _between(_c.num_individuals)),
+        Facet("avgAgeOfOnsetCpvt", _between(_c.avg_age_of_onset_cpvt)),
+        Facet("pPosInterval", _overlaps(_c.p_pos_interval)),
+        Facet("cPosInterval", _overlaps(_c.c_pos_interval)),
+        Facet("gPosInterval", _overlaps(_c.g_pos_interval)),
+        Facet("exonRange", _overlaps(_c.exons)),
+        Facet("exons", _contains_any(_c.exons)),
+        Facet("structureDomain", _has_id(_c.structure_domains, "structure_id")),
+        Facet("clinvarConditions", _has_id(_c.clinvar_conditions, "condition_id")),
+        Facet(
+            "individualConditions",
+            _has_id(_c.individual_conditions, "condition_id"),
+        ),
+        Facet(
+            "individualTreatments",
+            _has_id(_c.individual_treatments, "treatment_id"),
+        ),
+    )
+}
+
+Selection = Sequence[FilterById | FilterByRange]
+
+
+class FacetSearchResult(NamedTuple):
+    total: int
+    """
+    The number of variants that match the whole selection
+    """
+
+    variants: list[dict[str, Any]]
+    """
+    The rows of variant_view_mv in the page, as JSON
+    """
+
+    counts: dict[str, dict[int, int]]
+    """
+    The number of matching variants for every value of every counted facet,
+    if the selection of that facet itself was that value instead
+    """
+
+
+def bitmap(ids: Iterable[int]) -> int:
+    """
+    An int with the bits of ids set.
+    """
+    ids = list(ids)
+    bits = bytearray((max(ids) >> 3) + 1 if ids else 0)
+
+    for i in ids:
+        bits[i >> 3] |= 1 << (i & 7)
+
+    return int.from_bytes(bits, "little")
+
+
+def compile_selection(
+    selection: Selection, facets: dict[str, Facet] = VARIANT_FACETS
+) -> dict[str, ColumnElement[bool]]:
+    """
+    The condition of every facet in the selection, by queryParam. Filters
+    without any selected values are left out.
+    """
+    conditions = {}
+
+    for selected in selection:
+        facet = facets.get(selected.queryParam)
+
+        if facet is None:
+            raise ValueError(
+                f"Unknown filter {selected.queryParam!r}, "
+                f"expected any of {list(facets)}"
+            )
+
+        if not selected.values:
+            continue
+
+        if isinstance(selected, FilterByRange):
+            bounds = selected.values[0]
+
+            if bounds.min is None and bounds.max is None:
+                continue
+
+            conditions[facet.query_param] = facet.where((bounds.min, bounds.max))
+        else:
+            conditions[facet.query_param] = facet.where(
+                sorted({v.value for v in selected.values})
+            )
+
+    return conditions
+
+
+def compile_search(
+    conditions: dict[str, ColumnElement[bool]],
+    *,
+    counted: Iterable[str] = (),
+    order_by: str = "variant_id",
+    descending: bool = False,
+    limit: int = 25,
+    offset: int = 0,
+) -> Select:
+    """
+    A query for one row with
+
+    - base_ids: the ids of the variants that match the conditions of the
+      facets that are not counted (NULL if there are none)
+    - variants: a page of the variants that match all the conditions
+    """
+    if order_by not in _c:
+        raise ValueError(f"Can not order by {order_by!r}")
+
+    counted = set(counted)
+    base_conditions = [c for q, c in conditions.items() if q not in counted]
+    counted_conditions = [c for q, c in conditions.items() if q in counted]
+
+    # the default NULLS FIRST/LAST, so a btree index can be scanned either way
+    order = _c[order_by].desc() if descending else _c[order_by].asc()
+    # the order is unique with the primary key
+    tie_breaker = _c.variant_id.desc() if descending else _c.variant_id.asc()
+
+    page = (
+        select(
+            literal_column("variant_view_mv.*"),
+            func.row_number().over(order_by=[order, tie_breaker]).label("page_row"),
+        )
+        .select_from(variant_view_mv)
+        .where(*base_conditions, *counted_conditions)
+        .order_by(order, tie_breaker)
+        .limit(limit)
+        .offset(offset)
+        .subquery("page")
+    )
+
+    variants = (
+        select(
+            func.coalesce(
+                func.jsonb_agg(
+                    aggregate_order_by(
+                        func.to_jsonb(literal_column("page")).op("-")("page_row"),
+                        page.c.page_row,
+                    )
+                ),
+                text("'[]'::jsonb"),
+            )
+        )
+        .select_from(page)
+        .scalar_subquery()
+    )
+
+    base_ids: ColumnElement = null()
+
+    if base_conditions:
+        base_ids = (
+            select(func.array_agg(_c.variant_id))
+            .where(*base_conditions)
+            .scalar_subquery()
+        )
+
+    return select(base_ids.label("base_ids"), variants.label("variants"))
+
+
+class FacetedSearch:
+    """
+    Searches variant_view_mv with the counted facets kept as bitmaps in
+    memory.
+
+    The bitmaps are reloaded when the views are built or refreshed (the
+    VIEWS_VERSION_KEY row in kv_store) or the filters:variants row changes,
+    at most every check_interval seconds. Checking on every search would
+    cost a second round trip per search.
+    """
+
+    def __init__(
+        self,
+        facets: dict[str, Facet] = VARIANT_FACETS,
+        counted: tuple[str, ...] = ("provenance", "editType", "clinicalSignificance"),
+        check_interval: float = 5,
+    ):
+        self.facets = facets
+        self.counted = counted
+        self.check_interval = check_interval
+
+        self.all_ids = 0
+        self.bitmaps: dict[str, dict[int, int]] = {}
+
+        self._version: tuple[datetime.datetime | None, int] | None = None
+        self._checked_at: float | None = None
+        self._lock = asyncio.Lock()
+
+    async def refresh(
+        self, session: AsyncSession | AsyncConnection, *, force: bool = False
+    ) -> bool:
+        """
+        Reload the bitmaps if variant_view_mv was rebuilt. Returns whether
+        they were reloaded.
+        """
+        if (
+            not force
+            and self._checked_at is not None
+            and time.monotonic() - self._checked_at < self.check_interval
+        ):
+            return False
+
+        async with self._lock:
+            version = (
+                await session.execute(
+                    text(
+                        """
+                        SELECT max(updated_at), count(*)
+                        FROM kv_store
+                        WHERE key = ANY (:keys)
+                        """
+                    ),
+                    {"keys": ["filters:variants", VIEWS_VERSION_KEY]},
+                )
+            ).one()
+            self._checked_at = time.monotonic()
+
+            if not force and tuple(version) == self._version:
+                return False
+
+            await self._load(session)
+            self._version = (version[0], version[1])
+
+            return True
+
+    async def search(
+        self,
+        session: AsyncSession | AsyncConnection,
+        selection: Selection,
+        *,
+        order_by: str = "variant_id",
+        descending: bool = False,
+        limit: int = 25,
+        offset: int = 0,
+    ) -> FacetSearchResult:
+        """
+        A page of the variants that match the selection, with the total
+        and the counts of the counted facets.
+        """
+        conditions = compile_selection(selection, self.facets)
+
+        await self.refresh(session)
+
+        base_ids, variants = (
+            await session.execute(
+                compile_search(
+                    conditions,
+                    counted=self.counted,
+                    order_by=order_by,
+                    descending=descending,
+                    limit=limit,
+                    offset=offset,
+                )
+            )
+        ).one()
+
+        base = self.all_ids if base_ids is None else bitmap(base_ids) & self.all_ids
+
+        # the variants each counted facet allows, all if it is not selected
+        allowed = {query_param: self.all_ids for query_param in self.counted}
+
+        for selected in selection:
+            if (
+                isinstance(selected, FilterById)
+                and selected.queryParam in self.counted
+                and selected.values
+            ):
+                values = self.bitmaps[selected.queryParam]
+                allowed[selected.queryParam] = 0
+
+                for v in selected.values:
+                    allowed[selected.queryParam] |= values.get(v.value, 0)
+
+        matched = base
+
+        for ids in allowed.values():
+            matched &= ids
+
+        counts = {}
+
+        for query_param, values in self.bitmaps.items():
+            # the other facets' selections still apply to the counts
+            others = base
+
+            for other, ids in allowed.items():
+                if other != query_param:
+                    others &= ids
+
+            counts[query_param] = {
+                value: (others & ids).bit_count() for value, ids in values.items()
+            }
+
+        return FacetSearchResult(
+            total=matched.bit_count(), variants=variants, counts=counts
+        )
+
+    async def _load(self, session: AsyncSession | AsyncConnection):
+        counted = [self.facets[query_param] for query_param in self.counted]
+
+        rows = (
+            await session.execute(
+                select(_c.variant_id, *(facet.values for facet in counted))
+            )
+        ).all()
+
+        ids: dict[str, dict[int, list[int]]] = {f.query_param: {} for f in counted}
+
+        for variant_id, *values in rows:
+            for facet, facet_values in zip(counted, values):
+                for value in set(facet_values or ()):
+                    if value is not None:
+                        ids[facet.query_param].setdefault(value, []).append(variant_id)
+
+        self.all_ids = bitmap(row[0] for row in rows)
+        self.bitmaps = {
+            query_param: {value: bitmap(v) for value, v in sorted(values.items())}
+            for query_param, values in ids.items()
+        }
+
+
+__all__ = [
+    "Facet",
+    "FacetSearchResult",
+    "FacetedSearch",
+    "Selection",
+    "VARIANT_FACETS",
+    "bitmap",
+    "compile_search",
+    "compile_selection",
+    "variant_view_mv",
+]
@@ -0,0 +1,148 @@
+"""
+Loads the filters the filters/sql scripts write into the kv_store table.
+
+The filters are validated once per version of the kv_store rows and kept
+in memory, with their JSON pre-serialized for HTTP responses.
+"""
+
+import asyncio
+import datetime
+import time
+from functools import lru_cache
+from typing import Annotated, NamedTuple
+
+from pydantic import Field, TypeAdapter
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from .schema import FilterById, FilterByRange
+
+FILTER_KEYS = ("filters:variants", "filters:proteins", "filters:individuals")
+
+Filter = Annotated[FilterById | FilterByRange, Field(discriminator="component")]
+
+
+@lru_cache()
+def filters_adapter() -> TypeAdapter[list[Filter]]:
+    return TypeAdapter(list[Filter])
+
+
+class LoadedFilters(NamedTuple):
+    key: str
+    filters: tuple[Filter, ...]
+    json: bytes
+    """
+    The validated filters serialized as JSON (by alias)
+    """
+
+    updated_at: datetime.datetime
+
+
+class FilterRepository:
+    """
+    The filters of `keys`, loaded from the kv_store table in a single query.
+
+    Every get checks the latest updated_at of the keys (at most every
+    check_interval seconds) and only reloads the filters when it changed.
+    """
+
+    def __init__(self, keys: tuple[str, ...] = FILTER_KEYS, check_interval: float = 0):
+        self.keys = keys
+        self.check_interval = check_interval
+
+        self._filters: dict[str, LoadedFilters] = {}
+        self._version: tuple[datetime.datetime | None, int] | None = None
+        self._checked_at: float | None = None
+        self._lock = asyncio.Lock()
+
+    async def get(
+        self, session: AsyncSession | AsyncConnection, key: str
+    ) -> LoadedFilters:
+        """
+        The filters of key. Raises a KeyError if the key is not in kv_store.
+        """
+        await self.refresh(session)
+
+        return self._filters[key]
+
+    async def get_json(
+        self, session: AsyncSession | AsyncConnection, key: str
+    ) -> bytes:
+        return (await self.get(session, key)).json
+
+    async def refresh(
+        self, session: AsyncSession | AsyncConnection, *, force: bool = False
+    ) -> bool:
+        """
+        Reload the filters if they changed in kv_store. Returns whether they
+        were reloaded.
+        """
+        if (
+            not force
+            and self._checked_at is not None
+            and time.monotonic() - self._checked_at < self.check_interval
+        ):
+            return False
+
+        async with self._lock:
+            version = (
+                await session.execute(
+                    text(
+                        """
+                        SELECT max(updated_at), count(*)
+                        FROM kv_store
+                        WHERE key = ANY (:keys)
+                        """
+                    ),
+                    {"keys": list(self.keys)},
+                )
+            ).one()
+            self._checked_at = time.monotonic()
+
+            if not force and tuple(version) == self._version:
+                return False
+
+            self._filters = await self._load(session)
+            self._version = (version[0], version[1])
+
+            return True
+
+    async def _load(
+        self, session: AsyncSession | AsyncConnection
+    ) -> dict[str, LoadedFilters]:
+        adapter = filters_adapter()
+        rows = (
+            await session.execute(
+                text(
+                    """
+                    SELECT key, value::text, updated_at
+                    FROM kv_store
+                    WHERE key = ANY (:keys)
+                    """
+                ),
+                {"keys": list(self.keys)},
+            )
+        ).all()
+
+        loaded = {}
+
+        for key, value, updated_at in rows:
+            filters = adapter.validate_json(value)
+
+            loaded[key] = LoadedFilters(
+                key=key,
+                filters=tuple(filters),
+                json=adapter.dump_json(filters, by_alias=True),
+                updated_at=updated_at,
+            )
+
+        return loaded
+
+
+__all__ = [
+    "FILTER_KEYS",
+    "Filter",
+    "FilterRepository",
+    "LoadedFilters",
+    "filters_adapter",
+]
@@ -38,35 +38,78 @@ WITH provenance
                                    clinical_significance    AS label
                    FROM clinical_significance) AS c),
 
-     num_individuals_hist AS (SELECT jsonb_agg(h) AS histogram
-                              FROM (WITH n_bins AS (SELECT 30 AS n),
-                                         ranges
-                                             AS (SELECT MIN(num_individuals) AS min_val,
-                                                        MAX(num_individuals) AS max_val
-                                                 FROM variant_num_individuals_v),
-                                         bins
-                                             AS (SELECT generate_series(1,
-                                                                        (SELECT n
-                                                                         FROM n_bins)) AS bin),
-                                         histogram
-                                             AS (SELECT width_bucket(
-                                                                num_individuals,
-                                                                min_val + 1,
-                                                                max_val + 1,
-                                                                (SELECT n
-                                                                 FROM n_bins)) AS bin,
-                                                        ROUND(
-                                                                LOG(COUNT(variant_id) + 1)::numeric,
-                                                                2)             AS freq
-                                                 FROM variant_num_individuals_v,
-                                                      ranges
-                                                 GROUP BY bin)
-                                    SELECT bins.bin,
-                                           COALESCE(histogram.freq, 0) AS freq
-                                    FROM bins
-                                             LEFT JOIN
-                                         histogram ON bins.bin = histogram.bin
-                                    ORDER BY bins.bin) h),
+     -- every min/max of variant_view_mv in a single scan
+     variant_ranges
+         AS MATERIALIZED (SELECT MIN(num_individuals)             AS num_individuals_min,
+                                 MAX(num_individuals)             AS num_individuals_max,
+                                 MIN(avg_age_of_onset_cpvt)       AS avg_age_of_onset_cpvt_min,
+                                 MAX(avg_age_of_onset_cpvt)       AS avg_age_of_onset_cpvt_max,
+                                 MIN(lower(p_pos_interval))       AS p_pos_interval_min,
+                                 MAX(upper(p_pos_interval))       AS p_pos_interval_max,
+                                 MIN(lower(exons))                AS exon_start_min,
+                                 MAX(lower(exons))                AS exon_start_max,
+                                 MAX(upper(exons))                AS exon_end_max,
+                                 MIN(lower(c_pos_interval))       AS c_pos_interval_min,
+                                 MAX(upper(c_pos_interval))       AS c_pos_interval_max,
+                                 MIN(lower(g_pos_interval))       AS g_pos_interval_min,
+                                 MAX(upper(g_pos_interval))       AS g_pos_interval_max,
+                                 array_agg(DISTINCT lower(exons))
+                                 FILTER (WHERE exons IS NOT NULL) AS exon_starts
+                          FROM variant_view_mv),
+
+     -- the bin counts of every histogram in a second scan, one grouping set
+     -- per histogram (the bins of the other histograms are NULL in its rows)
+     variant_bins
+         AS MATERIALIZED (SELECT num_individuals_bin,
+                                 avg_age_of_onset_cpvt_bin,
+                                 p_pos_interval_bin,
+                                 exon_range_bin,
+                                 COUNT(variant_id) AS freq
+                          FROM (SELECT variant_id,
+                                       width_bucket(
+                                               num_individuals,
+                                               num_individuals_min + 1,
+                                               num_individuals_max + 1,
+                                               30)       AS num_individuals_bin,
+                                       CASE
+                                           WHEN num_individuals >= 1
+                                               THEN width_bucket(
+                                                   avg_age_of_onset_cpvt,
+                                                   avg_age_of_onset_cpvt_min,
+                                                   avg_age_of_onset_cpvt_max + 1,
+                                                   50)
+                                           END           AS avg_age_of_onset_cpvt_bin,
+                                       CASE
+                                           WHEN num_individuals >= 1
+                                               THEN width_bucket(
+                                                   lower(p_pos_interval),
+                                                   p_pos_interval_min,
+                                                   p_pos_interval_max + 1,
+                                                   50)
+                                           END           AS p_pos_interval_bin,
+                                       CASE
+                                           WHEN num_individuals >= 1
+                                               THEN width_bucket(
+                                                   lower(exons),
+                                                   exon_start_min,
+                                                   exon_start_max + 1,
+                                                   105)
+                                           END           AS exon_range_bin
+                                FROM variant_view_mv,
+                                     variant_ranges) b
+                          GROUP BY GROUPING SETS ( num_individuals_bin,
+                                                   avg_age_of_onset_cpvt_bin,
+                                                   p_pos_interval_bin,
+                                                   exon_range_bin )),
+
+     num_individuals_hist
+         AS (SELECT jsonb_agg(jsonb_build_object(
+                 'bin', bins.bin,
+                 'freq', COALESCE(ROUND(LOG(b.freq + 1)::numeric, 2), 0)
+                                  ) ORDER BY bins.bin) AS histogram
+             FROM generate_series(1, 30) AS bins(bin)
+                      LEFT JOIN variant_bins b
+                                ON bins.bin = b.num_individuals_bin),
 
      num_individuals
          AS (SELECT build_ui_filter(jsonb_agg(v), 'range', 'numIndividuals',
@@ -74,41 +117,18 @@ WITH provenance
                                     (SELECT histogram
                                      FROM num_individuals_hist)
                     ) AS num_individuals
-             FROM (SELECT MAX(num_individuals) AS max,
-                          MIN(num_individuals) AS min
-                   FROM variant_num_individuals_v) v),
-
-     avg_age_of_onset_cpvt_histogram AS (SELECT jsonb_agg(h) AS histogram
-                                         FROM (WITH n_bins AS (SELECT 50 AS n),
-                                                    ranges
-                                                        AS (SELECT MIN(avg_age_of_onset_cpvt)     AS min_val,
-                                                                   MAX(avg_age_of_onset_cpvt) + 1 AS max_val
-                                                            FROM variant_view_mv),
-                                                    bins
-                                                        AS (SELECT generate_series(
-                                                                           1,
-                                                                           (SELECT n
-                                                                            FROM n_bins)
-                                                                   ) AS bin),
-                                                    histogram
-                                                        AS (SELECT width_bucket(
-                                                                           avg_age_of_onset_cpvt,
-                                                                           min_val,
-                                                                           max_val,
-                                                                           (SELECT n
-                                                                            FROM n_bins)
-                                                                   )                 AS bin,
-                                                                   COUNT(variant_id) AS freq
-                                                            FROM variant_view_mv,
-                                                                 ranges
-                                                            WHERE variant_view_mv.num_individuals >= 1
-                                                            GROUP BY bin)
-                                               SELECT bins.bin,
-                                                      COALESCE(histogram.freq, 0) AS freq
-                                               FROM bins
-                                                        LEFT JOIN
-                                                    histogram ON bins.bin = histogram.bin
-                                               ORDER BY bins.bin) h),
+             FROM (SELECT num_individuals_max AS max,
+                          num_individuals_min AS min
+                   FROM variant_ranges) v),
+
+     avg_age_of_onset_cpvt_histogram
+         AS (SELECT jsonb_agg(jsonb_build_object(
+                 'bin', bins.bin,
+                 'freq', COALESCE(b.freq, 0)
+                                  ) ORDER BY bins.bin) AS histogram
+             FROM generate_series(1, 50) AS bins(bin)
+                      LEFT JOIN variant_bins b
+                                ON bins.bin = b.avg_age_of_onset_cpvt_bin),
 
      avg_age_of_onset_cpvt
          AS (SELECT build_ui_filter(jsonb_agg(v), 'range', 'avgAgeOfOnsetCpvt',
@@ -118,41 +138,18 @@ WITH provenance
                                     description := 'Age of onset is the age at which the first symptoms of CPVT were observed.'
                     ) AS avg_age_of_onset_cpvt
 
-             FROM (SELECT CEIL(MAX(avg_age_of_onset_cpvt))  AS max,
-                          FLOOR(MIN(avg_age_of_onset_cpvt)) AS min
-                   FROM variant_view_mv
-                   WHERE avg_age_of_onset_cpvt IS NOT NULL) v),
-
-     p_pos_interval_histogram AS (SELECT jsonb_agg(h) AS histogram
-                                  FROM (WITH n_bins AS (SELECT 50 AS n),
-                                             ranges
-                                                 AS (SELECT MIN(lower(p_pos_interval))     AS min_val,
-                                                            MAX(upper(p_pos_interval)) + 1 AS max_val
-                                                     FROM variant_view_mv),
-                                             bins
-                                                 AS (SELECT generate_series(1,
-                                                                            (SELECT n
-                                                                             FROM n_bins)
-                                                            ) AS bin),
-                                             histogram
-                                                 AS (SELECT width_bucket(
-                                                                    lower(p_pos_interval),
-                                                                    min_val,
-                                                                    max_val,
-                                                                    (SELECT n
-                                                                     FROM n_bins)
-                                                            )                 AS bin,
-                                                            COUNT(variant_id) AS freq
-                                                     FROM variant_view_mv,
-                                                          ranges
-                                                     WHERE variant_view_mv.num_individuals >= 1
-                                                     GROUP BY bin)
-                                        SELECT bins.bin,
-                                               COALESCE(histogram.freq, 0) AS freq
-                                        FROM bins
-                                                 LEFT JOIN
-                                             histogram ON bins.bin = histogram.bin
-                                        ORDER BY bins.bin) h),
+             FROM (SELECT CEIL(avg_age_of_onset_cpvt_max)  AS max,
+                          FLOOR(avg_age_of_onset_cpvt_min) AS min
+                   FROM variant_ranges) v),
+
+     p_pos_interval_histogram
+         AS (SELECT jsonb_agg(jsonb_build_object(
+                 'bin', bins.bin,
+                 'freq', COALESCE(b.freq, 0)
+                                  ) ORDER BY bins.bin) AS histogram
+             FROM generate_series(1, 50) AS bins(bin)
+                      LEFT JOIN variant_bins b
+                                ON bins.bin = b.p_pos_interval_bin),
      p_pos_interval
          AS (SELECT build_ui_filter(jsonb_agg(p), 'range', 'pPosInterval',
                                     'Protein Change Position', 6,
@@ -160,10 +157,9 @@ WITH provenance
                                      FROM p_pos_interval_histogram),
                                     description := 'The position(s) of the amino acid(s) affected by the variant.'
                     ) AS p_pos_interval
-             FROM (SELECT MIN(lower(p_pos_interval))     AS min,
-                          MAX(upper(p_pos_interval)) - 1 AS max
-                   FROM variant_view_mv
-                   WHERE p_pos_interval IS NOT NULL) AS p),
+             FROM (SELECT p_pos_interval_min     AS min,
+                          p_pos_interval_max - 1 AS max
+                   FROM variant_ranges) AS p),
 
      -- structure domains
      structure_domain AS (SELECT build_ui_filter(jsonb_agg(s), 'combobox',
@@ -182,30 +178,14 @@ WITH provenance
                                                     END      AS label
                                 FROM structure) AS s),
 
-     exon_range_histogram AS (SELECT jsonb_agg(h) AS histogram
-                              FROM (WITH ranges
-                                             AS (SELECT MIN(lower(exons))     AS min_val,
-                                                        MAX(lower(exons)) + 1 AS max_val
-                                                 FROM variant_view_mv),
-                                         bins
-                                             AS (SELECT generate_series(1, 105) AS bin),
-                                         histogram
-                                             AS (SELECT width_bucket(
-                                                                lower(exons),
-                                                                min_val,
-                                                                max_val,
-                                                                105)      AS bin,
-                                                        COUNT(variant_id) AS freq
-                                                 FROM variant_view_mv,
-                                                      ranges
-                                                 WHERE variant_view_mv.num_individuals >= 1
-                                                 GROUP BY bin)
-                                    SELECT bins.bin,
-                                           COALESCE(histogram.freq, 0) AS freq
-                                    FROM bins
-                                             LEFT JOIN
-                                         histogram ON bins.bin = histogram.bin
-                                    ORDER BY bins.bin) h),
+     exon_range_histogram
+         AS (SELECT jsonb_agg(jsonb_build_object(
+                 'bin', bins.bin,
+                 'freq', COALESCE(b.freq, 0)
+                                  ) ORDER BY bins.bin) AS histogram
+             FROM generate_series(1, 105) AS bins(bin)
+                      LEFT JOIN variant_bins b
+                                ON bins.bin = b.exon_range_bin),
      -- exons (RANGE INPUT)
      exon_range
          AS (SELECT build_ui_filter(jsonb_agg(e), 'range', 'exonRange',
@@ -213,19 +193,19 @@ WITH provenance
                                     (SELECT histogram
                                      FROM exon_range_histogram)) AS exon_range
 
-             FROM (SELECT MIN(lower(exons))     AS min,
-                          MAX(upper(exons)) - 1 AS max
-                   FROM variant_view_mv) e),
+             FROM (SELECT exon_start_min   AS min,
+                          exon_end_max - 1 AS max
+                   FROM variant_ranges) e),
 
-     exon AS (SELECT build_ui_filter(jsonb_agg(e), 'combobox', 'exons',
+     exon AS (SELECT build_ui_filter(jsonb_agg(e ORDER BY e.value), 'combobox',
+                                     'exons',
                                      'Exons Affected', 9,
                                      shortlabel := 'exons') AS exon
 
-              FROM (SELECT DISTINCT lower(exons)            AS value,
-                                    'Exon ' || lower(exons) AS label
-                    FROM variant_view_mv
-                    WHERE exons IS NOT NULL
-                    ORDER BY value) e),
+              FROM (SELECT value,
+                           'Exon ' || value AS label
+                    FROM variant_ranges,
+                         unnest(exon_starts) AS value) e),
 
      clinvar_conditions AS (SELECT build_ui_filter(jsonb_agg(c), 'combobox',
                                                    'clinvarConditions',
@@ -305,10 +285,9 @@ WITH provenance
                                     description := 'The position(s) of the nucleotide(s) affected by the variant.'
                     ) AS c_pos_interval
 
-             FROM (SELECT MIN(lower(c_pos_interval))     AS min,
-                          MAX(upper(c_pos_interval)) - 1 AS max
-                   FROM variant_view_mv
-                   WHERE c_pos_interval IS NOT NULL) AS c),
+             FROM (SELECT c_pos_interval_min     AS min,
+                          c_pos_interval_max - 1 AS max
+                   FROM variant_ranges) AS c),
 
      g_pos_interval
          AS (SELECT build_ui_filter(jsonb_agg(g), 'range', 'gPosInterval',
@@ -317,10 +296,9 @@ WITH provenance
                                     description := 'The position(s) of the nucleotide(s) affected by the variant.'
                     ) AS g_pos_interval
 
-             FROM (SELECT MIN(lower(g_pos_interval))     AS min,
-                          MAX(upper(g_pos_interval)) - 1 AS max
-                   FROM variant_view_mv
-                   WHERE g_pos_interval IS NOT NULL) AS g),
+             FROM (SELECT g_pos_interval_min     AS min,
+                          g_pos_interval_max - 1 AS max
+                   FROM variant_ranges) AS g),
 
 
 -- make it into 1 row
@@ -5,31 +5,59 @@ WHERE key = 'filters:individuals';
 --- NEW STATEMENT
 
 WITH
+    -- every min/max of individuals_mv in a single scan
+    individuals_ranges
+        AS MATERIALIZED (SELECT MIN(publication_year)              AS publication_year_min,
+                                MAX(publication_year)              AS publication_year_max,
+                                MIN(p_pos_start)                   AS p_pos_start_min,
+                                MAX(p_pos_start)                   AS p_pos_start_max,
+                                MIN(exon_start)                    AS exon_start_min,
+                                MAX(exon_start)                    AS exon_start_max,
+                                MAX(exon_end)                      AS exon_end_max,
+                                array_agg(DISTINCT exon_start)
+                                FILTER (WHERE exon_start IS NOT NULL) AS exon_starts
+                         FROM individuals_mv),
+
+    -- the bin counts of every histogram in a second scan, one grouping set
+    -- per histogram (the bins of the other histograms are NULL in its rows)
+    individuals_bins
+        AS MATERIALIZED (SELECT publication_year_bin,
+                                p_pos_interval_bin,
+                                exon_range_bin,
+                                COUNT(publication_id) AS publication_freq,
+                                COUNT(individual_id)  AS freq
+                         FROM (SELECT individual_id,
+                                      publication_id,
+                                      width_bucket(
+                                              publication_year,
+                                              publication_year_min,
+                                              publication_year_max + 1,
+                                              30)  AS publication_year_bin,
+                                      width_bucket(
+                                              p_pos_start,
+                                              p_pos_start_min,
+                                              p_pos_start_max + 1,
+                                              50)  AS p_pos_interval_bin,
+                                      width_bucket(
+                                              exon_start,
+                                              exon_start_min,
+                                              exon_start_max + 1,
+                                              105) AS exon_range_bin
+                               FROM individuals_mv,
+                                    individuals_ranges) b
+                         GROUP BY GROUPING SETS ( publication_year_bin,
+                                                  p_pos_interval_bin,
+                                                  exon_range_bin )),
+
     -- PUBLICATION
-    publication_year_histogram AS (SELECT jsonb_agg(h) AS histogram
-                                   FROM (WITH n_bins AS (SELECT 30 AS n),
-                                              ranges
-                                                  AS (SELECT MIN(publication_year) AS min_val,
-                                                             MAX(publication_year) AS max_val
-                                                      FROM individuals_mv),
-                                              bins
-                                                  AS (SELECT generate_series(1, (SELECT n FROM n_bins)) AS bin),
-                                              histogram
-                                                  AS (SELECT width_bucket(
-                                                                     publication_year,
-                                                                     min_val,
-                                                                     max_val +
-                                                                     1,
-                                                                     (SELECT n FROM n_bins)) AS bin,
-                                                             COUNT(publication_id)           AS freq
-                                                      FROM individuals_mv,
-                                                           ranges
-                                                      GROUP BY bin)
-                                         SELECT bins.bin,
-                                                COALESCE(histogram.freq, 0) AS freq
-                                         FROM bins
-                                                  LEFT JOIN histogram ON bins.bin = histogram.bin
-                                         ORDER BY bins.bin) h),
+    publication_year_histogram
+        AS (SELECT jsonb_agg(jsonb_build_object(
+                'bin', bins.bin,
+                'freq', COALESCE(b.publication_freq, 0)
+                                 ) ORDER BY bins.bin) AS histogram
+            FROM generate_series(1, 30) AS bins(bin)
+                     LEFT JOIN individuals_bins b
+                               ON bins.bin = b.publication_year_bin),
     publication_year AS (SELECT build_ui_filter(
                                         jsonb_agg(p), 'range',
                                         'publicationYear', 'Publication Year',
@@ -38,9 +66,9 @@ WITH
                                         description := 'The year the patient was published in an article.'
                                 )
                                     AS publication_year
-                         FROM (SELECT MIN(publication_year) AS min,
-                                      MAX(publication_year) AS max
-                               FROM individuals_mv) p),
+                         FROM (SELECT publication_year_min AS min,
+                                      publication_year_max AS max
+                               FROM individuals_ranges) p),
 
     -- DEMOGRAPHICS
     sex AS (SELECT build_ui_filter(jsonb_agg(s), 'checkboxes', 'sex', 'Sex', 2)
@@ -60,30 +88,28 @@ WITH
                          WHERE ic.has_condition = TRUE
                            AND c.condition LIKE
                                'Catecholaminergic polymorphic ventricular tachycardia%'),
-    cpvt_age_of_onset_histogram AS (SELECT jsonb_agg(h) AS histogram
-                                    FROM (WITH n_bins AS (SELECT 30 AS n),
-                                               ranges
-                                                   AS (SELECT MIN(age_of_onset) AS min_val,
-                                                              MAX(age_of_onset) AS max_val
-                                                       FROM individuals_cpvt AS ic),
-                                               bins
-                                                   AS (SELECT generate_series(1, (SELECT n FROM n_bins)) AS bin),
-                                               histogram
-                                                   AS (SELECT width_bucket(
-                                                                      age_of_onset,
-                                                                      min_val,
-                                                                      max_val +
-                                                                      1,
-                                                                      (SELECT n FROM n_bins)) AS bin,
-                                                              COUNT(individual_id)            AS freq
-                                                       FROM individuals_cpvt,
-                                                            ranges
-                                                       GROUP BY bin)
-                                          SELECT bins.bin,
-                                                 COALESCE(histogram.freq, 0) AS freq
-                                          FROM bins
-                                                   LEFT JOIN histogram ON bins.bin = histogram.bin
-                                          ORDER BY bins.bin) h),
+    cpvt_age_of_onset_ranges
+        AS MATERIALIZED (SELECT MIN(age_of_onset) AS min_val,
+                                MAX(age_of_onset) AS max_val
+                         FROM individuals_cpvt),
+    cpvt_age_of_onset_bins
+        AS (SELECT width_bucket(
+                           age_of_onset,
+                           min_val,
+                           max_val + 1,
+                           30)              AS bin,
+                   COUNT(individual_id) AS freq
+            FROM individuals_cpvt,
+                 cpvt_age_of_onset_ranges
+            GROUP BY 1),
+    cpvt_age_of_onset_histogram
+        AS (SELECT jsonb_agg(jsonb_build_object(
+                'bin', bins.bin,
+                'freq', COALESCE(b.freq, 0)
+                                 ) ORDER BY bins.bin) AS histogram
+            FROM generate_series(1, 30) AS bins(bin)
+                     LEFT JOIN cpvt_age_of_onset_bins b
+                               ON bins.bin = b.bin),
     cpvt_age_of_onset
         AS (SELECT build_ui_filter(jsonb_agg(a), 'range', 'cpvtAgeOfOnset',
                                    'CPVT Age of Onset', 3,
@@ -92,8 +118,8 @@ WITH
                                    description := 'The age at which the patient was diagnosed with Catecholaminergic Polymorphic Ventricular Tachycardia (CPVT).'
                    )
                        AS avg_age_of_onset_cpvt
-            FROM (SELECT MIN(age_of_onset) AS min, MAX(age_of_onset) AS max
-                  FROM individuals_cpvt) AS a),
+            FROM (SELECT min_val AS min, max_val AS max
+                  FROM cpvt_age_of_onset_ranges) AS a),
 
     individual_conditions_has
         AS (SELECT build_ui_filter(jsonb_agg(c), 'combobox',
@@ -152,29 +178,28 @@ WITH
                                       ON family_history_record.condition_id =
                                          condition.condition_id
                         WHERE condition.condition LIKE 'Sudden cardiac death%'),
-    fam_history_scd_histogram AS (SELECT jsonb_agg(h) AS histogram
-                                  FROM (WITH n_bins AS (SELECT 30 AS n),
-                                             ranges
-                                                 AS (SELECT MIN(num_family_members) AS min_val,
-                                                            MAX(num_family_members) AS max_val
-                                                     FROM fam_history_scd),
-                                             bins
-                                                 AS (SELECT generate_series(1, (SELECT n FROM n_bins)) AS bin),
-                                             histogram AS (SELECT width_bucket(
-                                                                          num_family_members,
-                                                                          min_val,
-                                                                          max_val +
-                                                                          1,
-                                                                          (SELECT n FROM n_bins)) AS bin,
-                                                                  COUNT(family_history_record_id) AS freq
-                                                           FROM fam_history_scd,
-                                                                ranges
-                                                           GROUP BY bin)
-                                        SELECT bins.bin,
-                                               COALESCE(histogram.freq, 0) AS freq
-                                        FROM bins
-                                                 LEFT JOIN histogram ON bins.bin = histogram.bin
-                                        ORDER BY bins.bin) h),
+    fam_history_scd_ranges
+        AS MATERIALIZED (SELECT MIN(num_family_members) AS min_val,
+                                MAX(num_family_members) AS max_val
+                         FROM fam_history_scd),
+    fam_history_scd_bins
+        AS (SELECT width_bucket(
+                           num_family_members,
+                           min_val,
+                           max_val + 1,
+                           30)                         AS bin,
+                   COUNT(family_history_record_id) AS freq
+            FROM fam_history_scd,
+                 fam_history_scd_ranges
+            GROUP BY 1),
+    fam_history_scd_histogram
+        AS (SELECT jsonb_agg(jsonb_build_object(
+                'bin', bins.bin,
+                'freq', COALESCE(b.freq, 0)
+                                 ) ORDER BY bins.bin) AS histogram
+            FROM generate_series(1, 30) AS bins(bin)
+                     LEFT JOIN fam_history_scd_bins b
+                               ON bins.bin = b.bin),
     fam_history_scd_num_family_members AS (SELECT build_ui_filter(
                                                           jsonb_agg(a),
                                                           'range',
@@ -187,9 +212,9 @@ WITH
                                                           description :=
                                                               'The number of family members with a history of sudden cardiac death (SCD).'
                                                   ) AS num_family_members_scd
-                                           FROM (SELECT MIN(num_family_members) AS min,
-                                                        MAX(num_family_members) AS max
-                                                 FROM fam_history_scd) a),
+                                           FROM (SELECT min_val AS min,
+                                                        max_val AS max
+                                                 FROM fam_history_scd_ranges) a),
     mother_has_scd AS (SELECT build_ui_filter(
                                       jsonb_build_array(
                                               jsonb_build_object('value',
@@ -268,35 +293,14 @@ WITH
                   FROM variant_inheritance vi) AS i),
 
 
-    p_pos_interval_histogram AS (SELECT jsonb_agg(h) AS histogram
-                                 FROM (WITH n_bins AS (SELECT 50 AS n),
-                                            ranges
-                                                AS (SELECT MIN(p_pos_start)     AS min_val,
-                                                           MAX(p_pos_start) + 1 AS max_val
-                                                    FROM individuals_mv),
-                                            bins
-                                                AS (SELECT generate_series(1,
-                                                                           (SELECT n
-                                                                            FROM n_bins)
-                                                           ) AS bin),
-                                            histogram
-                                                AS (SELECT width_bucket(
-                                                                   p_pos_start,
-                                                                   min_val,
-                                                                   max_val,
-                                                                   (SELECT n
-                                                                    FROM n_bins)
-                                                           )                    AS bin,
-                                                           COUNT(individual_id) AS freq
-                                                    FROM individuals_mv,
-                                                         ranges
-                                                    GROUP BY bin)
-                                       SELECT bins.bin,
-                                              COALESCE(histogram.freq, 0) AS freq
-                                       FROM bins
-                                                LEFT JOIN
-                                            histogram ON bins.bin = histogram.bin
-                                       ORDER BY bins.bin) h),
+    p_pos_interval_histogram
+        AS (SELECT jsonb_agg(jsonb_build_object(
+                'bin', bins.bin,
+                'freq', COALESCE(b.freq, 0)
+                                 ) ORDER BY bins.bin) AS histogram
+            FROM generate_series(1, 50) AS bins(bin)
+                     LEFT JOIN individuals_bins b
+                               ON bins.bin = b.p_pos_interval_bin),
     p_pos_interval
         AS (SELECT build_ui_filter(jsonb_agg(p), 'range', 'pPosInterval',
                                    'Variant Protein Change Position', 13,
@@ -304,9 +308,9 @@ WITH
                                     FROM p_pos_interval_histogram),
                                    description := 'The position(s) of the amino acid(s) affected by the variant.'
                    ) AS p_pos_interval
-            FROM (SELECT MIN(p_pos_start)     AS min,
-                         MAX(p_pos_start) - 1 AS max
-                  FROM individuals_mv) AS p),
+            FROM (SELECT p_pos_start_min     AS min,
+                         p_pos_start_max - 1 AS max
+                  FROM individuals_ranges) AS p),
 
     structure_domain AS (SELECT build_ui_filter(jsonb_agg(s), 'combobox',
                                                 'structureDomain',
@@ -324,29 +328,14 @@ WITH
                                                    END      AS label
                                FROM structure) AS s),
 
-    exon_range_histogram AS (SELECT jsonb_agg(h) AS histogram
-                             FROM (WITH ranges
-                                            AS (SELECT MIN(exon_start)     AS min_val,
-                                                       MAX(exon_start) + 1 AS max_val
-                                                FROM individuals_mv),
-                                        bins
-                                            AS (SELECT generate_series(1, 105) AS bin),
-                                        histogram
-                                            AS (SELECT width_bucket(
-                                                               exon_start,
-                                                               min_val,
-                                                               max_val,
-                                                               105)         AS bin,
-                                                       COUNT(individual_id) AS freq
-                                                FROM individuals_mv,
-                                                     ranges
-                                                GROUP BY bin)
-                                   SELECT bins.bin,
-                                          COALESCE(histogram.freq, 0) AS freq
-                                   FROM bins
-                                            LEFT JOIN
-                                        histogram ON bins.bin = histogram.bin
-                                   ORDER BY bins.bin) h),
+    exon_range_histogram
+        AS (SELECT jsonb_agg(jsonb_build_object(
+                'bin', bins.bin,
+                'freq', COALESCE(b.freq, 0)
+                                 ) ORDER BY bins.bin) AS histogram
+            FROM generate_series(1, 105) AS bins(bin)
+                     LEFT JOIN individuals_bins b
+                               ON bins.bin = b.exon_range_bin),
     -- exons (RANGE INPUT)
     exon_range
         AS (SELECT build_ui_filter(jsonb_agg(e), 'range', 'exonRange',
@@ -356,19 +345,19 @@ WITH
                                    true
                    ) AS exon_range
 
-            FROM (SELECT MIN(exon_start)   AS min,
-                         MAX(exon_end) - 1 AS max
-                  FROM individuals_mv) e),
+            FROM (SELECT exon_start_min   AS min,
+                         exon_end_max - 1 AS max
+                  FROM individuals_ranges) e),
 
-    exon AS (SELECT build_ui_filter(jsonb_agg(e), 'combobox', 'exons',
+    exon AS (SELECT build_ui_filter(jsonb_agg(e ORDER BY e.value), 'combobox',
+                                    'exons',
                                     'Variant Exons Affected', 16, null,
                                     true, shortlabel := 'exons') AS exon
 
-             FROM (SELECT DISTINCT exon_start            AS value,
-                                   'Exon ' || exon_start AS label
-                   FROM individuals_mv
-                   WHERE exon_start IS NOT NULL
-                   ORDER BY value) e),
+             FROM (SELECT value,
+                          'Exon ' || value AS label
+                   FROM individuals_ranges,
+                        unnest(exon_starts) AS value) e),
 
 
 -- make it into 1 row
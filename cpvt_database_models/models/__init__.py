@@ -1,52 +1,129 @@
 """
 The SQLAlchemy models for the CPVT website.
+
+The models are only imported the first time they are used. Call
+load_models() to register all their tables in BaseBase.metadata.
 """
 
-from .individuals import (
-    IndividualCondition,
-    VariantInheritance,
-    Zygosity,
-    IndividualVariant,
-    IndividualVariantConditionLink,
-    FamilyHistoryRecord,
-    KinshipName,
-    FamilyMemberHistory,
-    Individual,
-    IndividualSex,
-    IndividualOriginalExcelRow,
-    IndividualToPublication,
-    Treatment,
-    TreatmentRecord,
-)
-from .uta import (
-    TranscriptUta,
-    SeqAnnoUta,
-    GeneUta,
-)
-from .variants import (
-    SequenceVariantDb,
-    EditType,
-    ProteinConsequence,
-    edit_type_ids,
-    Structure,
-    StructureRoot,
-    StructureRootToProtein,
-    Variant,
-    ClinVarVariantLinkedCondition,
-    VariantsDataset,
-    DatasetVariant,
-    PublicationVariant,
-    VariantClinVarInfo,
-    ClinicalSignificance,
-)
-from .conditions import (
-    Condition,
-    ConditionSynonym,
-)
-from .kv_store import (
-    KVStore,
+import sys
+from typing import TYPE_CHECKING
+
+from sqlalchemy import event
+from sqlalchemy.orm import Mapper
+
+from ._lazy import lazy_getattr
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .individuals import (
+        IndividualCondition,
+        VariantInheritance,
+        Zygosity,
+        IndividualVariant,
+        IndividualVariantConditionLink,
+        FamilyHistoryRecord,
+        KinshipName,
+        FamilyMemberHistory,
+        Individual,
+        IndividualSex,
+        IndividualOriginalExcelRow,
+        IndividualToPublication,
+        Treatment,
+        TreatmentRecord,
+    )
+    from .uta import (
+        TranscriptUta,
+        SeqAnnoUta,
+        GeneUta,
+    )
+    from .variants import (
+        SequenceVariantDb,
+        EditType,
+        ProteinConsequence,
+        edit_type_ids,
+        Structure,
+        StructureRoot,
+        StructureRootToProtein,
+        Variant,
+        VariantIndividualCount,
+        VariantViewDirty,
+        ClinVarVariantLinkedCondition,
+        VariantsDataset,
+        DatasetVariant,
+        PublicationVariant,
+        VariantClinVarInfo,
+        ClinicalSignificance,
+    )
+    from .conditions import (
+        Condition,
+        ConditionSynonym,
+    )
+    from .kv_store import (
+        KVStore,
+    )
+    from .publication import Publication, PublicationDatabase, PublicationToDatabase
+
+__getattr__ = lazy_getattr(
+    __name__,
+    {
+        "IndividualCondition": ".individuals",
+        "VariantInheritance": ".individuals",
+        "Zygosity": ".individuals",
+        "IndividualVariant": ".individuals",
+        "IndividualVariantConditionLink": ".individuals",
+        "FamilyHistoryRecord": ".individuals",
+        "KinshipName": ".individuals",
+        "FamilyMemberHistory": ".individuals",
+        "Individual": ".individuals",
+        "IndividualSex": ".individuals",
+        "IndividualOriginalExcelRow": ".individuals",
+        "IndividualToPublication": ".individuals",
+        "Treatment": ".individuals",
+        "TreatmentRecord": ".individuals",
+        "TranscriptUta": ".uta",
+        "SeqAnnoUta": ".uta",
+        "GeneUta": ".uta",
+        "SequenceVariantDb": ".variants",
+        "EditType": ".variants",
+        "ProteinConsequence": ".variants",
+        "edit_type_ids": ".variants",
+        "Structure": ".variants",
+        "StructureRoot": ".variants",
+        "StructureRootToProtein": ".variants",
+        "Variant": ".variants",
+        "VariantIndividualCount": ".variants",
+        "VariantViewDirty": ".variants",
+        "ClinVarVariantLinkedCondition": ".variants",
+        "VariantsDataset": ".variants",
+        "DatasetVariant": ".variants",
+        "PublicationVariant": ".variants",
+        "Condition": ".conditions",
+        "ConditionSynonym": ".conditions",
+        "KVStore": ".kv_store",
+        "Publication": ".publication",
+        "PublicationDatabase": ".publication",
+        "PublicationToDatabase": ".publication",
+        "VariantClinVarInfo": ".variants",
+        "ClinicalSignificance": ".variants",
+    },
 )
-from .publication import Publication, PublicationDatabase, PublicationToDatabase
+
+
+def load_models():
+    """
+    Import every model, which registers all the tables in BaseBase.metadata
+    (e.g. before metadata.create_all).
+    """
+    package = sys.modules[__name__]
+
+    for name in __all__:
+        getattr(package, name)
+
+
+@event.listens_for(Mapper, "before_configured")
+def _load_models_before_configured():
+    # the relationships of a model can refer to models that were not used yet
+    load_models()
+
 
 __all__ = [
     "IndividualCondition",
@@ -74,6 +151,8 @@ __all__ = [
     "StructureRoot",
     "StructureRootToProtein",
     "Variant",
+    "VariantIndividualCount",
+    "VariantViewDirty",
     "ClinVarVariantLinkedCondition",
     "VariantsDataset",
     "DatasetVariant",
@@ -86,4 +165,5 @@ __all__ = [
     "PublicationToDatabase",
     "VariantClinVarInfo",
     "ClinicalSignificance",
+    "load_models",
 ]
@@ -0,0 +1,36 @@
+"""
+Lazy exports for the model packages (PEP 562).
+
+A package only imports the module of a model the first time the model is
+used, so e.g. a job that only uses KVStore never imports the variant
+models. The relationships refer to the other models by name, so
+cpvt_database_models.models loads every model before the mappers are
+configured.
+"""
+
+import importlib
+import sys
+from collections.abc import Callable, Mapping
+from typing import Any
+
+
+def lazy_getattr(package: str, exports: Mapping[str, str]) -> Callable[[str], Any]:
+    """
+    A module __getattr__ for package that imports each name from its module
+    in exports (relative to package) the first time it is used.
+    """
+
+    def __getattr__(name: str) -> Any:
+        if name not in exports:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+
+        value = getattr(importlib.import_module(exports[name], package), name)
+        # the next lookup finds it without calling __getattr__
+        setattr(sys.modules[package], name, value)
+
+        return value
+
+    return __getattr__
+
+
+__all__ = ["lazy_getattr"]
@@ -1,24 +1,49 @@
-from .association_tables import (
-    IndividualCondition,
-    VariantInheritance,
-    Zygosity,
-    IndividualVariant,
-    IndividualVariantConditionLink,
-)
-from .family_history import FamilyHistoryRecord
-from .family_history_kin import (
-    KinshipName,
-    FamilyMemberHistory,
-)
-from .individual import (
-    Individual,
-    IndividualSex,
-    IndividualOriginalExcelRow,
-    IndividualToPublication,
-)
-from .treatments import (
-    Treatment,
-    TreatmentRecord,
+from typing import TYPE_CHECKING
+
+from cpvt_database_models.models._lazy import lazy_getattr
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .association_tables import (
+        IndividualCondition,
+        VariantInheritance,
+        Zygosity,
+        IndividualVariant,
+        IndividualVariantConditionLink,
+    )
+    from .family_history import FamilyHistoryRecord
+    from .family_history_kin import (
+        KinshipName,
+        FamilyMemberHistory,
+    )
+    from .individual import (
+        Individual,
+        IndividualSex,
+        IndividualOriginalExcelRow,
+        IndividualToPublication,
+    )
+    from .treatments import (
+        Treatment,
+        TreatmentRecord,
+    )
+
+__getattr__ = lazy_getattr(
+    __name__,
+    {
+        "IndividualCondition": ".association_tables",
+        "VariantInheritance": ".association_tables",
+        "Zygosity": ".association_tables",
+        "IndividualVariant": ".association_tables",
+        "IndividualVariantConditionLink": ".association_tables",
+        "FamilyHistoryRecord": ".family_history",
+        "KinshipName": ".family_history_kin",
+        "FamilyMemberHistory": ".family_history_kin",
+        "Individual": ".individual",
+        "IndividualSex": ".individual",
+        "IndividualOriginalExcelRow": ".individual",
+        "IndividualToPublication": ".individual",
+        "Treatment": ".treatments",
+        "TreatmentRecord": ".treatments",
+    },
 )
 
 __all__ = [
@@ -3,13 +3,29 @@ Contains association tables (and other tables that are related to the associatio
 tables for Individuals) to other tables NOT in the individuals directory.
 """
 
-from .individual_condition import IndividualCondition
-from .individual_variants import (
-    VariantInheritance,
-    Zygosity,
-    IndividualVariant,
+from typing import TYPE_CHECKING
+
+from cpvt_database_models.models._lazy import lazy_getattr
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .individual_condition import IndividualCondition
+    from .individual_variants import (
+        VariantInheritance,
+        Zygosity,
+        IndividualVariant,
+    )
+    from .individual_variant_condition_link import IndividualVariantConditionLink
+
+__getattr__ = lazy_getattr(
+    __name__,
+    {
+        "IndividualCondition": ".individual_condition",
+        "VariantInheritance": ".individual_variants",
+        "Zygosity": ".individual_variants",
+        "IndividualVariant": ".individual_variants",
+        "IndividualVariantConditionLink": ".individual_variant_condition_link",
+    },
 )
-from .individual_variant_condition_link import IndividualVariantConditionLink
 
 __all__ = [
     "IndividualCondition",
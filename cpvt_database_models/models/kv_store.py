@@ -1,23 +1,50 @@
-from sqlalchemy import Index
+import datetime
+
+from sqlalchemy import CheckConstraint, DateTime, Index, LargeBinary, text
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import mapped_column, Mapped
 
 from cpvt_database_models.database.base import Base
 
+# the row every build or refresh of the views touches, so readers of the
+# materialized views (e.g. FacetedSearch) can tell that they changed
+VIEWS_VERSION_KEY = "views:version"
+
 
 class KVStore(Base):
     __tablename__ = "kv_store"
 
     key: Mapped[str] = mapped_column(primary_key=True)
-    value: Mapped[dict] = mapped_column(JSONB)
+    value: Mapped[dict | None] = mapped_column(
+        JSONB, comment="The value as JSONB. Null if it is stored in value_bytes."
+    )
+    value_bytes: Mapped[bytes | None] = mapped_column(
+        LargeBinary,
+        comment="Large values as compressed JSON with a format version "
+        "(see cpvt_database_models.cache.codec)",
+    )
+    expires_at: Mapped[datetime.datetime | None] = mapped_column(
+        DateTime(timezone=True),
+        comment="When the value expires. Never expires if null.",
+    )
 
     __table_args__ = (
+        CheckConstraint(
+            "(value IS NULL) <> (value_bytes IS NULL)",
+            name="one_value",
+        ),
         Index(
             "ix_kv_store_updated_at",
             "updated_at",
             # use BRIN since these will almost always be inserted in order
             postgresql_using="brin",
         ),
+        Index(
+            "ix_kv_store_expires_at",
+            "expires_at",
+            # most keys (e.g. the filters) never expire
+            postgresql_where=text("expires_at IS NOT NULL"),
+        ),
         {
             "comment": "Key-Value store for storing arbitrary data and caching"
             " API responses without needing to spin up Redis",
@@ -25,4 +52,4 @@ class KVStore(Base):
     )
 
 
-__all__ = ["KVStore"]
+__all__ = ["KVStore", "VIEWS_VERSION_KEY"]
@@ -1,3 +1,17 @@
-from .uta_tables import TranscriptUta, SeqAnnoUta, GeneUta
+from typing import TYPE_CHECKING
+
+from cpvt_database_models.models._lazy import lazy_getattr
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .uta_tables import TranscriptUta, SeqAnnoUta, GeneUta
+
+__getattr__ = lazy_getattr(
+    __name__,
+    {
+        "TranscriptUta": ".uta_tables",
+        "SeqAnnoUta": ".uta_tables",
+        "GeneUta": ".uta_tables",
+    },
+)
 
 __all__ = ["TranscriptUta", "SeqAnnoUta", "GeneUta"]
@@ -2,22 +2,56 @@
 This module contains the classes for variants.
 """
 
-from .hgvs_variant import SequenceVariantDb, EditType, ProteinConsequence, edit_type_ids
-from .structure import (
-    Structure,
-    StructureRoot,
-    StructureRootToProtein,
-)
-from .variant import Variant
-from .variant_links import ClinVarVariantLinkedCondition
-from .variant_origins import (
-    VariantsDataset,
-    DatasetVariant,
-    PublicationVariant,
-)
-from .variant_properties import (
-    VariantClinVarInfo,
-    ClinicalSignificance,
+from typing import TYPE_CHECKING
+
+from cpvt_database_models.models._lazy import lazy_getattr
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .hgvs_variant import (
+        SequenceVariantDb,
+        EditType,
+        ProteinConsequence,
+        edit_type_ids,
+    )
+    from .structure import (
+        Structure,
+        StructureRoot,
+        StructureRootToProtein,
+    )
+    from .variant import Variant
+    from .variant_individual_count import VariantIndividualCount
+    from .variant_view_dirty import VariantViewDirty
+    from .variant_links import ClinVarVariantLinkedCondition
+    from .variant_origins import (
+        VariantsDataset,
+        DatasetVariant,
+        PublicationVariant,
+    )
+    from .variant_properties import (
+        VariantClinVarInfo,
+        ClinicalSignificance,
+    )
+
+__getattr__ = lazy_getattr(
+    __name__,
+    {
+        "SequenceVariantDb": ".hgvs_variant",
+        "EditType": ".hgvs_variant",
+        "ProteinConsequence": ".hgvs_variant",
+        "edit_type_ids": ".hgvs_variant",
+        "Structure": ".structure",
+        "StructureRoot": ".structure",
+        "StructureRootToProtein": ".structure",
+        "Variant": ".variant",
+        "VariantIndividualCount": ".variant_individual_count",
+        "VariantViewDirty": ".variant_view_dirty",
+        "ClinVarVariantLinkedCondition": ".variant_links",
+        "VariantsDataset": ".variant_origins",
+        "DatasetVariant": ".variant_origins",
+        "PublicationVariant": ".variant_origins",
+        "VariantClinVarInfo": ".variant_properties",
+        "ClinicalSignificance": ".variant_properties",
+    },
 )
 
 __all__ = [
@@ -29,6 +63,8 @@ __all__ = [
     "StructureRoot",
     "StructureRootToProtein",
     "Variant",
+    "VariantIndividualCount",
+    "VariantViewDirty",
     "ClinVarVariantLinkedCondition",
     "VariantsDataset",
     "DatasetVariant",
@@ -2,11 +2,59 @@
 This module contains the classes for HGVS package parsed variants.
 """
 
-from .sequence_variant import (
-    SequenceVariantDb,
-    EditType,
-    ProteinConsequence,
-    edit_type_ids,
+from typing import TYPE_CHECKING
+
+from cpvt_database_models.models._lazy import lazy_getattr
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .sequence_variant import (
+        SequenceVariantDb,
+        EditType,
+        ProteinConsequence,
+        edit_type_ids,
+        HgvsBatchResult,
+        HgvsBatchError,
+        posedit_aa3_to_aa1,
+    )
+    from .edit_type_classifier import classify_edit_type
+    from .parse_cache import (
+        configure_parse_cache,
+        parse_cache_info,
+        clear_parse_cache,
+    )
+    from .typed_grammar import get_typed_grammar, warm_up_typed_grammar
+
+__getattr__ = lazy_getattr(
+    __name__,
+    {
+        "SequenceVariantDb": ".sequence_variant",
+        "EditType": ".sequence_variant",
+        "ProteinConsequence": ".sequence_variant",
+        "edit_type_ids": ".sequence_variant",
+        "HgvsBatchResult": ".sequence_variant",
+        "HgvsBatchError": ".sequence_variant",
+        "posedit_aa3_to_aa1": ".sequence_variant",
+        "classify_edit_type": ".edit_type_classifier",
+        "configure_parse_cache": ".parse_cache",
+        "parse_cache_info": ".parse_cache",
+        "clear_parse_cache": ".parse_cache",
+        "get_typed_grammar": ".typed_grammar",
+        "warm_up_typed_grammar": ".typed_grammar",
+    },
 )
 
-__all__ = ["SequenceVariantDb", "EditType", "ProteinConsequence", "edit_type_ids"]
+__all__ = [
+    "SequenceVariantDb",
+    "EditType",
+    "ProteinConsequence",
+    "edit_type_ids",
+    "HgvsBatchResult",
+    "HgvsBatchError",
+    "posedit_aa3_to_aa1",
+    "classify_edit_type",
+    "configure_parse_cache",
+    "parse_cache_info",
+    "clear_parse_cache",
+    "get_typed_grammar",
+    "warm_up_typed_grammar",
+]
@@ -0,0 +1,180 @@
+"""
+A compiled regex version of the `typed_posedit` rule in hgvs_types.pymeta.
+
+The grammar is a PEG, so every ordered choice is translated into an atomic
+group and every repetition into a possessive quantifier. That way the regex
+commits to the same alternatives as the Parsley grammar and gives the same
+edit type label for every string it matches. Strings it does not match
+(e.g. conversions, which need the full hgvs grammar) are ambiguous and
+should be classified by the grammar.
+
+The ambiguity codes Asx and Glx parse, but the grammar actions raise a
+KeyError for them (so the grammar gives "Unknown"). Strings containing them
+are also left to the grammar.
+"""
+
+import re
+from functools import lru_cache
+
+# ---------------------------------------------------------
+# Basic types
+# ---------------------------------------------------------
+_AA1 = "[ACDEFGHIKLMNPQRSTVWYBZXU]"
+_AA3 = (
+    "(?>Ala|Cys|Asp|Glu|Phe|Gly|His|Ile|Lys|Leu|Met|Asn|Pro|Gln|Arg|Ser|Thr"
+    "|Val|Trp|Tyr|Asx|Glx|Xaa|Sec)"
+)
+_TERM1 = "[X*]"
+_TERM3 = "Ter"
+_TERM13 = f"(?>{_TERM3}|{_TERM1})"
+_AA13 = f"(?>{_AA3}|{_AA1})"
+_AAT13 = f"(?>(?>{_TERM3}|{_AA3})|(?>{_TERM1}|{_AA1}))"
+_AAT13_SEQ = (
+    f"(?>(?>{_TERM3}|{_AA3}++(?:{_TERM3})?+)|(?>{_TERM1}|{_AA1}++(?:{_TERM1})?+))"
+)
+_DNA = "[ACGTRYMKWSBDHVNacgtrymkwsbdhvn]"
+_RNA = "[ACGURYMKWSBDHVNacgurymkwsbdhvn]"
+_NUM = r"\d++"
+_SNUM = rf"[-+]?+{_NUM}"
+_FSEXT_OFFSET = rf"(?>{_NUM}|\?|)"
+_GRAMMAR_ACTION_ERRORS = re.compile("Asx|Glx")
+
+# ---------------------------------------------------------
+# Positions and intervals
+# ---------------------------------------------------------
+_OFFSET = f"(?>{_SNUM}|)"
+_C_POS = rf"(?>{_SNUM}{_OFFSET}|\*{_NUM}{_OFFSET})"
+_N_POS = f"{_SNUM}{_OFFSET}"
+_SIMPLE_POS = rf"(?>{_NUM}|\?)"
+_P_POS = f"(?>{_TERM13}|{_AA13}){_NUM}"
+
+
+def _interval(pos: str) -> str:
+    definite = f"(?>{pos}_{pos}|{pos})"
+    return rf"(?>{definite}|\({definite}\))"
+
+
+class _LabelledPattern:
+    """
+    Builds a pattern where every edit alternative is a capturing group.
+
+    `labels[i]` is the edit type of capturing group `i + 1`. All other groups
+    in the pattern are non-capturing, so exactly one group takes part in a
+    match.
+    """
+
+    def __init__(self):
+        self.labels: list[str] = []
+
+    def group(self, label: str, pattern: str) -> str:
+        self.labels.append(label)
+        return f"({pattern})"
+
+    def na_edit(self, na: str, *, copy: bool) -> str:
+        ref = rf"(?>{_NUM}|{na}*+)"
+        edits = [
+            self.group("Identical", f"{na}*+="),
+            self.group("Substitution", f"{na}>{na}"),
+            self.group("Deletion-Insertion", f"del{ref}ins{na}++"),
+            self.group("Deletion", f"del{ref}"),
+            self.group("Insertion", f"ins{na}++"),
+            self.group("Duplication", f"dup{na}*+"),
+            self.group("Inversion", f"inv{ref}"),
+        ]
+
+        if copy:
+            edits.append(self.group("Copy", f"copy{_NUM}"))
+
+        return f"(?>{'|'.join(edits)})"
+
+    def pro_edit(self) -> str:
+        edits = [
+            self.group("Frameshift", f"(?>{_AAT13}|)fs(?>{_TERM13}{_FSEXT_OFFSET}|)"),
+            self.group(
+                "Extension",
+                f"(?:{_AAT13})?+ext"
+                f"(?>{_TERM13}{_FSEXT_OFFSET}|(?>{_AA13}|)-{_NUM}|)",
+            ),
+            self.group("Substitution", rf"(?>{_AAT13}|\?)"),
+            self.group("Deletion-Insertion", f"delins{_AAT13_SEQ}"),
+            self.group("Insertion", f"ins{_AAT13_SEQ}"),
+            self.group("Deletion", "del"),
+            self.group("Duplication", "dup"),
+            self.group("Identical", "="),
+        ]
+
+        return f"(?>{'|'.join(edits)})"
+
+    def na_posedit(self, pos: str, na: str, *, copy: bool) -> str:
+        return f"{_interval(pos)}{self.na_edit(na, copy=copy)}"
+
+    def r_posedit(self) -> str:
+        posedit = [
+            f"{_interval(_N_POS)}{self.na_edit(_RNA, copy=False)}",
+            rf"\({_interval(_N_POS)}{self.na_edit(_RNA, copy=False)}\)",
+        ]
+
+        return f"(?>{'|'.join(posedit)})"
+
+    def p_posedit(self) -> str:
+        posedit = [
+            f"{_interval(_P_POS)}{self.pro_edit()}",
+            rf"\({_interval(_P_POS)}{self.pro_edit()}\)",
+            self.group("Special", r"=|\(=\)|0\?|0|\?"),
+        ]
+
+        return f"(?>{'|'.join(posedit)})"
+
+
+def _compile_typed_posedit() -> dict[str, tuple[re.Pattern[str], list[str]]]:
+    builders = {
+        "c": lambda b: b.na_posedit(_C_POS, _DNA, copy=True),
+        "g": lambda b: b.na_posedit(_SIMPLE_POS, _DNA, copy=True),
+        "m": lambda b: b.na_posedit(_SIMPLE_POS, _DNA, copy=True),
+        "n": lambda b: b.na_posedit(_N_POS, _DNA, copy=True),
+        "r": lambda b: b.r_posedit(),
+        "p": lambda b: b.p_posedit(),
+    }
+
+    compiled = {}
+
+    for sv_type, build in builders.items():
+        builder = _LabelledPattern()
+        compiled[sv_type] = (re.compile(build(builder)), builder.labels)
+
+    return compiled
+
+
+_typed_posedit = _compile_typed_posedit()
+
+
+@lru_cache(maxsize=2**16)
+def classify_edit_type(variant_no_accn: str) -> str | None:
+    """
+    Get the edit type label of an hgvs string without the accession
+    (e.g. `c.76+3A>T`) - one of the keys of `edit_type_ids()`.
+
+    Returns None if the string is ambiguous and needs the Parsley grammar.
+    """
+    sv_type, dot, posedit = variant_no_accn.partition(".")
+
+    if not dot or sv_type not in _typed_posedit:
+        return None
+
+    if _GRAMMAR_ACTION_ERRORS.search(posedit):
+        return None
+
+    pattern, labels = _typed_posedit[sv_type]
+    match = pattern.fullmatch(posedit)
+
+    if match is None:
+        return None
+
+    for label, group in zip(labels, match.groups()):
+        if group is not None:
+            return label
+
+    return None  # pragma: no cover
+
+
+__all__ = ["classify_edit_type"]
@@ -0,0 +1,76 @@
+"""
+Process-wide LRU cache of parsed hgvs strings.
+
+Parsing an hgvs string with the hgvs package runs a full PEG parse, so the
+same hot variants being converted over and over again is expensive. The
+cache is keyed by the parser and the hgvs string.
+
+Callers get a copy.deepcopy of the cached SequenceVariant, so normalizing or
+mapping it does not change what the next caller gets. Copying is still about
+ten times faster than parsing.
+"""
+
+import copy
+from functools import _CacheInfo, lru_cache
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:  # pragma: no cover
+    from hgvs.parser import Parser
+    from hgvs.sequencevariant import SequenceVariant
+
+DEFAULT_PARSE_CACHE_SIZE = 4096
+
+
+def _parse(hp: "Parser", hgvs_string: str) -> "SequenceVariant":
+    return hp.parse(hgvs_string)
+
+
+_cached_parse = lru_cache(maxsize=DEFAULT_PARSE_CACHE_SIZE)(_parse)
+_parse_cache_enabled = True
+
+
+def parse_hgvs(
+    hp: "Parser", hgvs_string: str, *, use_cache: bool = True
+) -> "SequenceVariant":
+    """
+    Parse an hgvs string, using the parse cache if it is enabled.
+    """
+    if use_cache and _parse_cache_enabled:
+        return copy.deepcopy(_cached_parse(hp, hgvs_string))
+
+    return _parse(hp, hgvs_string)
+
+
+def configure_parse_cache(
+    *, maxsize: int | None = None, enabled: bool | None = None
+) -> None:
+    """
+    Change the size of the parse cache (clears it) or turn it on / off.
+    """
+    global _cached_parse, _parse_cache_enabled
+
+    if maxsize is not None:
+        _cached_parse = lru_cache(maxsize=maxsize)(_parse)
+
+    if enabled is not None:
+        _parse_cache_enabled = enabled
+
+
+def parse_cache_info() -> _CacheInfo:
+    """
+    The hits, misses, maxsize and currsize of the parse cache.
+    """
+    return _cached_parse.cache_info()
+
+
+def clear_parse_cache() -> None:
+    _cached_parse.cache_clear()
+
+
+__all__ = [
+    "DEFAULT_PARSE_CACHE_SIZE",
+    "parse_hgvs",
+    "configure_parse_cache",
+    "parse_cache_info",
+    "clear_parse_cache",
+]
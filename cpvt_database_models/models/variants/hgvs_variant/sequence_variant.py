@@ -1,26 +1,35 @@
+import logging
 import re
-from typing import TYPE_CHECKING, Literal, Any, Callable, cast
+from collections.abc import Iterable, Mapping
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import TYPE_CHECKING, Literal, Any, Callable, NamedTuple, cast
 
-from hgvs.easy import parser
-from hgvs.location import (
-    BaseOffsetPosition,
-)
-from hgvs.parser import Parser
-from hgvs.sequencevariant import SequenceVariant
-from parsley import _GrammarWrapper
 from sqlalchemy import (
     ForeignKey,
     Index,
     UniqueConstraint,
     CheckConstraint,
+    func,
+    select,
 )
 from sqlalchemy.dialects.postgresql import INT4RANGE, Range, CITEXT
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from cpvt_database_models.database.base import Base
-from Bio.SeqUtils import seq1
+from .edit_type_classifier import classify_edit_type
+from .parse_cache import parse_hgvs
+from .typed_grammar import get_typed_grammar, warm_up_typed_grammar
 
+# hgvs, parsley and Bio are only imported when they are used, importing the
+# models should not pay for them (hgvs.easy even connects to UTA)
 if TYPE_CHECKING:  # pragma: no cover
+    from hgvs.parser import Parser
+    from hgvs.sequencevariant import SequenceVariant
+    from parsley import _GrammarWrapper
+    from sqlalchemy.ext.asyncio import AsyncSession
+
     from cpvt_database_models.models import Variant
 
 
@@ -44,6 +53,7 @@ def edit_type_ids():
 
 
 _molecular_consequence_dict = edit_type_ids()
+logger = logging.getLogger(__name__)
 ARBITRARY_MAX_VARCHAR_LENGTH = 2048
 
 
@@ -54,6 +64,112 @@ def strip_nan(any_dict: dict, *, ignore_keys: set[str] | None = None):
     return {k: v for k, v in any_dict.items() if v is not None or k in ignore_keys}
 
 
+def _default_parser() -> "Parser":
+    """
+    The parser of hgvs.easy.
+    """
+    from hgvs.easy import parser
+
+    return parser
+
+
+HgvsBatchInput = str | Mapping[str, Any]
+
+
+class HgvsBatchError(NamedTuple):
+    row_index: int
+    """
+    The position of the failed item in the input batch
+    """
+    item: HgvsBatchInput
+    error: str
+
+
+class HgvsBatchResult(NamedTuple):
+    rows: list[dict[str, Any]]
+    """
+    Column dicts for the sequence_variant table (ready for insert().values())
+    """
+    errors: list[HgvsBatchError]
+
+
+def _batch_parser() -> "Parser":
+    """
+    A new hgvs parser; unlike hgvs.easy it does not connect to UTA.
+    """
+    from hgvs.parser import Parser
+
+    return Parser()
+
+
+# set in each process pool worker by _init_batch_worker
+_batch_worker_grammar: Callable[[Any], "_GrammarWrapper"] | None = None
+_batch_worker_parser: "Parser | None" = None
+
+
+def _init_batch_worker(
+    grammar_factory: Callable[[], Callable[[Any], "_GrammarWrapper"]] | None,
+):
+    global _batch_worker_grammar, _batch_worker_parser
+
+    _batch_worker_parser = _batch_parser()
+
+    if grammar_factory is not None:
+        _batch_worker_grammar = grammar_factory()
+
+
+def _parse_batch_item_worker(
+    item: HgvsBatchInput,
+) -> tuple[dict[str, Any] | None, str | None]:
+    assert _batch_worker_parser is not None
+    return _parse_batch_item(item, _batch_worker_parser, _batch_worker_grammar)
+
+
+def _parse_batch_item(
+    item: HgvsBatchInput,
+    parser: "Parser",
+    grammar: Callable[[Any], "_GrammarWrapper"] | None,
+) -> tuple[dict[str, Any] | None, str | None]:
+    """
+    Parse one batch item into (columns, None) or (None, error message)
+    """
+    try:
+        variants: dict[str, "SequenceVariant"] = {}
+        extra: dict[str, Any] = {}
+
+        if isinstance(item, str):
+            sv = parser.parse(item)
+            variants[sv.type] = sv
+        else:
+            for key, value in item.items():
+                if key not in ("g", "c", "p"):
+                    extra[key] = value
+                elif value is not None:
+                    variants[key] = parser.parse(value)
+
+        for sv_type, sv in variants.items():
+            if sv_type not in ("g", "c", "p"):
+                raise ValueError(f"Unsupported sequence variant type: {sv}")
+            if sv.type != sv_type:
+                raise ValueError(
+                    f"Expected a {sv_type} sequence variant, got {sv.type}: {sv}"
+                )
+
+        if not variants:
+            raise ValueError("No hgvs strings to parse")
+
+        columns = SequenceVariantDb._column_args(
+            variant_g=variants.get("g"),
+            variant_c=variants.get("c"),
+            variant_p=variants.get("p"),
+            grammar=grammar,
+        )
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+    return {**columns, **extra}, None
+
+
 class EditType(Base):
     __tablename__ = "edit_type"
 
@@ -79,17 +195,22 @@ class SequenceVariantDb(
     __tablename__ = "sequence_variant"
 
     _molecular_consequence_dict = _molecular_consequence_dict
+    use_fast_edit_type = True
+    """
+    Classify edit types with the compiled regex classifier and only fall back
+    to the Parsley grammar for strings it can't classify.
+    """
 
     def __init__(
         self,
         *,
-        variant_g: SequenceVariant | None = None,
-        variant_c: SequenceVariant | None = None,
-        variant_p: SequenceVariant | None = None,
+        variant_g: "SequenceVariant | None" = None,
+        variant_c: "SequenceVariant | None" = None,
+        variant_p: "SequenceVariant | None" = None,
         reference_sequence_id_c: int | None = None,
         reference_sequence_id_g: int | None = None,
         reference_sequence_id_p: int | None = None,
-        grammar: Callable[[Any], _GrammarWrapper] | None = None,
+        grammar: Callable[[Any], "_GrammarWrapper"] | None = None,
         **kwargs,
     ):
         """
@@ -99,13 +220,45 @@ class SequenceVariantDb(
         cannot be determined by the sequence variant object.
         """
 
+        super().__init__(
+            **{
+                **self._column_args(
+                    variant_g=variant_g,
+                    variant_c=variant_c,
+                    variant_p=variant_p,
+                    reference_sequence_id_c=reference_sequence_id_c,
+                    reference_sequence_id_g=reference_sequence_id_g,
+                    reference_sequence_id_p=reference_sequence_id_p,
+                    grammar=grammar,
+                ),
+                **kwargs,
+            }
+        )
+
+    @classmethod
+    def _column_args(
+        cls,
+        *,
+        variant_g: "SequenceVariant | None" = None,
+        variant_c: "SequenceVariant | None" = None,
+        variant_p: "SequenceVariant | None" = None,
+        reference_sequence_id_c: int | None = None,
+        reference_sequence_id_g: int | None = None,
+        reference_sequence_id_p: int | None = None,
+        grammar: Callable[[Any], "_GrammarWrapper"] | None = None,
+    ) -> dict[str, Any]:
+        """
+        Build the column values for the g, c and p sequence variants.
+        """
+        from hgvs.location import BaseOffsetPosition
+
         g_args = {}
 
         if variant_g is not None:
             g_args = strip_nan(
                 {
                     "g_reference_sequence_id": reference_sequence_id_g,
-                    "g_edit_type": self._determine_molecular_consequence_id(
+                    "g_edit_type": cls._determine_molecular_consequence_id(
                         grammar, str(variant_g)
                     ),
                     "g_posedit_str": str(variant_g.posedit)
@@ -119,14 +272,14 @@ class SequenceVariantDb(
                     "g_hgvs_string": str(variant_g),
                 }
             )
-            self._add_edit_info(variant_g, g_args, "g")
+            cls._add_edit_info(variant_g, g_args, "g")
 
         c_args: dict = {}
 
         if variant_c is not None:
             c_args = {
                 "c_reference_sequence_id": reference_sequence_id_c,
-                "c_edit_type": self._determine_molecular_consequence_id(
+                "c_edit_type": cls._determine_molecular_consequence_id(
                     grammar, str(variant_c)
                 ),
                 "c_posedit_str": str(variant_c.posedit),
@@ -145,14 +298,14 @@ class SequenceVariantDb(
             if isinstance(variant_c.posedit.pos.end, BaseOffsetPosition):
                 c_args["c_end_offset"] = variant_c.posedit.pos.end.offset
 
-            self._add_edit_info(variant_c, c_args, "c")
+            cls._add_edit_info(variant_c, c_args, "c")
 
         p_args = {}
 
         if variant_p is not None:
             p_args = {
                 "p_reference_sequence_id": reference_sequence_id_p,
-                "p_edit_type": self._determine_molecular_consequence_id(
+                "p_edit_type": cls._determine_molecular_consequence_id(
                     grammar, str(variant_p)
                 ),
                 "p_posedit_str": str(variant_p.posedit),
@@ -165,12 +318,12 @@ class SequenceVariantDb(
                 "p_end_aa": variant_p.posedit.pos.end.aa,
                 "p_hgvs_string": str(variant_p),
             }
-            self._add_edit_info(variant_p, p_args, "p")
+            cls._add_edit_info(variant_p, p_args, "p")
 
-        super().__init__(**{**g_args, **c_args, **p_args, **kwargs})
+        return {**g_args, **c_args, **p_args}
 
     @staticmethod
-    def _add_edit_info(variant: SequenceVariant, all_args: dict, sv_type: str):
+    def _add_edit_info(variant: "SequenceVariant", all_args: dict, sv_type: str):
         # add edit information if the property exists
         if (
             hasattr(variant.posedit.edit, "ref")
@@ -202,43 +355,59 @@ class SequenceVariantDb(
             ):
                 all_args["p_edit_init_met"] = variant.posedit.edit.init_met
 
+    @classmethod
     def _determine_molecular_consequence_id(
-        self, grammar: Callable[[Any], _GrammarWrapper] | None, hgvs_string: str
+        cls, grammar: Callable[[Any], "_GrammarWrapper"] | None, hgvs_string: str
     ) -> int:
         """
-        Get the molecular consequence of the sequence variant
+        Get the molecular consequence of the sequence variant.
+
+        Uses the compiled edit type classifier first (if `use_fast_edit_type`)
+        and only runs the Parsley grammar for strings it can't classify.
         """
         variant_no_accn = hgvs_string.split(":", 1)[1]
         default_edit_type = "Unknown"
 
-        if grammar is None:
-            return cast(
-                int, self._molecular_consequence_dict.get(default_edit_type, 13)
-            )
+        edit_type = (
+            classify_edit_type(variant_no_accn) if cls.use_fast_edit_type else None
+        )
+
+        if edit_type is None and grammar is not None:
+            try:
+                edit_type = grammar(variant_no_accn).typed_posedit()[1]
+            except Exception:
+                logger.warning(
+                    "Error parsing molecular consequence %s. Setting to 'Unknown'",
+                    variant_no_accn,
+                    exc_info=True,
+                )
 
-        try:
-            edit_type = grammar(variant_no_accn).typed_posedit()[1]
-        except Exception:
-            print(
-                f"Error parsing molecular consequence {variant_no_accn}. Setting to 'Unknown'"
-            )
-            # some error occurred, set to unknown
+        if edit_type is None:
             edit_type = default_edit_type
 
-        return cast(int, self._molecular_consequence_dict.get(edit_type, 13))  #
+        return cast(int, cls._molecular_consequence_dict.get(edit_type, 13))
 
     @staticmethod
     def _remove_accn(variant):
         return variant.split(":", 1)[1]
 
     def sequence_variant(
-        self, *, hp: Parser | None = None, sv_type: Literal["g", "c", "p"]
-    ) -> SequenceVariant | None:
+        self,
+        *,
+        hp: "Parser | None" = None,
+        sv_type: Literal["g", "c", "p"],
+        use_cache: bool = True,
+    ) -> "SequenceVariant | None":
         """
         Convert the sequence variant in the database to a SequenceVariant object
+
+        Parsed variants are memoized in the process-wide parse cache (see
+        `configure_parse_cache`). Each call gets its own copy, which the caller
+        may mutate, so a cache hit costs a deepcopy rather than a dict
+        lookup. Pass `use_cache=False` to skip the cache and always parse.
         """
         if hp is None:
-            hp = parser
+            hp = _default_parser()
 
         if sv_type == "g":
             str_to_parse = self.g_hgvs_string
@@ -249,12 +418,77 @@ class SequenceVariantDb(
         else:
             raise ValueError(f"Invalid sequence variant type: {sv_type}")
 
+        if str_to_parse is None:
+            return None
+
         try:
-            sv = hp.parse(str_to_parse)
+            sv = parse_hgvs(hp, str_to_parse, use_cache=use_cache)
             return sv
         except Exception:
             return None
 
+    @classmethod
+    def from_hgvs_batch(
+        cls,
+        strings: Iterable[HgvsBatchInput],
+        *,
+        workers: int | None = None,
+        grammar_factory: Callable[[], Callable[[Any], "_GrammarWrapper"]]
+        | None = get_typed_grammar,
+        chunksize: int = 256,
+    ) -> "HgvsBatchResult":
+        """
+        Parse many hgvs strings into sequence_variant column dicts.
+
+        Each item is either a single hgvs string (routed to the g, c or p
+        columns by its type) or a mapping with optional "g", "c" and "p"
+        hgvs strings. Any other keys in a mapping are passed through as
+        column values (e.g. `c_reference_sequence_id`).
+
+        Parsing and edit type classification are fanned out to a process
+        pool of `workers` processes (defaults to the number of CPUs). Use
+        `workers=1` to parse in the current process. `grammar_factory` is
+        called once per worker to build the edit type grammar, so it must be
+        picklable (e.g. a module level function). The default,
+        `get_typed_grammar`, is compiled here before the workers start, so
+        they inherit it or load it from its cache. Pass None to only use the
+        compiled edit type classifier.
+
+        Rows that fail to parse are reported in `HgvsBatchResult.errors`
+        and do not stop the batch.
+        """
+        items = list(strings)
+
+        if grammar_factory is get_typed_grammar:
+            warm_up_typed_grammar()
+
+        if workers is not None and workers <= 1:
+            parser = _batch_parser()
+            grammar = grammar_factory() if grammar_factory is not None else None
+            results = [_parse_batch_item(item, parser, grammar) for item in items]
+        else:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_batch_worker,
+                initargs=(grammar_factory,),
+            ) as executor:
+                results = list(
+                    executor.map(_parse_batch_item_worker, items, chunksize=chunksize)
+                )
+
+        rows = []
+        errors = []
+
+        for index, (item, (columns, error)) in enumerate(zip(items, results)):
+            if columns is None:
+                errors.append(
+                    HgvsBatchError(row_index=index, item=item, error=str(error))
+                )
+            else:
+                rows.append(columns)
+
+        return HgvsBatchResult(rows=rows, errors=errors)
+
     sequence_variant_id: Mapped[int] = mapped_column(
         primary_key=True,
         comment="Primary key for the sequence variant",
@@ -441,6 +675,43 @@ hgvs_aa3 = set(
 ) | {"Ter"}
 
 
+@lru_cache()
+def _aa3_to_aa1() -> dict[str, str]:
+    from Bio.SeqUtils import seq1
+
+    return {aa3: seq1(aa3) for aa3 in hgvs_aa3}
+
+
+_aa3_pattern = re.compile("[A-Z][a-z]{2}")
+
+
+def _replace_aa3(match: re.Match[str]) -> str:
+    aa3 = match.group()
+
+    try:
+        return _aa3_to_aa1()[aa3]
+    except KeyError:
+        raise ValueError(f"Invalid AA3 code: {aa3}") from None
+
+
+def posedit_aa3_to_aa1(posedit_aa3: str) -> str:
+    """
+    Convert every 3 letter amino acid code in a posedit string to the
+    1 letter code in a single pass (e.g. Trp24Ter -> W24*).
+    """
+    return _aa3_pattern.sub(_replace_aa3, posedit_aa3)
+
+
+def _protein_posedits(posedit_str: str) -> tuple[str, str]:
+    """
+    The (AA3, AA1) posedit strings of a protein consequence
+    """
+    # strip out any parentheses
+    posedit_aa3 = posedit_str.replace("(", "").replace(")", "")
+
+    return posedit_aa3, posedit_aa3_to_aa1(posedit_aa3)
+
+
 class ProteinConsequence(Base):
     """
     A sequence variant parsed by the python or rust hgvs library.
@@ -451,13 +722,15 @@ class ProteinConsequence(Base):
     def __init__(
         self,
         *,
-        sequence_variant: SequenceVariantDb | SequenceVariant = None,
+        sequence_variant: "SequenceVariantDb | SequenceVariant" = None,
         **kwargs,
     ):
         if sequence_variant is None:
             super().__init__(**kwargs)
             return
 
+        from hgvs.sequencevariant import SequenceVariant
+
         if isinstance(sequence_variant, SequenceVariant):
             self._create_from_sequence_variant(sequence_variant)
         elif isinstance(sequence_variant, SequenceVariantDb):
@@ -470,30 +743,16 @@ class ProteinConsequence(Base):
 
         super().__init__(**kwargs)
 
-    def _create_from_sequence_variant(self, sequence_variant: SequenceVariant):
+    def _create_from_sequence_variant(self, sequence_variant: "SequenceVariant"):
         if sequence_variant.type != "p":
             raise ValueError("Sequence variant must be a protein sequence variant")
 
         # hgvs python package gives the AA3 code by default in the
         # str(variant.posedit) - use regex and convert all to 1 letter code
-        posedit_str = str(sequence_variant.posedit)
-
-        # strip out any parentheses
-        posedit_str = posedit_str.replace("(", "").replace(")", "")
-
-        self.posedit_aa3 = posedit_str
-
-        # remove all non A-Za-z characters with regex
-        aa3_codes = re.findall("[A-Z][a-z]{2}", posedit_str)
+        self._set_posedit(str(sequence_variant.posedit))
 
-        # Convert each 3-letter code to a 1-letter code and replace it in the string
-        for aa3 in aa3_codes:
-            if aa3 not in hgvs_aa3:
-                raise ValueError(f"Invalid AA3 code: {aa3}")
-            aa1 = seq1(aa3)
-            posedit_str = posedit_str.replace(aa3, aa1)
-
-        self.posedit_aa1 = posedit_str
+    def _set_posedit(self, posedit_str: str):
+        self.posedit_aa3, self.posedit_aa1 = _protein_posedits(posedit_str)
 
     def _create_from_sequence_variant_db(self, sequence_variant: SequenceVariantDb):
         if sequence_variant.p_hgvs_string is None:
@@ -509,6 +768,85 @@ class ProteinConsequence(Base):
 
         self._create_from_sequence_variant(sv)
 
+    @classmethod
+    async def bulk_from_db(
+        cls, session: "AsyncSession", *, batch_size: int = 5000
+    ) -> int:
+        """
+        Rebuild the protein consequence of every sequence variant with a
+        p_hgvs_string.
+
+        The sequence variants are read in batches of `batch_size` (keyset
+        pagination on sequence_variant_id). The stored p_posedit_str is
+        converted without parsing the hgvs string again, and every batch is
+        upserted with a single executemany. Rows that can't be converted are
+        logged and skipped.
+
+        Returns the number of rows written. The caller has to commit.
+        """
+        written = 0
+        last_id: int | None = None
+
+        while True:
+            stmt = (
+                select(
+                    SequenceVariantDb.sequence_variant_id,
+                    SequenceVariantDb.p_posedit_str,
+                    SequenceVariantDb.p_hgvs_string,
+                )
+                .where(SequenceVariantDb.p_hgvs_string.is_not(None))
+                .order_by(SequenceVariantDb.sequence_variant_id)
+                .limit(batch_size)
+            )
+            if last_id is not None:
+                stmt = stmt.where(SequenceVariantDb.sequence_variant_id > last_id)
+
+            batch = (await session.execute(stmt)).all()
+
+            if not batch:
+                return written
+
+            last_id = batch[-1].sequence_variant_id
+            rows = []
+
+            for sequence_variant_id, p_posedit_str, p_hgvs_string in batch:
+                try:
+                    if p_posedit_str is None:
+                        sv = parse_hgvs(_default_parser(), str(p_hgvs_string))
+                        p_posedit_str = str(sv.posedit)
+
+                    posedit_aa3, posedit_aa1 = _protein_posedits(p_posedit_str)
+                except Exception:
+                    logger.warning(
+                        "Could not convert protein consequence %s. Skipping",
+                        p_hgvs_string,
+                        exc_info=True,
+                    )
+                    continue
+
+                rows.append(
+                    {
+                        "protein_consequence_id": sequence_variant_id,
+                        "posedit_aa1": posedit_aa1,
+                        "posedit_aa3": posedit_aa3,
+                    }
+                )
+
+            if rows:
+                insert_stmt = pg_insert(cls)
+                await session.execute(
+                    insert_stmt.on_conflict_do_update(
+                        index_elements=[cls.protein_consequence_id],
+                        set_={
+                            "posedit_aa1": insert_stmt.excluded.posedit_aa1,
+                            "posedit_aa3": insert_stmt.excluded.posedit_aa3,
+                            "updated_at": func.now(),
+                        },
+                    ),
+                    rows,
+                )
+                written += len(rows)
+
     protein_consequence_id: Mapped[int] = mapped_column(
         ForeignKey("sequence_variant.sequence_variant_id"),
         primary_key=True,
@@ -530,4 +868,12 @@ class ProteinConsequence(Base):
     )
 
 
-__all__ = ["SequenceVariantDb", "EditType", "edit_type_ids", "ProteinConsequence"]
+__all__ = [
+    "SequenceVariantDb",
+    "EditType",
+    "edit_type_ids",
+    "ProteinConsequence",
+    "HgvsBatchResult",
+    "HgvsBatchError",
+    "posedit_aa3_to_aa1",
+]
@@ -0,0 +1,173 @@
+"""
+The hgvs_types.pymeta Parsley grammar, which parses an hgvs string (without
+the accession) into the sequence variant and its edit type:
+
+    get_typed_grammar()("c.1234del").typed_posedit()  # (..., "Deletion")
+
+Parsing the grammar takes seconds, so it is compiled once per process. The
+parser code generated from it is cached as bytecode in cache_dir, keyed by
+the sha1 of the grammar and the Parsley and Python versions, so every
+other process only loads it.
+"""
+
+import hashlib
+import importlib.metadata
+import importlib.util
+import marshal
+import os
+import threading
+from typing import TYPE_CHECKING, Any, Callable
+
+if TYPE_CHECKING:  # pragma: no cover
+    from parsley import _GrammarWrapper
+
+GRAMMAR_FILE = os.path.join(os.path.dirname(__file__), "hgvs_types.pymeta")
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")),
+    "cpvt_database_models",
+    "grammar",
+)
+
+_GRAMMAR_NAME = "HgvsTypes"
+
+_typed_grammar: Callable[[Any], "_GrammarWrapper"] | None = None
+_lock = threading.Lock()
+
+
+def get_typed_grammar(
+    cache_dir: str | None = DEFAULT_CACHE_DIR,
+) -> Callable[[Any], "_GrammarWrapper"]:
+    """
+    The compiled grammar of the process, built by the first call (which is
+    the only one that uses cache_dir). Safe to call from any thread, and
+    the grammar itself creates a new parser for every string.
+
+    A picklable module level function, so it can be the grammar_factory of
+    SequenceVariantDb.from_hgvs_batch.
+    """
+    global _typed_grammar
+
+    if _typed_grammar is None:
+        with _lock:
+            if _typed_grammar is None:
+                _typed_grammar = _make_typed_grammar(cache_dir)
+
+    return _typed_grammar
+
+
+def warm_up_typed_grammar(
+    cache_dir: str | None = DEFAULT_CACHE_DIR, *, freeze_gc: bool = False
+):
+    """
+    Compile the grammar before starting worker processes.
+
+    Forked workers (e.g. multiprocessing on Linux, gunicorn --preload)
+    inherit the compiled grammar, and spawned workers load it from the
+    cache instead of all of them compiling it at once. freeze_gc moves
+    every object of this process out of reach of the garbage collector
+    (gc.freeze), so the forked workers do not copy the memory pages of the
+    grammar by collecting them.
+    """
+    get_typed_grammar(cache_dir)
+
+    if freeze_gc:
+        import gc
+
+        gc.collect()
+        gc.freeze()
+
+
+def _make_typed_grammar(cache_dir: str | None) -> Callable[[Any], "_GrammarWrapper"]:
+    import copy
+
+    import bioutils.sequences
+    import hgvs.edit
+    import hgvs.enums
+    import hgvs.location
+    import hgvs.posedit
+    import hgvs.sequencevariant
+    import parsley
+    from ometa.runtime import OMetaBase
+
+    with open(GRAMMAR_FILE) as f:
+        source = f.read()
+
+    namespace: dict[str, Any] = {}
+    exec(_parser_code(source, cache_dir), namespace)
+
+    parser_class = namespace["createParserClass"](
+        OMetaBase, {"hgvs": hgvs, "bioutils": bioutils, "copy": copy}
+    )
+
+    grammar: Callable[[Any], "_GrammarWrapper"] = parsley.wrapGrammar(parser_class)
+    return grammar
+
+
+def _parser_code(source: str, cache_dir: str | None):
+    """
+    The code object of the parser module generated from the grammar.
+    """
+    cache_path = None
+
+    if cache_dir is not None:
+        key = hashlib.sha1(
+            f"{importlib.metadata.version('parsley')}:"
+            f"{importlib.util.MAGIC_NUMBER.hex()}:{source}".encode()
+        ).hexdigest()
+        cache_path = os.path.join(cache_dir, f"{key}.marshal")
+
+        try:
+            with open(cache_path, "rb") as f:
+                return marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            pass
+
+    from ometa.builder import writePython
+    from ometa.grammar import OMeta
+
+    tree = OMeta(source).parseGrammar(_GRAMMAR_NAME)
+    code = compile(
+        writePython(tree, source),
+        f"/pymeta_generated_code/pymeta_grammar__{_GRAMMAR_NAME}.py",
+        "exec",
+    )
+
+    if cache_path is not None:
+        # several processes may compile the grammar at the same time
+        part_path = f"{cache_path}.{os.getpid()}.part"
+
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+
+            with open(part_path, "wb") as f:
+                marshal.dump(code, f)
+
+            os.replace(part_path, cache_path)
+        except (OSError, ValueError) as e:
+            # the cache is only an optimization
+            print(f"Could not cache the compiled grammar in {cache_dir}: {e}")
+
+            if os.path.exists(part_path):
+                os.remove(part_path)
+
+    return code
+
+
+def _reset_lock_after_fork():
+    # another thread may have held the lock when the process forked
+    global _lock
+
+    _lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_lock_after_fork)
+
+
+__all__ = [
+    "GRAMMAR_FILE",
+    "DEFAULT_CACHE_DIR",
+    "get_typed_grammar",
+    "warm_up_typed_grammar",
+]
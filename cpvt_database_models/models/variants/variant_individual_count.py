@@ -0,0 +1,155 @@
+"""
+The number of individuals with each variant, kept up to date by statement
+level triggers on variant and individual_variant instead of a
+COUNT(DISTINCT individual_id) over individual_variant on every read.
+"""
+
+from typing import Any
+
+from sqlalchemy import DDL, Connection, ForeignKey, event
+from sqlalchemy.orm import Mapped, mapped_column
+
+from cpvt_database_models.database.base import BaseBase
+
+
+class VariantIndividualCount(BaseBase):
+    __tablename__ = "variant_individual_count"
+
+    variant_id: Mapped[int] = mapped_column(
+        ForeignKey("variant.variant_id", ondelete="CASCADE", onupdate="CASCADE"),
+        primary_key=True,
+    )
+    num_individuals: Mapped[int] = mapped_column(
+        server_default="0",
+        index=True,
+        comment="The number of rows in individual_variant with the variant",
+    )
+
+    __table_args__ = (
+        {
+            "comment": "The number of individuals with each variant. "
+            "Maintained by triggers, do not write to it.",
+        },
+    )
+
+
+# (individual_id, variant_id) is the primary key of individual_variant, so
+# every row inserted or deleted changes the count of its variant by one.
+# The counts are updated by adding the change, so concurrent transactions
+# never overwrite each other's counts.
+TRIGGERS_DDL = (
+    """
+    CREATE OR REPLACE FUNCTION variant_individual_count_update() RETURNS TRIGGER
+        LANGUAGE plpgsql AS
+    $$
+    BEGIN
+        IF TG_TABLE_NAME = 'variant' THEN
+            INSERT INTO variant_individual_count (variant_id)
+            SELECT variant_id
+            FROM new_rows
+            ON CONFLICT (variant_id) DO NOTHING;
+        ELSIF TG_OP = 'TRUNCATE' THEN
+            UPDATE variant_individual_count
+            SET num_individuals = 0
+            WHERE num_individuals <> 0;
+        ELSIF TG_OP = 'INSERT' THEN
+            UPDATE variant_individual_count c
+            SET num_individuals = c.num_individuals + d.delta
+            FROM (SELECT variant_id, COUNT(*) AS delta
+                  FROM new_rows
+                  GROUP BY variant_id) d
+            WHERE c.variant_id = d.variant_id;
+        ELSIF TG_OP = 'DELETE' THEN
+            UPDATE variant_individual_count c
+            SET num_individuals = c.num_individuals - d.delta
+            FROM (SELECT variant_id, COUNT(*) AS delta
+                  FROM old_rows
+                  GROUP BY variant_id) d
+            WHERE c.variant_id = d.variant_id;
+        ELSE
+            -- rows moved to another variant
+            UPDATE variant_individual_count c
+            SET num_individuals = c.num_individuals + d.delta
+            FROM (SELECT variant_id, SUM(delta) AS delta
+                  FROM (SELECT variant_id, 1 AS delta
+                        FROM new_rows
+                        UNION ALL
+                        SELECT variant_id, -1 AS delta
+                        FROM old_rows) changes
+                  GROUP BY variant_id) d
+            WHERE c.variant_id = d.variant_id
+              AND d.delta <> 0;
+        END IF;
+
+        RETURN NULL;
+    END;
+    $$
+    """,
+    """
+    CREATE OR REPLACE TRIGGER variant_individual_count_insert_trg
+        AFTER INSERT
+        ON variant
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT
+    EXECUTE FUNCTION variant_individual_count_update()
+    """,
+    """
+    CREATE OR REPLACE TRIGGER variant_individual_count_insert_trg
+        AFTER INSERT
+        ON individual_variant
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT
+    EXECUTE FUNCTION variant_individual_count_update()
+    """,
+    """
+    CREATE OR REPLACE TRIGGER variant_individual_count_update_trg
+        AFTER UPDATE
+        ON individual_variant
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT
+    EXECUTE FUNCTION variant_individual_count_update()
+    """,
+    """
+    CREATE OR REPLACE TRIGGER variant_individual_count_delete_trg
+        AFTER DELETE
+        ON individual_variant
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT
+    EXECUTE FUNCTION variant_individual_count_update()
+    """,
+    """
+    CREATE OR REPLACE TRIGGER variant_individual_count_truncate_trg
+        AFTER TRUNCATE
+        ON individual_variant
+        FOR EACH STATEMENT
+    EXECUTE FUNCTION variant_individual_count_update()
+    """,
+)
+
+# counts the variants and individuals that existed before the triggers did
+BACKFILL_SQL = """
+    INSERT INTO variant_individual_count (variant_id, num_individuals)
+    SELECT variant.variant_id,
+           COUNT(individual_variant.individual_id)
+    FROM variant
+             LEFT JOIN individual_variant
+                       ON variant.variant_id = individual_variant.variant_id
+    GROUP BY variant.variant_id
+    ON CONFLICT (variant_id) DO UPDATE SET num_individuals = EXCLUDED.num_individuals
+    """
+
+
+# after the whole metadata is created, since the triggers are on other tables
+@event.listens_for(BaseBase.metadata, "after_create")
+def _add_triggers(target: Any, connection: Connection, tables=(), **kw: Any):
+    if (
+        connection.dialect.name != "postgresql"
+        or VariantIndividualCount.__table__ not in tables
+    ):
+        return
+
+    for statement in (*TRIGGERS_DDL, BACKFILL_SQL):
+        connection.execute(DDL(statement))
+
+
+__all__ = ["VariantIndividualCount"]
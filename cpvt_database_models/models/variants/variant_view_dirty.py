@@ -0,0 +1,116 @@
+"""
+The variants whose rows in variant_view_t are out of date, recorded by row
+level triggers on the tables variant_view_v selects from (see
+models.views.incremental).
+"""
+
+import datetime
+from typing import Any
+
+from sqlalchemy import DDL, Connection, DateTime, event, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from cpvt_database_models.database.base import BaseBase
+
+
+class VariantViewDirty(BaseBase):
+    __tablename__ = "variant_view_dirty"
+
+    # not a foreign key - a deleted variant is dirty until its row is removed
+    # from variant_view_t
+    variant_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    marked_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+
+    __table_args__ = (
+        {
+            "comment": "The variants whose rows in variant_view_t are out of date. "
+            "Maintained by triggers, emptied by refresh_variant_view_incremental.",
+        },
+    )
+
+
+# (table, key column, what the key is) for every table variant_view_v selects
+# from: a variant_id, an individual_id (every variant of the individual) or a
+# sequence_variant_id (every variant of the sequence variant)
+TRACKED_TABLES = (
+    ("variant", "variant_id", "variant"),
+    ("variant_clinvar_info", "variant_id", "variant"),
+    ("variants_dataset_to_variant", "variant_id", "variant"),
+    ("clinvar_variant_linked_condition", "variant_id", "variant"),
+    ("individual_variant", "variant_id", "variant"),
+    ("individual_condition", "individual_id", "individual"),
+    ("treatment_record", "patient_id", "individual"),
+    ("sequence_variant", "sequence_variant_id", "sequence_variant"),
+    ("protein_consequence", "protein_consequence_id", "sequence_variant"),
+)
+
+# TG_ARGV[0] is the column with the key of the row and TG_ARGV[1] what the
+# key is, as in TRACKED_TABLES
+TRIGGERS_DDL = (
+    """
+    CREATE OR REPLACE FUNCTION variant_view_mark_dirty() RETURNS TRIGGER
+        LANGUAGE plpgsql AS
+    $$
+    DECLARE
+        key_column TEXT      := TG_ARGV[0];
+        key_kind   TEXT      := TG_ARGV[1];
+        keys       INTEGER[] := ARRAY []::INTEGER[];
+    BEGIN
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            keys := keys || (to_jsonb(NEW) ->> key_column)::INTEGER;
+        END IF;
+
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            keys := keys || (to_jsonb(OLD) ->> key_column)::INTEGER;
+        END IF;
+
+        INSERT INTO variant_view_dirty (variant_id)
+        SELECT DISTINCT dirty.variant_id
+        FROM (SELECT unnest(keys) AS variant_id
+              WHERE key_kind = 'variant'
+              UNION ALL
+              SELECT iv.variant_id
+              FROM individual_variant iv
+              WHERE key_kind = 'individual'
+                AND iv.individual_id = ANY (keys)
+              UNION ALL
+              SELECT v.variant_id
+              FROM variant v
+              WHERE key_kind = 'sequence_variant'
+                AND v.sequence_variant_id = ANY (keys)) dirty
+        WHERE dirty.variant_id IS NOT NULL
+        ON CONFLICT (variant_id) DO NOTHING;
+
+        RETURN NULL;
+    END;
+    $$
+    """,
+    *(
+        f"""
+    CREATE OR REPLACE TRIGGER variant_view_dirty_trg
+        AFTER INSERT OR UPDATE OR DELETE
+        ON {table}
+        FOR EACH ROW
+    EXECUTE FUNCTION variant_view_mark_dirty('{key_column}', '{key_kind}')
+    """
+        for table, key_column, key_kind in TRACKED_TABLES
+    ),
+)
+
+
+# after the whole metadata is created, since the triggers are on other tables
+@event.listens_for(BaseBase.metadata, "after_create")
+def _add_triggers(target: Any, connection: Connection, tables=(), **kw: Any):
+    if (
+        connection.dialect.name != "postgresql"
+        or VariantViewDirty.__table__ not in tables
+    ):
+        return
+
+    for statement in TRIGGERS_DDL:
+        connection.execute(DDL(statement))
+
+
+__all__ = ["VariantViewDirty"]
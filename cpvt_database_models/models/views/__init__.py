@@ -1,5 +1,29 @@
-from .add_views import add_views_pg
+from ..kv_store import VIEWS_VERSION_KEY
+from .add_views import add_views_pg, bump_views_version
+from .build_views import build_views_parallel, refresh_views
+from .incremental import (
+    rebuild_variant_view_t,
+    refresh_variant_view_incremental,
+    setup_variant_view_incremental,
+)
+from .view_graph import (
+    ViewDefinition,
+    definition_hashes,
+    parse_view_definitions,
+    view_build_order,
+)
 
 __all__ = [
     "add_views_pg",
+    "bump_views_version",
+    "VIEWS_VERSION_KEY",
+    "build_views_parallel",
+    "refresh_views",
+    "setup_variant_view_incremental",
+    "rebuild_variant_view_t",
+    "refresh_variant_view_incremental",
+    "ViewDefinition",
+    "parse_view_definitions",
+    "definition_hashes",
+    "view_build_order",
 ]
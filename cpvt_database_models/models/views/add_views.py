@@ -1,11 +1,18 @@
+import argparse
 import asyncio
+import hashlib
+import json
 import os
+import re
 import time
+from collections.abc import Callable
+from typing import Any, NamedTuple
 
 from sqlalchemy import text
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
 
-from cpvt_database_models.settings import get_settings
+from cpvt_database_models.database.engine import get_async_engine
+from cpvt_database_models.models.kv_store import VIEWS_VERSION_KEY
 
 _ERROR_MESSAGE = (
     "The cpvt_database_models add_views file requires that sqlparse and "
@@ -16,6 +23,13 @@ _ERROR_MESSAGE = (
     "as psycopg or asyncpg."
 )
 
+# sqlparse.split results, keyed by the sha1 of the sql they were split from
+DEFAULT_CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")),
+    "cpvt_database_models",
+    "sql",
+)
+
 
 def get_sql_files(base_dir: str):
     """
@@ -32,7 +46,22 @@ def get_sql_files(base_dir: str):
     return sql_files
 
 
-async def add_views_pg(session: AsyncSession, base_dir: str):
+async def add_views_pg(
+    session: AsyncSession | AsyncConnection,
+    base_dir: str,
+    *,
+    single_round_trip: bool = False,
+    instrument: Callable[["StatementTiming"], None] | None = None,
+    explain: bool = False,
+):
+    """
+    Execute the sql files in base_dir in order and commit. With
+    single_round_trip, every file is sent as a single multi statement query
+    instead of statement by statement (see execute_file).
+
+    instrument is called with the timing of every statement, e.g.
+    BuildReport.record.
+    """
     print("Adding views")
 
     sql_files = get_sql_files(base_dir)
@@ -41,42 +70,293 @@ async def add_views_pg(session: AsyncSession, base_dir: str):
 
     for sql_file in sql_files:
         print(f"Executing {sql_file}")
-        await execute_file(session, sql_file)
+        await execute_file(
+            session,
+            sql_file,
+            single_round_trip=single_round_trip,
+            instrument=instrument,
+            explain=explain,
+        )
 
     await session.commit()
 
 
-async def execute_file(session: AsyncSession, sql_file):
+async def bump_views_version(session: AsyncSession | AsyncConnection):
+    """
+    Set the updated_at of the VIEWS_VERSION_KEY row in kv_store to now, in
+    the session's transaction.
+    """
+    await session.execute(
+        text(
+            """
+            INSERT INTO kv_store (key, value)
+            VALUES (:key, to_jsonb(now()))
+            ON CONFLICT (key) DO UPDATE SET value      = excluded.value,
+                                            updated_at = now()
+            """
+        ),
+        {"key": VIEWS_VERSION_KEY},
+    )
+
+
+class StatementTiming(NamedTuple):
+    sql_file: str
+    statement: str
+    seconds: float
+    rows: int | None = None
+    """
+    The rows affected (or selected into a materialized view), if known
+    """
+
+    plan: list | None = None
+    """
+    EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) output of the statement
+    """
+
+    @property
+    def summary(self) -> str:
+        """
+        The first line of the statement that is not a comment.
+        """
+        for line in self.statement.splitlines():
+            if line.strip() and not line.lstrip().startswith("--"):
+                return line.strip()[:80]
+
+        return ""
+
+
+_CREATE_MATERIALIZED_VIEW = re.compile(
+    r"^CREATE\s+MATERIALIZED\s+VIEW\b", re.IGNORECASE
+)
+
+
+async def execute_file(
+    session: AsyncSession | AsyncConnection,
+    sql_file: str,
+    *,
+    single_round_trip: bool = False,
+    cache_dir: str | None = DEFAULT_CACHE_DIR,
+    instrument: Callable[[StatementTiming], None] | None = None,
+    explain: bool = False,
+) -> list[StatementTiming]:
+    """
+    Execute the statements in sql_file and return how long each took.
+
+    The statements are split with sqlparse once per file contents and cached
+    in cache_dir (None disables the cache). With single_round_trip the file
+    is not split at all but sent as one query with the simple query
+    protocol, so it is timed as a single statement.
+
+    With explain, CREATE MATERIALIZED VIEW statements are run with
+    EXPLAIN (ANALYZE, BUFFERS) - which still creates the view - and the plan
+    is kept in the timing (not with single_round_trip).
+    """
     try:
-        import sqlparse
+        import sqlparse  # noqa: F401
     except ImportError as e:
         raise ImportError(_ERROR_MESSAGE) from e
 
-    # start a timer
-    start_time = time.time()
-
     with open(sql_file, "r") as f:
         sql = f.read()
 
-        for stmt in sqlparse.split(sql):
-            print(f"Executing: \n{stmt}")
-            await session.execute(text(stmt))
+    if single_round_trip:
+        statements = [sql]
+        connection = (
+            session
+            if isinstance(session, AsyncConnection)
+            else await session.connection()
+        )
+        # the driver connection runs the sql as is (without parameters,
+        # psycopg and asyncpg use the simple query protocol) in the same
+        # transaction
+        driver_connection: Any = (
+            await connection.get_raw_connection()
+        ).driver_connection
+    else:
+        statements = split_sql(sql, cache_dir=cache_dir)
+
+    timings = []
+
+    for stmt in statements:
+        timing = StatementTiming(sql_file=sql_file, statement=stmt, seconds=0)
+        start_time = time.perf_counter()
+
+        if single_round_trip:
+            await driver_connection.execute(stmt)
+        elif explain and _CREATE_MATERIALIZED_VIEW.match(timing.summary):
+            explained = (
+                await session.execute(
+                    text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {stmt}")
+                )
+            ).scalar_one()
+            # asyncpg does not decode json, the plan is its text
+            plan: list = (
+                json.loads(explained) if isinstance(explained, str) else explained
+            )
+            timing = timing._replace(plan=plan, rows=plan[0]["Plan"]["Actual Rows"])
+        else:
+            result = await session.execute(text(stmt))
+            rowcount = getattr(result, "rowcount", -1)
+            timing = timing._replace(rows=rowcount if rowcount >= 0 else None)
+
+        timing = timing._replace(seconds=time.perf_counter() - start_time)
+        timings.append(timing)
+
+        print(f"{timing.seconds:8.2f}s  {timing.summary}")
 
-    # end the timer
-    end_time = time.time()
+        if instrument is not None:
+            instrument(timing)
 
-    print(f"Time taken: {end_time - start_time:.2f} seconds")
+    print(f"Time taken: {sum(timing.seconds for timing in timings):.2f} seconds")
 
+    return timings
 
-async def add_views_main():  # pragma: no cover
-    asyncio_engine = create_async_engine(get_settings().postgresql_dsn)
+
+def split_sql(
+    sql: str,
+    *,
+    strip_comments: bool = False,
+    cache_dir: str | None = DEFAULT_CACHE_DIR,
+) -> list[str]:
+    """
+    Split sql into statements with sqlparse. The statements are cached in
+    cache_dir by the sha1 of the sql, so unchanged files are only ever
+    tokenized once.
+    """
+    try:
+        import sqlparse
+    except ImportError as e:
+        raise ImportError(_ERROR_MESSAGE) from e
+
+    cache_path = None
+
+    if cache_dir is not None:
+        key = hashlib.sha1(
+            f"{sqlparse.__version__}:{strip_comments}:{sql}".encode()
+        ).hexdigest()
+        cache_path = os.path.join(cache_dir, f"{key}.json")
+
+        try:
+            with open(cache_path, "r") as f:
+                cached: list[str] = json.load(f)
+                return cached
+        except (OSError, ValueError):
+            pass
+
+    statements = sqlparse.split(sql)
+
+    if strip_comments:
+        statements = [
+            sqlparse.format(stmt, strip_comments=True).strip() for stmt in statements
+        ]
+
+    if cache_path is not None:
+        # several processes may deploy the views at the same time
+        part_path = f"{cache_path}.{os.getpid()}.part"
+
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+
+            with open(part_path, "w") as f:
+                json.dump(statements, f)
+
+            os.replace(part_path, cache_path)
+        except OSError as e:
+            # the cache is only an optimization
+            print(f"Could not cache the split statements in {cache_dir}: {e}")
+
+            if os.path.exists(part_path):
+                os.remove(part_path)
+
+    return statements
+
+
+async def add_views_main(
+    *,
+    parallel: bool = False,
+    refresh: bool = False,
+    report_path: str | None = None,
+    explain: bool = False,
+):
+    """
+    Add the views to the database in the settings. With parallel, the
+    materialized views are built concurrently and swapped in atomically.
+    With refresh, unchanged materialized views are refreshed concurrently
+    and only changed views are rebuilt.
+
+    Otherwise the time every statement took (and with explain, the plans of
+    the materialized views) can be written as JSON to report_path.
+    """
+    asyncio_engine = get_async_engine()
     base_dir = os.path.join(os.path.dirname(__file__), "sql")
 
-    async with asyncio_engine.begin() as conn:
-        await add_views_pg(conn, base_dir)
+    if refresh:
+        from .build_views import refresh_views
+
+        await refresh_views(asyncio_engine, base_dir)
+        return
+
+    if parallel:
+        from .build_views import build_views_parallel
+
+        await build_views_parallel(asyncio_engine, base_dir)
+        return
+
+    from .report import BuildReport
+
+    report = BuildReport()
+
+    # not engine.begin(), the build commits its own transaction
+    async with asyncio_engine.connect() as conn:
+        await add_views_pg(conn, base_dir, instrument=report.record, explain=explain)
+        await bump_views_version(conn)
+        await conn.commit()
+        await report.describe_database(conn)
+
+    if report_path is not None:
+        report.save(report_path)
 
 
 if __name__ == "__main__":
-    asyncio.run(add_views_main())
+    parser = argparse.ArgumentParser(description="Add the views")
+    parser.add_argument(
+        "--parallel",
+        action="store_true",
+        help="Build the materialized views concurrently and swap them in",
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Refresh unchanged views and only rebuild the changed ones",
+    )
+    parser.add_argument(
+        "--report",
+        type=str,
+        default=None,
+        help="Write the time every statement took as JSON to this path",
+    )
+    parser.add_argument(
+        "--explain",
+        action="store_true",
+        help="Add EXPLAIN (ANALYZE, BUFFERS) of the materialized views to the report",
+    )
+    args = parser.parse_args()
+
+    asyncio.run(
+        add_views_main(
+            parallel=args.parallel,
+            refresh=args.refresh,
+            report_path=args.report,
+            explain=args.explain,
+        )
+    )
 
-__all__ = ["add_views_pg", "add_views_main"]
+__all__ = [
+    "add_views_pg",
+    "add_views_main",
+    "bump_views_version",
+    "execute_file",
+    "split_sql",
+    "StatementTiming",
+    "DEFAULT_CACHE_DIR",
+]
@@ -0,0 +1,271 @@
+"""
+Builds the views in parallel, following the dependencies between them.
+
+Every view is first built in a separate build schema - each materialized
+view and its indexes on their own connections, as soon as the views it
+depends on are built. The finished views then replace the old ones in a
+single transaction, so readers never see a missing or half indexed view.
+"""
+
+import asyncio
+import graphlib
+import time
+from collections.abc import Collection
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .add_views import bump_views_version, get_sql_files
+from .view_graph import (
+    ViewDefinition,
+    definition_hashes,
+    parse_view_definitions,
+    view_build_order,
+)
+
+DEFAULT_BUILD_SCHEMA = "views_build"
+
+# stored as the comment on every built view to detect unchanged definitions
+_DEFINITION_COMMENT = "definition sha1: "
+
+
+async def build_views_parallel(
+    engine: AsyncEngine,
+    base_dir: str,
+    *,
+    max_connections: int = 4,
+    build_schema: str = DEFAULT_BUILD_SCHEMA,
+    only: Collection[str] | None = None,
+):
+    """
+    Build the views in the sql files of base_dir with up to max_connections
+    statements running at the same time, then swap them in atomically.
+
+    Set `only` to build a subset of the views - the views they depend on
+    have to exist already.
+    """
+    print("Building views in parallel")
+
+    definitions = parse_view_definitions(get_sql_files(base_dir))
+    hashes = definition_hashes(definitions)
+
+    if only is not None:
+        definitions = {name: view for name, view in definitions.items() if name in only}
+
+    if not definitions:
+        return
+
+    async with engine.begin() as conn:
+        target_schema = (await conn.execute(text("SELECT current_schema()"))).scalar()
+        search_path = (await conn.execute(text("SHOW search_path"))).scalar()
+
+        await conn.execute(text(f"DROP SCHEMA IF EXISTS {build_schema} CASCADE"))
+        await conn.execute(text(f"CREATE SCHEMA {build_schema}"))
+
+    connections = asyncio.Semaphore(max_connections)
+
+    async def execute(stmt: str):
+        async with connections:
+            async with engine.begin() as conn:
+                # unqualified names resolve to the views being built first
+                await conn.execute(
+                    text(f"SET LOCAL search_path TO {build_schema}, {search_path}")
+                )
+                await conn.execute(text(stmt))
+
+    async def build(view: ViewDefinition):
+        start_time = time.time()
+
+        await execute(view.create)
+        await asyncio.gather(*[execute(index) for index in view.indexes])
+        await execute(
+            f"COMMENT ON {view.kind} {view.name} "
+            f"IS '{_DEFINITION_COMMENT}{hashes[view.name]}'"
+        )
+
+        print(
+            f"Built {view.name} with {len(view.indexes)} indexes in "
+            f"{time.time() - start_time:.2f} seconds"
+        )
+
+    try:
+        await _run_graph(definitions, build)
+    except BaseException:
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA IF EXISTS {build_schema} CASCADE"))
+        raise
+
+    await _swap_views(
+        engine,
+        definitions,
+        build_schema=build_schema,
+        target_schema=str(target_schema),
+    )
+
+
+async def refresh_views(
+    engine: AsyncEngine,
+    base_dir: str,
+    *,
+    max_connections: int = 4,
+    build_schema: str = DEFAULT_BUILD_SCHEMA,
+):
+    """
+    Refresh the materialized views whose definitions did not change with
+    REFRESH MATERIALIZED VIEW CONCURRENTLY (readers are never blocked), and
+    shadow build and swap in only the views whose definitions changed.
+
+    A view is unchanged if the definition hash in its comment matches the
+    sql files (see definition_hashes).
+    """
+    print("Refreshing views")
+
+    definitions = parse_view_definitions(get_sql_files(base_dir))
+    hashes = definition_hashes(definitions)
+
+    async with engine.connect() as conn:
+        comments: dict[str, str | None] = dict(
+            (
+                await conn.execute(
+                    text(
+                        """
+                        SELECT c.relname, obj_description(c.oid, 'pg_class')
+                        FROM pg_class c
+                        WHERE c.relnamespace = current_schema()::regnamespace
+                          AND c.relkind IN ('v', 'm')
+                          AND c.relname = ANY (:names)
+                        """
+                    ),
+                    {"names": list(definitions)},
+                )
+            ).all()
+        )
+
+    unchanged = {
+        name: view
+        for name, view in definitions.items()
+        if comments.get(name) == f"{_DEFINITION_COMMENT}{hashes[name]}"
+    }
+    changed = set(definitions) - set(unchanged)
+
+    connections = asyncio.Semaphore(max_connections)
+
+    async def refresh(view: ViewDefinition):
+        if not view.materialized:
+            return
+
+        start_time = time.time()
+        concurrently = "CONCURRENTLY " if view.has_unique_index else ""
+
+        async with connections:
+            async with engine.begin() as conn:
+                await conn.execute(
+                    text(f"REFRESH MATERIALIZED VIEW {concurrently}{view.name}")
+                )
+
+        print(f"Refreshed {view.name} in {time.time() - start_time:.2f} seconds")
+
+    # the changed views may select from the unchanged ones, so refresh first
+    await _run_graph(unchanged, refresh)
+
+    async with engine.begin() as conn:
+        await bump_views_version(conn)
+
+    if changed:
+        print(f"Definitions changed for {sorted(changed)}, rebuilding them")
+
+        await build_views_parallel(
+            engine,
+            base_dir,
+            max_connections=max_connections,
+            build_schema=build_schema,
+            only=changed,
+        )
+
+
+async def _run_graph(definitions: dict[str, ViewDefinition], run):
+    """
+    Run `run` for every view once all the views it depends on are done.
+    Dependencies outside of definitions are ignored.
+    """
+    sorter = graphlib.TopologicalSorter(
+        {
+            name: view.depends_on & definitions.keys()
+            for name, view in definitions.items()
+        }
+    )
+    sorter.prepare()
+
+    pending: dict[asyncio.Task, str] = {}
+
+    try:
+        while sorter.is_active():
+            for name in sorter.get_ready():
+                pending[asyncio.create_task(run(definitions[name]))] = name
+
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+            for task in done:
+                name = pending.pop(task)
+                task.result()
+                sorter.done(name)
+    finally:
+        for task in pending:
+            task.cancel()
+
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def _swap_views(
+    engine: AsyncEngine,
+    definitions: dict[str, ViewDefinition],
+    *,
+    build_schema: str,
+    target_schema: str,
+):
+    """
+    Replace the views in target_schema with the ones in build_schema in a
+    single transaction. The indexes move with their views.
+    """
+    order = view_build_order(definitions)
+
+    async with engine.begin() as conn:
+        existing: dict[str, str] = dict(
+            (
+                await conn.execute(
+                    text(
+                        """
+                        SELECT c.relname, c.relkind
+                        FROM pg_class c
+                                 JOIN pg_namespace n ON c.relnamespace = n.oid
+                        WHERE n.nspname = :schema
+                          AND c.relname = ANY (:names)
+                        """
+                    ),
+                    {"schema": target_schema, "names": order},
+                )
+            ).all()
+        )
+
+        for name in reversed(order):
+            if name in existing:
+                kind = "MATERIALIZED VIEW" if existing[name] == "m" else "VIEW"
+                await conn.execute(
+                    text(f"DROP {kind} IF EXISTS {target_schema}.{name} CASCADE")
+                )
+
+        for name in order:
+            await conn.execute(
+                text(
+                    f"ALTER {definitions[name].kind} {build_schema}.{name} "
+                    f"SET SCHEMA {target_schema}"
+                )
+            )
+
+        await conn.execute(text(f"DROP SCHEMA {build_schema}"))
+        await bump_views_version(conn)
+
+    print(f"Swapped {len(order)} views into {target_schema}")
+
+
+__all__ = ["build_views_parallel", "refresh_views"]
@@ -0,0 +1,151 @@
+"""
+Incremental maintenance of variant_view_t - a plain table with the same
+columns and indexes as variant_view_mv.
+
+Triggers on the tables variant_view_v selects from record the variant_ids
+whose rows changed in variant_view_dirty (see the VariantViewDirty model,
+migration schema_0.2.5). refresh_variant_view_incremental then recomputes
+only those rows instead of the whole materialized view.
+
+Changes to the lookup tables (e.g. renaming a condition, treatment or
+dataset) are not tracked - rebuild the table with rebuild_variant_view_t.
+"""
+
+import os
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from .add_views import bump_views_version, get_sql_files
+from .view_graph import definition_hashes, parse_view_definitions
+
+SUMMARY_TABLE = "variant_view_t"
+
+_VIEWS_DIR = os.path.join(os.path.dirname(__file__), "sql")
+
+# stored as the comment on variant_view_t to detect a changed view definition
+_DEFINITION_COMMENT = "variant_view_mv definition sha1: "
+
+# OFFSET 0 keeps the lateral subquery from being flattened into a join, so the
+# variant_id filter is pushed down into the aggregates over the individuals of
+# variant_view_v (see test_recompute_plan). The exons and structure domains
+# are still aggregated for every sequence variant.
+_RECOMPUTE_SQL = f"""
+    INSERT INTO {SUMMARY_TABLE}
+    SELECT vv.*
+    FROM unnest(CAST(:variant_ids AS INTEGER[])) AS dirty(variant_id)
+             CROSS JOIN LATERAL (SELECT *
+                                 FROM variant_view_v
+                                 WHERE variant_view_v.variant_id =
+                                       dirty.variant_id
+                                 OFFSET 0) vv
+    """
+
+
+async def setup_variant_view_incremental(
+    session: AsyncSession | AsyncConnection, base_dir: str = _VIEWS_DIR
+):
+    """
+    Build variant_view_t if it is missing or was built from another
+    definition of variant_view_mv.
+
+    The views in base_dir have to exist already (see add_views_pg).
+    """
+    comment = (
+        await session.execute(
+            text("SELECT obj_description(to_regclass(:table), 'pg_class')"),
+            {"table": SUMMARY_TABLE},
+        )
+    ).scalar()
+
+    if comment != _definition_comment(base_dir):
+        await rebuild_variant_view_t(session, base_dir)
+
+    await session.commit()
+
+
+async def rebuild_variant_view_t(
+    session: AsyncSession | AsyncConnection, base_dir: str = _VIEWS_DIR
+):
+    """
+    Recreate variant_view_t from scratch with the indexes of variant_view_mv.
+    """
+    start_time = time.time()
+
+    view = parse_view_definitions(get_sql_files(base_dir))["variant_view_mv"]
+
+    await session.execute(text(f"DROP TABLE IF EXISTS {SUMMARY_TABLE}"))
+    # every dirty variant is recomputed below
+    await session.execute(text("TRUNCATE variant_view_dirty"))
+    await session.execute(
+        text(
+            f"CREATE TABLE {SUMMARY_TABLE} AS "
+            f"SELECT * FROM variant_view_v ORDER BY variant_id"
+        )
+    )
+
+    # the index names contain the view name as well
+    for index in view.indexes:
+        await session.execute(text(index.replace("variant_view_mv", SUMMARY_TABLE)))
+
+    await session.execute(
+        text(
+            f"COMMENT ON TABLE {SUMMARY_TABLE} " f"IS '{_definition_comment(base_dir)}'"
+        )
+    )
+
+    print(
+        f"Built {SUMMARY_TABLE} with {len(view.indexes)} indexes in "
+        f"{time.time() - start_time:.2f} seconds"
+    )
+
+
+async def refresh_variant_view_incremental(
+    session: AsyncSession | AsyncConnection,
+) -> int:
+    """
+    Recompute the rows of the dirty variants in variant_view_t, in the
+    session's transaction. Returns the number of variants recomputed.
+    """
+    start_time = time.time()
+
+    variant_ids = (
+        (
+            await session.execute(
+                text("DELETE FROM variant_view_dirty RETURNING variant_id")
+            )
+        )
+        .scalars()
+        .all()
+    )
+
+    if not variant_ids:
+        return 0
+
+    await session.execute(
+        text(f"DELETE FROM {SUMMARY_TABLE} WHERE variant_id = ANY (:variant_ids)"),
+        {"variant_ids": list(variant_ids)},
+    )
+    await session.execute(text(_RECOMPUTE_SQL), {"variant_ids": list(variant_ids)})
+    await bump_views_version(session)
+
+    print(
+        f"Recomputed {len(variant_ids)} variants in {SUMMARY_TABLE} in "
+        f"{time.time() - start_time:.2f} seconds"
+    )
+
+    return len(variant_ids)
+
+
+def _definition_comment(base_dir: str) -> str:
+    hashes = definition_hashes(parse_view_definitions(get_sql_files(base_dir)))
+    return f"{_DEFINITION_COMMENT}{hashes['variant_view_mv']}"
+
+
+__all__ = [
+    "SUMMARY_TABLE",
+    "setup_variant_view_incremental",
+    "rebuild_variant_view_t",
+    "refresh_variant_view_incremental",
+]
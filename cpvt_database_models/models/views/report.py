@@ -0,0 +1,92 @@
+"""
+A JSON report of how long every statement of a view or filter build took,
+to track regressions across schema versions.
+
+    report = BuildReport()
+    await add_views_pg(session, base_dir, instrument=report.record, explain=True)
+    await report.describe_database(session)
+    report.save("views_report.json")
+"""
+
+import datetime
+
+from pydantic import BaseModel, Field, computed_field
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from .add_views import StatementTiming
+
+
+class StatementReport(BaseModel):
+    sql_file: str
+    statement: str
+    """
+    The first line of the statement
+    """
+
+    seconds: float
+    rows: int | None = None
+    plan: list | None = None
+    """
+    EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) output, for the materialized
+    views if the build was run with explain
+    """
+
+
+class BuildReport(BaseModel):
+    created_at: datetime.datetime = Field(
+        default_factory=lambda: datetime.datetime.now(datetime.UTC)
+    )
+    server_version: str | None = None
+    alembic_revision: str | None = None
+    """
+    The schema version the views were built on
+    """
+
+    statements: list[StatementReport] = []
+
+    @computed_field  # type: ignore
+    @property
+    def total_seconds(self) -> float:
+        return sum(statement.seconds for statement in self.statements)
+
+    def record(self, timing: StatementTiming):
+        """
+        The instrument hook of add_views_pg and execute_file.
+        """
+        self.statements.append(
+            StatementReport(
+                sql_file=timing.sql_file,
+                statement=timing.summary,
+                seconds=timing.seconds,
+                rows=timing.rows,
+                plan=timing.plan,
+            )
+        )
+
+    async def describe_database(self, session: AsyncSession | AsyncConnection):
+        """
+        Record the postgres version and the alembic revision of the database.
+        """
+        self.server_version = (
+            await session.execute(text("SHOW server_version"))
+        ).scalar()
+
+        if (
+            await session.execute(text("SELECT to_regclass('alembic_version')"))
+        ).scalar() is not None:
+            self.alembic_revision = (
+                await session.execute(text("SELECT version_num FROM alembic_version"))
+            ).scalar()
+
+    def slowest(self, n: int = 10) -> list[StatementReport]:
+        return sorted(self.statements, key=lambda s: s.seconds, reverse=True)[:n]
+
+    def save(self, path: str):
+        with open(path, "w") as f:
+            f.write(self.model_dump_json(indent=2))
+
+        print(f"Wrote the build report to {path}")
+
+
+__all__ = ["BuildReport", "StatementReport"]
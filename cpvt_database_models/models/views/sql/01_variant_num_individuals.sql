@@ -1,10 +1,8 @@
 DROP VIEW IF EXISTS variant_num_individuals_v CASCADE;
+-- the counts are maintained by triggers on variant and individual_variant
+-- (see the variant_individual_count model), which has a unique index on
+-- variant_id and an index on num_individuals
 CREATE VIEW variant_num_individuals_v AS
-SELECT variant.variant_id,
-       COUNT(DISTINCT individual_id) AS num_individuals
-FROM variant
-         LEFT JOIN individual_variant
-                   ON variant.variant_id = individual_variant.variant_id
-GROUP BY variant.variant_id;
--- CREATE UNIQUE INDEX variant_num_individuals_variant_id_idx ON variant_num_individuals_mv (variant_id);
--- CREATE INDEX variant_num_individuals_num_individuals_idx ON variant_num_individuals_mv (num_individuals);
+SELECT variant_id,
+       num_individuals
+FROM variant_individual_count;
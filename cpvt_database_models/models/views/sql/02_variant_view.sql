@@ -53,8 +53,9 @@ WHERE sv.p_pos_interval && s.residue_span
 -- this is for easier querying of the variant table
 -- including filters without having to join multiple tables
 -- or using another document database
-DROP MATERIALIZED VIEW IF EXISTS variant_view_mv CASCADE;
-CREATE MATERIALIZED VIEW variant_view_mv AS
+-- (the plain view also recomputes single variants for variant_view_t)
+DROP VIEW IF EXISTS variant_view_v CASCADE;
+CREATE VIEW variant_view_v AS
 WITH
     -- VARIANT ORIGINS (clinvar or from review)
     variant_dataset AS (SELECT v.variant_id,
@@ -92,7 +93,8 @@ WITH
                                                  ON vc.condition_id = c.condition_id
                                    GROUP BY vc.variant_id),
 -- INDIVIDUAL CONDITION
-    variant_to_individuals AS (SELECT v.variant_id, iv.individual_id
+    -- referenced twice, which would materialize it over every variant
+    variant_to_individuals AS NOT MATERIALIZED (SELECT v.variant_id, iv.individual_id
                                FROM variant v
                                         JOIN individual_variant iv
                                              ON iv.variant_id = v.variant_id),
@@ -239,7 +241,13 @@ FROM variant v
                    ON vic.variant_id = vit.variant_id
          LEFT JOIN avg_age_onset_cpvt avg_cpvt
                    ON v.variant_id = avg_cpvt.variant_id
-ORDER BY v.variant_id
+;
+
+DROP MATERIALIZED VIEW IF EXISTS variant_view_mv CASCADE;
+CREATE MATERIALIZED VIEW variant_view_mv AS
+SELECT *
+FROM variant_view_v
+ORDER BY variant_id
 ;
 
 -- Indexes (basically every column is filterable so need an index on every single
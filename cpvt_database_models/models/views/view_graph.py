@@ -0,0 +1,153 @@
+"""
+Parses the view sql files into view definitions and the dependencies
+between them.
+
+Every sql file may only contain DROP VIEW, CREATE [MATERIALIZED] VIEW and
+CREATE INDEX statements (on the views defined in the files).
+"""
+
+import graphlib
+import hashlib
+import re
+from typing import NamedTuple
+
+from .add_views import split_sql
+
+_DROP_VIEW = re.compile(
+    r"^DROP\s+(?:MATERIALIZED\s+)?VIEW\s+(?:IF\s+EXISTS\s+)?\w+", re.IGNORECASE
+)
+_CREATE_VIEW = re.compile(
+    r"^CREATE\s+(?:OR\s+REPLACE\s+)?(MATERIALIZED\s+)?VIEW\s+(\w+)\s+AS\b",
+    re.IGNORECASE,
+)
+_CREATE_INDEX = re.compile(
+    r"^CREATE\s+(?:UNIQUE\s+)?INDEX\s+(?:\w+\s+)?ON\s+(?:ONLY\s+)?(\w+)",
+    re.IGNORECASE,
+)
+_IDENTIFIER = re.compile(r"\b\w+\b")
+
+
+class ViewDefinition(NamedTuple):
+    name: str
+    materialized: bool
+    sql_file: str
+    create: str
+    indexes: tuple[str, ...]
+    # the other views this view selects from
+    depends_on: frozenset[str]
+
+    @property
+    def kind(self) -> str:
+        return "MATERIALIZED VIEW" if self.materialized else "VIEW"
+
+    @property
+    def has_unique_index(self) -> bool:
+        """
+        REFRESH MATERIALIZED VIEW CONCURRENTLY needs a unique index.
+        """
+        return any(
+            index.upper().startswith("CREATE UNIQUE INDEX") for index in self.indexes
+        )
+
+
+def split_statements(sql: str) -> list[str]:
+    """
+    Split sql into statements without comments. Empty statements are
+    dropped.
+    """
+    return [stmt for stmt in split_sql(sql, strip_comments=True) if stmt]
+
+
+def parse_view_definitions(sql_files: list[str]) -> dict[str, ViewDefinition]:
+    """
+    Parse the sql files into view definitions, keyed by view name.
+    """
+    creates: dict[str, tuple[bool, str, str]] = {}
+    indexes: dict[str, list[str]] = {}
+
+    for sql_file in sql_files:
+        with open(sql_file, "r") as f:
+            statements = split_statements(f.read())
+
+        for stmt in statements:
+            if _DROP_VIEW.match(stmt):
+                # the builder drops the views itself
+                continue
+
+            if match := _CREATE_VIEW.match(stmt):
+                materialized, name = match.groups()
+                creates[name] = (materialized is not None, sql_file, stmt)
+                indexes.setdefault(name, [])
+                continue
+
+            if (match := _CREATE_INDEX.match(stmt)) and match.group(1) in creates:
+                indexes[match.group(1)].append(stmt)
+                continue
+
+            raise ValueError(
+                f"Unsupported statement in {sql_file} (only views and indexes "
+                f"on them are supported): {stmt[:80]}"
+            )
+
+    return {
+        name: ViewDefinition(
+            name=name,
+            materialized=materialized,
+            sql_file=sql_file,
+            create=create,
+            indexes=tuple(indexes[name]),
+            depends_on=frozenset(
+                identifier
+                for identifier in _IDENTIFIER.findall(create)
+                if identifier in creates and identifier != name
+            ),
+        )
+        for name, (materialized, sql_file, create) in creates.items()
+    }
+
+
+def definition_hashes(definitions: dict[str, ViewDefinition]) -> dict[str, str]:
+    """
+    A sha1 of every view's CREATE and index statements, and of the hashes of
+    the views it depends on - so a view's hash changes whenever anything it
+    is built from changes.
+    """
+    hashes: dict[str, str] = {}
+
+    for name in view_build_order(definitions):
+        view = definitions[name]
+        sha1 = hashlib.sha1(view.create.encode())
+
+        for index in view.indexes:
+            sha1.update(index.encode())
+
+        for dependency in sorted(view.depends_on):
+            sha1.update(hashes[dependency].encode())
+
+        hashes[name] = sha1.hexdigest()
+
+    return hashes
+
+
+def view_build_order(definitions: dict[str, ViewDefinition]) -> list[str]:
+    """
+    The view names ordered so that every view comes after its dependencies
+    (dependencies outside of definitions are ignored).
+    """
+    return list(
+        graphlib.TopologicalSorter(
+            {
+                name: view.depends_on & definitions.keys()
+                for name, view in definitions.items()
+            }
+        ).static_order()
+    )
+
+
+__all__ = [
+    "ViewDefinition",
+    "split_statements",
+    "parse_view_definitions",
+    "definition_hashes",
+    "view_build_order",
+]
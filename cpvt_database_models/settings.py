@@ -15,6 +15,35 @@ class Settings(BaseSettings):
     postgresql_database: str = "postgres"
     postgresql_schema: str = "public"
     postgresql_port: int = 5432
+    # read-only replicas of the database, e.g. as the JSON list
+    # POSTGRESQL_REPLICA_DSNS='["postgresql+psycopg_async://..."]'
+    postgresql_replica_dsns: list[str] = []
+    replica_max_lag: float = 30
+    """
+    seconds a replica may be behind the primary and still be read from
+    """
+    replica_check_interval: float = 5
+    """
+    seconds between checks of the replication lag
+    """
+
+    # the connection pool of every engine (see database.engine)
+    pool_size: int = 5
+    pool_max_overflow: int = 10
+    pool_recycle: int = 1800
+    """
+    seconds a connection is used for before it is replaced, -1 never
+    """
+    pool_pre_ping: bool = True
+    statement_timeout: int | None = None
+    """
+    milliseconds, None uses the server's statement_timeout
+    """
+    prepared_statement_cache_size: int = 100
+    """
+    prepared statements kept per connection, 0 disables them (e.g. behind
+    pgbouncer in transaction mode)
+    """
 
     @computed_field  # type: ignore
     @property
@@ -0,0 +1,10 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+# keep the grammar and sql caches the tests write out of ~/.cache. Set here,
+# before conftest imports the package and it reads XDG_CACHE_HOME (the
+# subprocesses of test_import_time inherit it as well)
+os.environ["XDG_CACHE_HOME"] = tempfile.mkdtemp(prefix="cpvt_database_models_")
+atexit.register(shutil.rmtree, os.environ["XDG_CACHE_HOME"], ignore_errors=True)
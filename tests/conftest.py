@@ -54,8 +54,10 @@ async def setup_session(get_conn: AsyncConnection) -> AsyncConnection:
     """
 
     def _add_models(_conn: Connection):
-        from cpvt_database_models import models  # noqa: F401
         from cpvt_database_models.database import BaseBase
+        from cpvt_database_models.models import load_models
+
+        load_models()
 
         # create the uta schema
         _conn.execute(text("CREATE SCHEMA IF NOT EXISTS uta;"))
@@ -11,6 +11,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
         "variant_num_individuals_v",
         "variant_to_exon_v",
         "p_variant_to_structure_v",
+        "variant_view_v",
         "variant_view_mv",
         "protein_consequence_mv",
         "individuals_mv",
@@ -32,3 +33,134 @@ async def test_execute_file_import_error(monkeypatch, session: AsyncSession):
 
     with pytest.raises(ImportError):
         await add_views.execute_file(session, "None.sql")
+
+
+def test_split_sql_cache(monkeypatch, tmp_path):
+    import sqlparse
+
+    from cpvt_database_models.models.views.add_views import split_sql
+
+    sql = "-- comment\nSELECT 1;\nSELECT ';';\n"
+
+    assert split_sql(sql, cache_dir=str(tmp_path)) == [
+        "-- comment\nSELECT 1;",
+        "SELECT ';';",
+    ]
+    assert split_sql(sql, strip_comments=True, cache_dir=str(tmp_path)) == [
+        "SELECT 1;",
+        "SELECT ';';",
+    ]
+    assert len(list(tmp_path.iterdir())) == 2
+
+    # the cached statements are used without splitting again
+    monkeypatch.setattr(sqlparse, "split", None)
+
+    assert split_sql(sql, cache_dir=str(tmp_path)) == [
+        "-- comment\nSELECT 1;",
+        "SELECT ';';",
+    ]
+
+
+def test_split_sql_cache_write_failed(monkeypatch, tmp_path, capsys):
+    import json
+
+    from cpvt_database_models.models.views.add_views import split_sql
+
+    def _disk_full(*args):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(json, "dump", _disk_full)
+
+    # the statements are still split, without a part file left behind
+    assert split_sql("SELECT 1;", cache_dir=str(tmp_path)) == ["SELECT 1;"]
+    assert "Could not cache the split statements" in capsys.readouterr().out
+    assert list(tmp_path.iterdir()) == []
+
+
+async def test_execute_file_timings(session: AsyncSession, tmp_path):
+    from cpvt_database_models.models.views.add_views import execute_file
+
+    sql_file = tmp_path / "01_test.sql"
+    sql_file.write_text(
+        "CREATE TEMPORARY TABLE IF NOT EXISTS t (id int);\nINSERT INTO t VALUES (1), (2);\n"
+    )
+
+    timings = await execute_file(session, str(sql_file), cache_dir=str(tmp_path))
+
+    assert [timing.summary for timing in timings] == [
+        "CREATE TEMPORARY TABLE IF NOT EXISTS t (id int);",
+        "INSERT INTO t VALUES (1), (2);",
+    ]
+
+    timings = await execute_file(
+        session, str(sql_file), single_round_trip=True, cache_dir=None
+    )
+
+    assert len(timings) == 1
+    assert (await session.execute(text("SELECT count(*) FROM t"))).scalar() == 4
+
+
+async def test_add_views_report(session: AsyncSession, tmp_path):
+    import json
+
+    from cpvt_database_models.models.views import add_views_pg
+    from cpvt_database_models.models.views.report import BuildReport
+
+    (tmp_path / "01_views.sql").write_text(
+        "-- the view\n"
+        "CREATE MATERIALIZED VIEW report_mv AS SELECT generate_series(1, 3) AS n;\n"
+        "CREATE INDEX report_mv_n_idx ON report_mv (n);\n"
+        "CREATE TEMPORARY TABLE report_t AS SELECT * FROM report_mv;\n"
+    )
+
+    report = BuildReport()
+    await add_views_pg(session, str(tmp_path), instrument=report.record, explain=True)
+    await report.describe_database(session)
+    report.save(str(tmp_path / "report.json"))
+
+    saved = json.loads((tmp_path / "report.json").read_text())
+
+    assert [
+        (statement["statement"], statement["rows"]) for statement in saved["statements"]
+    ] == [
+        ("CREATE MATERIALIZED VIEW report_mv AS SELECT generate_series(1, 3) AS n;", 3),
+        ("CREATE INDEX report_mv_n_idx ON report_mv (n);", None),
+        ("CREATE TEMPORARY TABLE report_t AS SELECT * FROM report_mv;", 3),
+    ]
+    assert saved["statements"][0]["plan"][0]["Plan"]["Actual Rows"] == 3
+    assert "Shared Hit Blocks" in saved["statements"][0]["plan"][0]["Plan"]
+    assert saved["statements"][1]["plan"] is None
+    assert saved["server_version"] is not None
+    assert saved["total_seconds"] == pytest.approx(
+        sum(statement["seconds"] for statement in saved["statements"])
+    )
+
+
+async def test_execute_file_explain_text_plan(session: AsyncSession, tmp_path):
+    """
+    asyncpg returns the json of EXPLAIN as text.
+    """
+    from psycopg.types.json import JsonLoader
+    from psycopg.types.string import TextLoader
+
+    from cpvt_database_models.models.views.add_views import execute_file
+
+    sql_file = tmp_path / "01_views.sql"
+    sql_file.write_text(
+        "CREATE MATERIALIZED VIEW text_plan_mv AS SELECT generate_series(1, 2) AS n;\n"
+    )
+
+    adapters = (
+        await (await session.connection()).get_raw_connection()
+    ).driver_connection.adapters
+    adapters.register_loader("json", TextLoader)
+
+    try:
+        (timing,) = await execute_file(
+            session, str(sql_file), explain=True, cache_dir=None
+        )
+    finally:
+        adapters.register_loader("json", JsonLoader)
+
+    assert timing.rows == 2
+    assert timing.plan[0]["Plan"]["Actual Rows"] == 2
@@ -0,0 +1,251 @@
+import gzip
+import hashlib
+import os
+import pathlib
+
+import pytest
+
+from cpvt_database_models.bootstrap.bootstrap import (
+    UtaDump,
+    copy_to_csv,
+    get_uta,
+    split_uta_dump,
+)
+
+_version = "uta_20210129"
+
+_head = """SET statement_timeout = 0;
+CREATE SCHEMA uta_20210129;
+ALTER TABLE uta_20210129.gene OWNER TO uta_admin;
+"""
+
+_data = """COPY uta_20210129.gene (hgnc, maploc) FROM stdin;
+RYR2\t1q43
+ALTER TABLE looks like a statement but is data
+\\.
+
+-- Data for Name: seq
+COPY uta_20210129.seq (seq_id, seq) FROM stdin;
+abc\tACGT
+\\.
+
+SELECT pg_catalog.setval('uta_20210129.seq_anno_seq_anno_id_seq', 1, true);
+
+"""
+
+_tail = """ALTER TABLE ONLY uta_20210129.gene
+    ADD CONSTRAINT gene_pkey PRIMARY KEY (hgnc);
+CREATE INDEX seq_idx ON uta_20210129.seq (seq_id);
+"""
+
+
+@pytest.fixture
+def mirror(tmp_path: pathlib.Path) -> pathlib.Path:
+    mirror_dir = tmp_path / "mirror"
+    mirror_dir.mkdir()
+
+    dump = gzip.compress((_head + _data + _tail).encode())
+    (mirror_dir / f"{_version}.pgd.gz").write_bytes(dump)
+    (mirror_dir / f"{_version}.pgd.gz.sha1").write_text(
+        f"{hashlib.sha1(dump).hexdigest()}  {_version}.pgd.gz\n"
+    )
+
+    return mirror_dir
+
+
+@pytest.mark.parametrize("as_url", [False, True])
+def test_split_uta_dump_local(
+    mirror: pathlib.Path, tmp_path: pathlib.Path, as_url: bool
+):
+    data_dir = tmp_path / "data"
+    sql_dir = data_dir / "sql"
+    sql_dir.mkdir(parents=True)
+
+    dump = get_uta(
+        version=_version,
+        dl_url=mirror.as_uri() if as_url else str(mirror),
+        data_dir=str(data_dir),
+    )
+
+    assert dump.url is None
+    assert dump.sha1 is not None
+
+    split_uta_dump(dump, sql_dir=str(sql_dir))
+
+    assert (sql_dir / "02_schema_head.sql").read_text() == _head
+    assert (sql_dir / "04_schema.sql").read_text() == _tail
+    # the mirror is read in place
+    assert not os.path.exists(data_dir / f"{_version}.pgd.gz")
+
+
+def test_split_uta_dump_download(mirror: pathlib.Path, tmp_path: pathlib.Path):
+    sql_dir = tmp_path / "sql"
+    sql_dir.mkdir()
+    cache_path = tmp_path / f"{_version}.pgd.gz"
+    mirror_dump = mirror / f"{_version}.pgd.gz"
+
+    dump = UtaDump(
+        path=str(cache_path),
+        url=mirror_dump.as_uri(),
+        sha1=(mirror / f"{_version}.pgd.gz.sha1").read_text().split()[0],
+    )
+
+    split_uta_dump(dump, sql_dir=str(sql_dir))
+
+    assert (sql_dir / "04_schema.sql").read_text() == _tail
+    # the download is cached with its checksum for the next run
+    assert cache_path.read_bytes() == mirror_dump.read_bytes()
+    assert get_uta(
+        version=_version, dl_url="https://example.org", data_dir=str(tmp_path)
+    ) == UtaDump(path=str(cache_path), url=None, sha1=dump.sha1)
+
+
+def test_split_uta_dump_sha1_mismatch(mirror: pathlib.Path, tmp_path: pathlib.Path):
+    sql_dir = tmp_path / "sql"
+    sql_dir.mkdir()
+
+    dump = UtaDump(
+        path=str(tmp_path / f"{_version}.pgd.gz"),
+        url=(mirror / f"{_version}.pgd.gz").as_uri(),
+        sha1="0" * 40,
+    )
+
+    with pytest.raises(ValueError):
+        split_uta_dump(dump, sql_dir=str(sql_dir))
+
+    assert os.listdir(sql_dir) == []
+    assert not os.path.exists(dump.path)
+    assert not os.path.exists(f"{dump.path}.part")
+
+
+def test_add_data_incremental(monkeypatch, tmp_path: pathlib.Path):
+    from contextlib import contextmanager
+
+    from cpvt_database_models.bootstrap import bootstrap
+    from cpvt_database_models.bootstrap.manifest import BootstrapManifest
+
+    closures = {
+        ("RYR2",): bootstrap.UtaClosure(
+            tx_acs=frozenset({"NM_1"}),
+            other_acs=frozenset({"NP_1", "NC_1"}),
+            exon_set_ids=frozenset({1}),
+            exon_ids=frozenset({10}),
+            seq_ids=frozenset({"s1"}),
+        ),
+        ("CASQ2", "RYR2"): bootstrap.UtaClosure(
+            tx_acs=frozenset({"NM_1", "NM_2"}),
+            other_acs=frozenset({"NP_1", "NP_2", "NC_1"}),
+            exon_set_ids=frozenset({1, 2}),
+            exon_ids=frozenset({10, 20}),
+            seq_ids=frozenset({"s1", "s2"}),
+        ),
+    }
+    copies = []
+
+    def copy_to_csv(engine, *, query, csv_path, append=False):
+        copies.append((os.path.basename(csv_path), append, query))
+
+        with open(csv_path, "a" if append else "w") as f:
+            f.write(f"{query}\n")
+
+        return 1
+
+    @contextmanager
+    def get_engine():
+        yield None
+
+    monkeypatch.setattr(
+        bootstrap,
+        "resolve_uta_closure",
+        lambda engine, *, version, genes: closures[tuple(sorted(genes))],
+    )
+    monkeypatch.setattr(bootstrap, "copy_to_csv", copy_to_csv)
+    monkeypatch.setattr(bootstrap, "get_engine", get_engine)
+
+    sql_dir = str(tmp_path / "sql")
+    manifest_path = str(tmp_path / "bootstrap_manifest.json")
+
+    def add_data(genes: list[str]):
+        copies.clear()
+        bootstrap.add_data(
+            version=_version,
+            sql_dir=sql_dir,
+            genes=genes,
+            manifest_path=manifest_path,
+        )
+
+    add_data(["RYR2"])
+    assert len(copies) == 10
+    assert not any(append for _, append, _ in copies)
+
+    # nothing changed
+    add_data(["RYR2"])
+    assert copies == []
+
+    # only the rows of the new gene are appended
+    add_data(["RYR2", "CASQ2"])
+    assert {name for name, _, _ in copies} == {
+        "genes.csv",
+        "transcripts.csv",
+        "seq_anno.csv",
+        "seq.csv",
+        "associated_accessions.csv",
+        "exon_set.csv",
+        "exon.csv",
+        "exon_aln.csv",
+    }
+    assert all(append for _, append, _ in copies)
+
+    seq_query = next(query for name, _, query in copies if name == "seq.csv")
+    assert "'s2'" in seq_query
+    assert "'s1'" not in seq_query
+
+    manifest = BootstrapManifest.load(manifest_path, version=_version)
+    assert manifest.genes == ["CASQ2", "RYR2"]
+    assert manifest.tables["seq"].rows == 2
+    assert manifest.tables["meta"].rows == 1
+
+    # a changed csv file is extracted again
+    with open(os.path.join(sql_dir, "data", "meta.csv"), "a") as f:
+        f.write("changed\n")
+
+    add_data(["RYR2", "CASQ2"])
+    assert [(name, append) for name, append, _ in copies] == [("meta.csv", False)]
+
+    # removing a gene extracts every gene dependent table again
+    add_data(["RYR2"])
+    assert len(copies) == 8
+    assert not any(append for _, append, _ in copies)
+
+
+@pytest.mark.parametrize("driver", ["psycopg", "psycopg2"])
+def test_copy_to_csv(get_container, tmp_path: pathlib.Path, driver: str):
+    import csv
+
+    import sqlalchemy as sa
+
+    if driver == "psycopg2":
+        pytest.importorskip("psycopg2")
+
+    engine = sa.create_engine(
+        sa.make_url(get_container.get_connection_url()).set(
+            drivername=f"postgresql+{driver}"
+        )
+    )
+    # newlines and quotes inside a field do not count as rows
+    query = "SELECT g, E'a\\n\"b\"' AS s FROM generate_series(1, 3) g"
+    csv_path = tmp_path / "rows.csv"
+
+    try:
+        assert copy_to_csv(engine, query=query, csv_path=str(csv_path)) == 3
+        assert (
+            copy_to_csv(engine, query=query, csv_path=str(csv_path), append=True) == 3
+        )
+    finally:
+        engine.dispose()
+
+    with open(csv_path, newline="") as f:
+        header, *rows = csv.reader(f)
+
+    assert header == ["g", "s"]
+    assert rows == [[str(g), 'a\n"b"'] for g in (1, 2, 3, 1, 2, 3)]
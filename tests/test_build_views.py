@@ -0,0 +1,200 @@
+import os
+
+import pytest
+from sqlalchemy import Connection, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+import cpvt_database_models
+from cpvt_database_models.filters.facets import FacetedSearch
+from cpvt_database_models.models.kv_store import VIEWS_VERSION_KEY
+from cpvt_database_models.models.views import (
+    build_views_parallel,
+    parse_view_definitions,
+    view_build_order,
+)
+from cpvt_database_models.models.views.add_views import get_sql_files
+
+_views_dir = os.path.join(
+    os.path.dirname(os.path.abspath(cpvt_database_models.__file__)),
+    "models/views/sql",
+)
+
+
+def test_parse_view_definitions():
+    definitions = parse_view_definitions(get_sql_files(_views_dir))
+
+    assert definitions["variant_view_mv"].materialized
+    assert definitions["variant_view_mv"].depends_on == {"variant_view_v"}
+    assert definitions["variant_view_v"].depends_on == {
+        "variant_num_individuals_v",
+        "variant_to_exon_v",
+        "p_variant_to_structure_v",
+    }
+    assert definitions["individuals_mv"].depends_on == {"variant_view_mv"}
+    assert not definitions["cpvt_patients_v"].materialized
+    assert definitions["cpvt_patients_v"].depends_on == set()
+
+    assert all(
+        "individuals_mv" in index for index in definitions["individuals_mv"].indexes
+    )
+    assert len(definitions["individuals_mv"].indexes) == 25
+
+    order = view_build_order(definitions)
+
+    for name, view in definitions.items():
+        assert all(order.index(dep) < order.index(name) for dep in view.depends_on)
+
+
+def test_parse_view_definitions_unsupported(tmp_path):
+    sql_file = tmp_path / "01_table.sql"
+    sql_file.write_text("CREATE TABLE foo (id int);")
+
+    with pytest.raises(ValueError):
+        parse_view_definitions([str(sql_file)])
+
+
+async def test_build_views_parallel(get_engine: AsyncEngine):
+    def _add_models(_conn: Connection):
+        from cpvt_database_models.database import BaseBase
+        from cpvt_database_models.models import load_models
+
+        load_models()
+
+        _conn.execute(text("CREATE SCHEMA IF NOT EXISTS uta;"))
+        BaseBase.metadata.create_all(_conn)
+
+    async with get_engine.begin() as conn:
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS citext;"))
+        await conn.run_sync(_add_models)
+
+    # building a second time swaps out the first build
+    for _ in range(2):
+        await build_views_parallel(get_engine, _views_dir, max_connections=3)
+
+    async with get_engine.connect() as conn:
+        schemas = (
+            await conn.execute(
+                text(
+                    """
+                    SELECT relname, nspname
+                    FROM pg_class c JOIN pg_namespace n ON c.relnamespace = n.oid
+                    WHERE relname IN (
+                        'variant_view_mv',
+                        'individuals_mv',
+                        'cpvt_patients_v',
+                        'idx_variant_view_mv_variant_id'
+                    )
+                    """
+                )
+            )
+        ).all()
+
+        assert sorted(schemas) == [
+            ("cpvt_patients_v", "public"),
+            ("idx_variant_view_mv_variant_id", "public"),
+            ("individuals_mv", "public"),
+            ("variant_view_mv", "public"),
+        ]
+
+        assert (
+            await conn.execute(
+                text("SELECT count(*) FROM pg_namespace WHERE nspname = 'views_build'")
+            )
+        ).scalar() == 0
+
+        assert (await conn.execute(text("SELECT * FROM variant_view_mv"))).all() == []
+
+
+def test_definition_hashes(tmp_path):
+    import shutil
+
+    from cpvt_database_models.models.views import definition_hashes
+
+    shutil.copytree(_views_dir, tmp_path, dirs_exist_ok=True)
+    before = definition_hashes(parse_view_definitions(get_sql_files(str(tmp_path))))
+
+    # changing a view changes the hash of every view built from it
+    view_file = tmp_path / "01_variant_num_individuals.sql"
+    view_file.write_text(view_file.read_text().replace("variant_id", "variant_id "))
+    after = definition_hashes(parse_view_definitions(get_sql_files(str(tmp_path))))
+
+    changed = {name for name in before if before[name] != after[name]}
+
+    assert changed == {
+        "variant_num_individuals_v",
+        "variant_view_v",
+        "variant_view_mv",
+        "protein_consequence_mv",
+        "individuals_mv",
+    }
+
+
+async def test_refresh_views(get_engine: AsyncEngine, tmp_path):
+    import shutil
+
+    from cpvt_database_models.models.views import refresh_views
+
+    shutil.copytree(_views_dir, tmp_path, dirs_exist_ok=True)
+
+    async def view_oids() -> dict[str, int]:
+        async with get_engine.connect() as conn:
+            return dict(
+                (
+                    await conn.execute(
+                        text(
+                            """
+                            SELECT relname, oid::int FROM pg_class
+                            WHERE relname IN (
+                                'variant_view_mv',
+                                'individuals_mv',
+                                'cpvt_patients_v'
+                            )
+                            """
+                        )
+                    )
+                ).all()
+            )
+
+    async def views_version():
+        async with get_engine.connect() as conn:
+            return (
+                await conn.execute(
+                    text("SELECT updated_at FROM kv_store WHERE key = :key"),
+                    {"key": VIEWS_VERSION_KEY},
+                )
+            ).scalar()
+
+    await build_views_parallel(get_engine, str(tmp_path))
+    built = await view_oids()
+    built_version = await views_version()
+
+    search = FacetedSearch()
+
+    async with get_engine.connect() as conn:
+        assert await search.refresh(conn)
+        assert not await search.refresh(conn)
+
+    # unchanged definitions are refreshed in place
+    await refresh_views(get_engine, str(tmp_path))
+    assert await view_oids() == built
+    assert await views_version() > built_version
+
+    async with get_engine.connect() as conn:
+        # not checked again within check_interval
+        assert not await search.refresh(conn)
+
+        # the bitmaps of the refreshed variant_view_mv are reloaded
+        search.check_interval = 0
+        assert await search.refresh(conn)
+
+    # only the changed view is rebuilt
+    view_file = tmp_path / "04_individuals.sql"
+    view_file.write_text(
+        view_file.read_text() + "\nCREATE INDEX ON individuals_mv (sex);"
+    )
+    await refresh_views(get_engine, str(tmp_path))
+    refreshed = await view_oids()
+
+    assert refreshed["variant_view_mv"] == built["variant_view_mv"]
+    assert refreshed["cpvt_patients_v"] == built["cpvt_patients_v"]
+    assert refreshed["individuals_mv"] != built["individuals_mv"]
@@ -3,11 +3,14 @@ Every model (except the uta models) should be able to be
 added to the database without any errors.
 """
 
-from typing import Callable
+import datetime
+import json
+from typing import Any, Callable
 
 import pytest
 from hgvs.easy import parser
-from sqlalchemy import ForeignKey
+from sqlalchemy import DateTime, ForeignKey
+from sqlalchemy.dialects.postgresql import INT4RANGE, JSONB, Range
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import mapped_column, relationship, Mapped
@@ -317,3 +320,85 @@ def test_models_base(session: AsyncSession):
             "name": "hero",
         }
     ].__str__()
+
+
+def test_models_to_dict_relationships():
+    class Villain(BaseBase):
+        __tablename__ = "villain"
+
+        villain_id: Mapped[int] = mapped_column(primary_key=True)
+        name: Mapped[str] = mapped_column()
+
+        henchmen: Mapped[list["Henchman"]] = relationship(back_populates="villain")
+
+    class Henchman(BaseBase):
+        __tablename__ = "henchman"
+
+        henchman_id: Mapped[int] = mapped_column(primary_key=True)
+        villain_id: Mapped[int] = mapped_column(ForeignKey("villain.villain_id"))
+
+        villain: Mapped["Villain"] = relationship(back_populates="henchmen")
+
+    villain = Villain(
+        villain_id=1,
+        name="villain",
+        henchmen=[Henchman(henchman_id=1), Henchman(henchman_id=2)],
+    )
+
+    # the back references to the villain are left out
+    assert villain.to_dict(include_relationships=True) == {
+        "villain_id": 1,
+        "name": "villain",
+        "henchmen": [{"henchman_id": 1}, {"henchman_id": 2}],
+    }
+
+    assert villain.henchmen[0].to_dict(include_relationships=True, max_depth=2) == {
+        "henchman_id": 1,
+        "villain": {
+            "villain_id": 1,
+            "name": "villain",
+            "henchmen": [{"henchman_id": 2}],
+        },
+    }
+
+    # only one relationship deep by default
+    assert villain.henchmen[0].to_dict(include_relationships=True) == {
+        "henchman_id": 1,
+        "villain": {"villain_id": 1, "name": "villain"},
+    }
+
+    assert villain.to_dict(include_relationships=True, max_depth=0) == {
+        "villain_id": 1,
+        "name": "villain",
+    }
+
+
+def test_models_to_json_bytes():
+    class Lair(BaseBase):
+        __tablename__ = "lair"
+
+        lair_id: Mapped[int] = mapped_column(primary_key=True)
+        floors: Mapped[Range[int] | None] = mapped_column(INT4RANGE)
+        built_at: Mapped[datetime.datetime | None] = mapped_column(
+            DateTime(timezone=True)
+        )
+        features: Mapped[dict[str, Any] | None] = mapped_column(JSONB)
+
+    lair = Lair(
+        lair_id=1,
+        floors=Range(1, 5),
+        built_at=datetime.datetime(2024, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc),
+        features={"traps": ["pit"], "moat": True},
+    )
+
+    assert json.loads(lair.to_json_bytes()) == {
+        "lair_id": 1,
+        "floors": "[1,5)",
+        "built_at": "2024-01-02T03:04:05+00:00",
+        "features": {"traps": ["pit"], "moat": True},
+    }
+
+    assert json.loads(Lair(lair_id=2, floors=None).to_json_bytes()) == {
+        "lair_id": 2,
+        "floors": None,
+    }
@@ -0,0 +1,161 @@
+"""
+The compiled edit type classifier must give the same labels as the
+hgvs_types.pymeta Parsley grammar.
+"""
+
+import copy
+import os
+
+import bioutils.sequences
+import hgvs.edit
+import hgvs.enums
+import hgvs.location
+import hgvs.posedit
+import hgvs.sequencevariant
+import parsley
+import pytest
+
+import cpvt_database_models.models.variants.hgvs_variant as hgvs_variant
+from cpvt_database_models.models import SequenceVariantDb, edit_type_ids
+from cpvt_database_models.models.variants.hgvs_variant import (
+    classify_edit_type,
+    get_typed_grammar,
+)
+
+_corpus = [
+    # DNA
+    "c.14876G>A",
+    "c.76+3A>T",
+    "c.-12-3C>G",
+    "c.*12T>C",
+    "c.(1_2)del",
+    "c.1_2=",
+    "c.123=",
+    "c.123A=",
+    "c.1234del",
+    "c.1234delA",
+    "c.1234del10",
+    "c.1234_1235delinsAT",
+    "c.1234delAinsGG",
+    "c.1234_1235insA",
+    "c.1234dup",
+    "c.1234_1240dupACG",
+    "c.1234_1240inv",
+    "c.1234_1240inv7",
+    "c.1234copy2",
+    "c.1234A>Gx",
+    "c.1234ins",
+    "c.1234delinsX",
+    "c.1234-?del",
+    "g.1234del",
+    "g.?_1234del",
+    "g.1234_1235insTTT",
+    "g.(1234_1240)dup",
+    "m.3243A>G",
+    "n.76+3A>T",
+    "r.76a>u",
+    "r.(76a>u)",
+    "r.76_77insu",
+    "r.76copy2",
+    # protein
+    "p.Trp24Ter",
+    "p.(Trp24Ter)",
+    "p.W24*",
+    "p.Trp24*",
+    "p.Arg33fs",
+    "p.Arg33Glnfs",
+    "p.Arg33GlnfsTer12",
+    "p.Arg33fsTer?",
+    "p.R33fs*12",
+    "p.Arg33fs12",
+    "p.Met1ext-5",
+    "p.Met1ValextMet-5",
+    "p.Ter110GlnextTer17",
+    "p.Ter110Glnext*?",
+    "p.Arg12?",
+    "p.Arg12_Gly14delinsTrpVal",
+    "p.Arg12delinsTer",
+    "p.Arg12delinsTerArg",
+    "p.Arg12_Gly13insTrpValTer",
+    "p.Arg12_Gly13insWV*",
+    "p.Arg12del",
+    "p.Arg12_Gly14del",
+    "p.Arg12dup",
+    "p.Arg12=",
+    "p.(Arg12=)",
+    "p.Xaa12del",
+    "p.X12del",
+    "p.=",
+    "p.(=)",
+    "p.0",
+    "p.0?",
+    "p.?",
+    "p.Asx12del",
+    "p.Arg12Glx",
+    # unsupported
+    "c.1234con",
+    "x.1234del",
+    "c1234del",
+]
+
+
+def _grammar_label(grammar, variant_no_accn: str) -> str:
+    try:
+        return grammar(variant_no_accn).typed_posedit()[1]
+    except Exception:
+        return "Unknown"
+
+
+@pytest.fixture(scope="module")
+def grammar():
+    with open(
+        os.path.join(os.path.dirname(hgvs_variant.__file__), "hgvs_types.pymeta")
+    ) as f:
+        return parsley.makeGrammar(
+            f.read(),
+            {"hgvs": hgvs, "bioutils": bioutils, "copy": copy},
+        )
+
+
+@pytest.mark.parametrize("variant_no_accn", _corpus)
+def test_classifier_matches_grammar(grammar, variant_no_accn: str):
+    label = classify_edit_type(variant_no_accn)
+
+    # unclassified strings fall back to the grammar
+    if label is not None:
+        assert label == _grammar_label(grammar, variant_no_accn)
+        assert label in edit_type_ids()
+
+
+@pytest.mark.parametrize("variant_no_accn", _corpus)
+def test_typed_grammar_matches_grammar(grammar, variant_no_accn: str):
+    assert _grammar_label(get_typed_grammar(), variant_no_accn) == _grammar_label(
+        grammar, variant_no_accn
+    )
+
+
+@pytest.mark.parametrize(
+    "variant_no_accn",
+    ["c.1234con", "p.Asx12del", "p.Arg12Glx", "x.1234del", "c1234del"],
+)
+def test_classifier_ambiguous(variant_no_accn: str):
+    assert classify_edit_type(variant_no_accn) is None
+
+
+def test_classifier_fallback(monkeypatch, grammar):
+    calls = []
+
+    def _grammar(variant_no_accn):
+        calls.append(variant_no_accn)
+        return grammar(variant_no_accn)
+
+    consequence_id = SequenceVariantDb._determine_molecular_consequence_id
+    assert consequence_id(_grammar, "NM_001035.3:c.14876G>A") == 2
+    assert calls == []
+
+    assert consequence_id(_grammar, "NP_003997.1:p.Asx12del") == 13
+    assert calls == ["p.Asx12del"]
+
+    monkeypatch.setattr(SequenceVariantDb, "use_fast_edit_type", False)
+    assert consequence_id(None, "NM_001035.3:c.14876G>A") == 13
+    assert consequence_id(_grammar, "NM_001035.3:c.14876G>A") == 2
@@ -0,0 +1,187 @@
+import pytest
+from sqlalchemy import make_url, text
+from testcontainers.postgres import PostgresContainer
+
+from cpvt_database_models.database import engine
+from cpvt_database_models.settings import Settings
+
+
+def _settings(container: PostgresContainer, **kwargs) -> Settings:
+    url = make_url(container.get_connection_url())
+
+    return Settings(
+        **{
+            "postgresql_host": url.host,
+            "postgresql_port": url.port,
+            "postgresql_username": url.username,
+            "postgresql_password": url.password or "",
+            "postgresql_database": url.database,
+            **kwargs,
+        }
+    )
+
+
+@pytest.fixture()
+def settings(get_container: PostgresContainer, monkeypatch):
+    def _use_settings(**kwargs) -> Settings:
+        settings = _settings(get_container, **kwargs)
+        monkeypatch.setattr(engine, "get_settings", lambda: settings)
+
+        return settings
+
+    yield _use_settings
+
+    engine.get_sessionmaker.cache_clear()
+    engine.get_replica_router.cache_clear()
+    engine.get_async_engine.cache_clear()
+
+
+async def test_create_engine_from_settings(get_container: PostgresContainer):
+    settings = _settings(
+        get_container,
+        pool_size=2,
+        statement_timeout=1234,
+        prepared_statement_cache_size=7,
+    )
+    asyncio_engine = engine.create_engine_from_settings(
+        settings.postgresql_dsn, settings
+    )
+
+    assert asyncio_engine.pool.size() == 2
+
+    async with asyncio_engine.connect() as conn:
+        assert (await conn.execute(text("SHOW statement_timeout"))).scalar() == "1234ms"
+
+        driver_connection = (await conn.get_raw_connection()).driver_connection
+        assert driver_connection.prepared_max == 7
+
+    await asyncio_engine.dispose()
+
+    settings = _settings(get_container, prepared_statement_cache_size=0)
+    asyncio_engine = engine.create_engine_from_settings(
+        settings.postgresql_dsn, settings
+    )
+
+    async with asyncio_engine.connect() as conn:
+        driver_connection = (await conn.get_raw_connection()).driver_connection
+        assert driver_connection.prepare_threshold is None
+
+    await asyncio_engine.dispose()
+
+
+async def test_create_engine_from_settings_dsn_driver(
+    get_container: PostgresContainer,
+):
+    # a psycopg dsn (e.g. a replica) with settings for asyncpg
+    settings = _settings(
+        get_container,
+        driver="postgresql+asyncpg",
+        statement_timeout=1234,
+        prepared_statement_cache_size=7,
+    )
+    dsn = _settings(get_container).postgresql_dsn
+    asyncio_engine = engine.create_engine_from_settings(dsn, settings)
+
+    async with asyncio_engine.connect() as conn:
+        assert (await conn.execute(text("SHOW statement_timeout"))).scalar() == "1234ms"
+
+        driver_connection = (await conn.get_raw_connection()).driver_connection
+        assert driver_connection.prepared_max == 7
+
+    await asyncio_engine.dispose()
+
+    assert engine._connect_args("postgresql+asyncpg", settings) == {
+        "server_settings": {"statement_timeout": "1234"},
+        "prepared_statement_cache_size": 7,
+    }
+
+
+async def test_get_sessionmaker(settings):
+    settings()
+
+    assert engine.get_async_engine() is engine.get_async_engine()
+    assert engine.get_sessionmaker() is engine.get_sessionmaker()
+
+    async with engine.get_sessionmaker()() as session:
+        assert session.bind is engine.get_async_engine()
+        assert (
+            await session.execute(text("SHOW transaction_read_only"))
+        ).scalar() == "off"
+
+    # without a replica, reads go to the primary in read-only transactions
+    async with engine.read_session() as session:
+        assert (
+            await session.execute(text("SHOW transaction_read_only"))
+        ).scalar() == "on"
+
+    await engine.dispose_engines()
+
+
+async def test_read_session_replicas(settings):
+    primary = settings()
+    settings(postgresql_replica_dsns=[primary.postgresql_dsn] * 2)
+
+    router = engine.get_replica_router()
+    assert len(router.replicas) == 2
+    assert router.replicas[0].pool is not engine.get_async_engine().pool
+
+    binds = []
+
+    for _ in range(4):
+        async with engine.read_session() as session:
+            binds.append(session.bind)
+
+            assert (
+                await session.execute(text("SHOW transaction_read_only"))
+            ).scalar() == "on"
+
+    assert binds == [*router.replicas, *router.replicas]
+    assert router.lags == (0, 0)
+
+    # writes stay on the primary
+    async with engine.get_sessionmaker()() as session:
+        assert session.bind is engine.get_async_engine()
+
+    await engine.dispose_engines()
+
+    assert engine.get_replica_router() is not router
+
+    await engine.dispose_engines()
+
+
+async def test_replica_router(get_container: PostgresContainer):
+    settings = _settings(get_container)
+    primary = engine.create_engine_from_settings(settings.postgresql_dsn, settings)
+    replica = engine.create_engine_from_settings(settings.postgresql_dsn, settings)
+    unreachable = engine.create_engine_from_settings(
+        _settings(get_container, postgresql_port=1).postgresql_dsn, settings
+    )
+
+    router = engine.ReplicaRouter(primary, [replica, unreachable], check_interval=3600)
+
+    assert await router.refresh()
+    assert router.lags == (0, None)
+    assert [await router.engine() for _ in range(3)] == [router.replicas[0]] * 3
+
+    # checked at most every check_interval
+    assert not await router.refresh()
+
+    # every replica lags behind
+    router.max_lag = -1
+    assert await router.refresh(force=True)
+    assert await router.engine() is router.primary
+
+    # the primary's WAL position, unknown if it can not be reached
+    assert await engine._current_wal_lsn(router.primary)
+    assert await engine._current_wal_lsn(unreachable) is None
+
+    # without replicas, read from the primary
+    router = engine.ReplicaRouter(primary)
+    assert not await router.refresh()
+    assert await router.engine() is router.primary
+
+    async with router.primary.connect() as conn:
+        assert (await conn.execute(text("SHOW transaction_read_only"))).scalar() == "on"
+
+    for asyncio_engine in (primary, replica, unreachable):
+        await asyncio_engine.dispose()
@@ -0,0 +1,154 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from cpvt_database_models.filters.facets import (
+    FacetedSearch,
+    bitmap,
+    compile_selection,
+)
+from cpvt_database_models.filters.schema import (
+    FilterById,
+    FilterByIdValue,
+    FilterByRange,
+    FilterByRangeValue,
+)
+from cpvt_database_models.models import (
+    ClinicalSignificance,
+    DatasetVariant,
+    Individual,
+    IndividualVariant,
+    Variant,
+    VariantsDataset,
+)
+
+
+def _by_id(query_param: str, *ids: int) -> FilterById:
+    return FilterById(
+        component="checkboxes",
+        queryParam=query_param,
+        label=query_param,
+        ordinal=1,
+        hidden=False,
+        values=[FilterByIdValue(label=str(i), value=i) for i in ids],
+    )
+
+
+def _by_range(query_param: str, low: float | None, high: float | None):
+    return FilterByRange(
+        component="range",
+        queryParam=query_param,
+        label=query_param,
+        ordinal=1,
+        hidden=False,
+        values=[FilterByRangeValue(min=low, max=high)],
+    )
+
+
+def test_bitmap():
+    assert bitmap([]) == 0
+    assert bitmap([0, 3, 9, 3]) == 0b1000001001
+    assert bitmap(range(1, 1000)).bit_count() == 999
+
+
+async def test_faceted_search(view_session: AsyncSession):
+    view_session.add_all(
+        [
+            VariantsDataset(dataset_id=1, name="ClinVar"),
+            VariantsDataset(dataset_id=2, name="Review"),
+            ClinicalSignificance(clinical_significance_id=1, clinical_significance="A"),
+            ClinicalSignificance(clinical_significance_id=2, clinical_significance="B"),
+            *[Individual(individual_id=i) for i in range(1, 4)],
+        ]
+    )
+    await view_session.flush()
+    view_session.add_all(
+        [
+            Variant(
+                variant_id=i,
+                hgvs_string=f"NM_001035.3(RYR2):c.{i}A>G",
+                clinical_significance_id=significance,
+            )
+            for i, significance in [(1, 1), (2, 1), (3, 2), (4, None)]
+        ]
+    )
+    await view_session.flush()
+    view_session.add_all(
+        [
+            DatasetVariant(dataset_id=1, variant_id=1),
+            DatasetVariant(dataset_id=1, variant_id=2),
+            DatasetVariant(dataset_id=2, variant_id=2),
+            DatasetVariant(dataset_id=2, variant_id=3),
+            IndividualVariant(individual_id=1, variant_id=2),
+            IndividualVariant(individual_id=2, variant_id=2),
+            IndividualVariant(individual_id=3, variant_id=3),
+        ]
+    )
+    await view_session.flush()
+    await view_session.execute(text("REFRESH MATERIALIZED VIEW variant_view_mv"))
+
+    search = FacetedSearch()
+
+    result = await search.search(view_session, [_by_id("provenance", 1)])
+
+    assert result.total == 2
+    assert [v["variant_id"] for v in result.variants] == [1, 2]
+    # the selection of a facet does not apply to its own counts
+    assert result.counts["provenance"] == {1: 2, 2: 2}
+    assert result.counts["clinicalSignificance"] == {1: 2, 2: 0}
+
+    result = await search.search(
+        view_session,
+        [_by_id("provenance", 1, 2), _by_range("numIndividuals", 1, None)],
+        order_by="num_individuals",
+        descending=True,
+    )
+
+    assert result.total == 2
+    assert [v["variant_id"] for v in result.variants] == [2, 3]
+    assert result.counts["provenance"] == {1: 1, 2: 2}
+    assert result.counts["clinicalSignificance"] == {1: 1, 2: 1}
+
+    result = await search.search(
+        view_session,
+        [_by_id("clinicalSignificance", 2), _by_range("numIndividuals", 2, 5)],
+    )
+
+    assert (result.total, result.variants) == (0, [])
+    assert result.counts["clinicalSignificance"] == {1: 1, 2: 0}
+
+    # the second page
+    result = await search.search(view_session, [], limit=3, offset=3)
+
+    assert result.total == 4
+    assert [v["variant_id"] for v in result.variants] == [4]
+
+
+async def test_faceted_search_invalid(view_session: AsyncSession):
+    search = FacetedSearch()
+
+    with pytest.raises(ValueError):
+        await search.search(view_session, [_by_id("unknown", 1)])
+
+    with pytest.raises(ValueError):
+        await search.search(view_session, [], order_by="missing")
+
+
+async def test_faceted_search_empty_range(view_session: AsyncSession):
+    search = FacetedSearch()
+
+    # no integer position in between the bounds
+    for low, high in [(3.5, 3.8), (8, 2)]:
+        conditions = compile_selection([_by_range("cPosInterval", low, high)])
+
+        assert str(conditions["cPosInterval"]) == "false"
+
+        result = await search.search(
+            view_session, [_by_range("cPosInterval", low, high)]
+        )
+
+        assert (result.total, result.variants) == (0, [])
+
+    conditions = compile_selection([_by_range("cPosInterval", 3.5, 4.2)])
+
+    assert conditions["cPosInterval"].compile().params["int4range_1"] == 4
@@ -131,7 +131,8 @@ def test_invalid_filter(filter_class: Type[FilterJSONB], filter_data: dict):
         filter_class(**filter_data)
 
 
-async def test_add_filters(view_session: AsyncSession):
+@pytest.mark.parametrize("single_round_trip", [False, True])
+async def test_add_filters(view_session: AsyncSession, single_round_trip: bool):
     import cpvt_database_models
 
     await add_views_pg(
@@ -140,6 +141,7 @@ async def test_add_filters(view_session: AsyncSession):
             os.path.dirname(os.path.abspath(cpvt_database_models.__file__)),
             "filters/sql",
         ),
+        single_round_trip=single_round_trip,
     )
 
     # the kv table should have NUM_FILTERS rows
@@ -160,3 +162,92 @@ async def test_add_filters(view_session: AsyncSession):
         print(kv.value)
 
         KVStoreRead.model_validate(kv)
+
+    from cpvt_database_models.filters.repository import FILTER_KEYS, FilterRepository
+
+    repository = FilterRepository()
+
+    for key in FILTER_KEYS:
+        assert (await repository.get(view_session, key)).filters
+
+
+async def test_filter_repository(session: AsyncSession):
+    import datetime
+    import json
+
+    from sqlalchemy import update
+
+    from cpvt_database_models.filters.repository import FilterRepository
+
+    session.add(
+        KVStore(
+            key="filters:variants",
+            value=[
+                data_valid_filter["checkboxes"][1],
+                {
+                    "label": "Range",
+                    "hidden": True,
+                    "values": [{"min": 1, "max": 2}],
+                    "histogram": [{"bin": 1, "freq": 2}],
+                    "ordinal": 2,
+                    "component": "range",
+                    "queryParam": "range",
+                },
+            ],
+        )
+    )
+    await session.flush()
+
+    repository = FilterRepository()
+    loaded = await repository.get(session, "filters:variants")
+
+    assert isinstance(loaded.filters[0], FilterById)
+    assert isinstance(loaded.filters[1], FilterByRange)
+    assert json.loads(loaded.json)[1]["histogram"] == [{"bin": 1, "freq": 2}]
+
+    with pytest.raises(KeyError):
+        await repository.get(session, "filters:proteins")
+
+    # unchanged rows are not loaded again
+    assert not await repository.refresh(session)
+    assert await repository.get(session, "filters:variants") is loaded
+
+    await session.execute(
+        update(KVStore)
+        .where(KVStore.key == "filters:variants")
+        .values(
+            value=[data_valid_filter["combobox"][1]],
+            updated_at=loaded.updated_at + datetime.timedelta(seconds=1),
+        )
+    )
+
+    assert await repository.refresh(session)
+    assert [
+        f.component for f in (await repository.get(session, "filters:variants")).filters
+    ] == ["combobox"]
+
+
+async def test_rebuild_filters(view_session: AsyncSession):
+    from cpvt_database_models.filters.add_filters import rebuild_filters
+
+    with pytest.raises(ValueError):
+        await rebuild_filters(view_session, only=["variants", "unknown"])
+
+    await rebuild_filters(view_session, only=["proteins"])
+
+    keys = (await view_session.execute(select(KVStore.key))).scalars().all()
+
+    assert keys == ["filters:proteins"]
+
+    timings = await rebuild_filters(view_session)
+
+    keys = (await view_session.execute(select(KVStore.key))).scalars().all()
+
+    assert sorted(keys) == [
+        "filters:individuals",
+        "filters:proteins",
+        "filters:variants",
+    ]
+    # 01_ui_filter.sql runs first, every file is a single statement
+    assert [t.sql_file for t in timings][0].endswith("01_ui_filter.sql")
+    assert len(timings) == 4
@@ -0,0 +1,113 @@
+"""
+Importing the models should not import hgvs, parsley or Bio (hgvs.easy alone
+takes seconds and connects to UTA). Every measurement runs in a new
+interpreter, after SQLAlchemy is imported.
+"""
+
+import json
+import subprocess
+import sys
+
+import pytest
+
+_HEAVY_PACKAGES = ("hgvs", "parsley", "Bio")
+
+_MEASURE = """
+import json
+import sys
+import time
+
+import sqlalchemy.dialects.postgresql
+import sqlalchemy.ext.asyncio
+import sqlalchemy.orm
+
+start = time.perf_counter()
+import cpvt_database_models.models as models
+{code}
+elapsed = time.perf_counter() - start
+
+print(json.dumps({{
+    "elapsed": elapsed,
+    "heavy": sorted({{name.split(".")[0] for name in sys.modules}} & {heavy}),
+}}))
+"""
+
+
+def _measure(code: str, runs: int = 3) -> tuple[float, list[str]]:
+    """
+    The fastest of runs timings of code and the heavy packages it imported.
+    """
+    results = [
+        json.loads(
+            subprocess.run(
+                [
+                    sys.executable,
+                    "-c",
+                    _MEASURE.format(code=code, heavy=set(_HEAVY_PACKAGES)),
+                ],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+        )
+        for _ in range(runs)
+    ]
+
+    return min(r["elapsed"] for r in results), results[0]["heavy"]
+
+
+@pytest.mark.parametrize(
+    ("code", "budget"),
+    [
+        ("", 0.25),
+        ("models.KVStore, models.Publication", 1.0),
+        ("models.load_models()", 2.0),
+        ("models.Publication(publication_id=1)", 2.0),
+    ],
+    ids=["package", "some_models", "load_models", "configure_mappers"],
+)
+def test_import_time(code: str, budget: float):
+    elapsed, heavy = _measure(code)
+
+    assert heavy == []
+    assert elapsed < budget, f"took {elapsed:.3f}s, the budget is {budget}s"
+
+
+def test_deferred_imports():
+    """
+    The hgvs helpers still import what they need when they are used.
+    """
+    from cpvt_database_models.models import ProteinConsequence
+    from cpvt_database_models.models.variants.hgvs_variant import (
+        posedit_aa3_to_aa1,
+    )
+
+    assert posedit_aa3_to_aa1("Trp24Ter") == "W24*"
+
+    with pytest.raises(ValueError):
+        ProteinConsequence(sequence_variant=object())
+
+
+def test_facets_imports():
+    """
+    The facets only need the kv_store key of the views, not the view tooling,
+    the engine or the settings.
+    """
+    modules = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import json, sys\n"
+            "import cpvt_database_models.filters.facets\n"
+            "print(json.dumps(sorted(sys.modules)))",
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+
+    assert not {
+        "cpvt_database_models.models.views.add_views",
+        "cpvt_database_models.database.engine",
+        "pydantic_settings",
+    } & set(json.loads(modules))
@@ -0,0 +1,146 @@
+from sqlalchemy import delete, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from cpvt_database_models.models import (
+    Condition,
+    Individual,
+    IndividualCondition,
+    IndividualVariant,
+    Treatment,
+    TreatmentRecord,
+    Variant,
+)
+from cpvt_database_models.models.views import (
+    refresh_variant_view_incremental,
+    setup_variant_view_incremental,
+)
+
+
+async def _rows(session: AsyncSession, relation: str):
+    return (
+        await session.execute(text(f"SELECT * FROM {relation} ORDER BY variant_id"))
+    ).all()
+
+
+async def _dirty(session: AsyncSession) -> set[int]:
+    return set(
+        (await session.execute(text("SELECT variant_id FROM variant_view_dirty")))
+        .scalars()
+        .all()
+    )
+
+
+async def test_refresh_variant_view_incremental(view_session: AsyncSession):
+    view_session.add_all(
+        [
+            Variant(variant_id=1, hgvs_string="NM_001035.3(RYR2):c.1A>G"),
+            Variant(variant_id=2, hgvs_string="NM_001035.3(RYR2):c.2A>G"),
+            Variant(variant_id=3, hgvs_string="NM_001035.3(RYR2):c.3A>G"),
+            Individual(individual_id=1),
+            Individual(individual_id=2),
+            Condition(
+                condition_id=1,
+                condition="Catecholaminergic polymorphic ventricular tachycardia 1",
+            ),
+            Treatment(treatment_id=1, treatment_name="flecainide"),
+        ]
+    )
+    await view_session.flush()
+    view_session.add_all(
+        [
+            IndividualVariant(individual_id=1, variant_id=1),
+            IndividualVariant(individual_id=2, variant_id=2),
+        ]
+    )
+    await view_session.flush()
+
+    # the triggers are part of the schema, not of the setup
+    assert await _dirty(view_session) == {1, 2, 3}
+
+    await setup_variant_view_incremental(view_session)
+
+    assert await _dirty(view_session) == set()
+    assert await _rows(view_session, "variant_view_t") == await _rows(
+        view_session, "variant_view_v"
+    )
+
+    # the changes of individual 1 only affect variant 1
+    view_session.add_all(
+        [
+            IndividualCondition(
+                individual_id=1, condition_id=1, has_condition=True, age_of_onset=12
+            ),
+            TreatmentRecord(patient_id=1, treatment_id=1, treatment_taken=True),
+        ]
+    )
+    await view_session.flush()
+    await view_session.execute(delete(Variant).where(Variant.variant_id == 3))
+
+    assert await _dirty(view_session) == {1, 3}
+    assert await refresh_variant_view_incremental(view_session) == 2
+    assert await refresh_variant_view_incremental(view_session) == 0
+
+    assert await _rows(view_session, "variant_view_t") == await _rows(
+        view_session, "variant_view_v"
+    )
+    assert (
+        await view_session.execute(
+            text(
+                "SELECT variant_id, num_individuals, avg_age_of_onset_cpvt "
+                "FROM variant_view_t ORDER BY variant_id"
+            )
+        )
+    ).all() == [(1, 1, 12), (2, 1, None)]
+
+    # setting up again keeps the table since the definition did not change
+    table_oid = (
+        await view_session.execute(text("SELECT 'variant_view_t'::regclass::int"))
+    ).scalar()
+    await setup_variant_view_incremental(view_session)
+
+    assert (
+        await view_session.execute(text("SELECT 'variant_view_t'::regclass::int"))
+    ).scalar() == table_oid
+
+
+async def test_recompute_plan(view_session: AsyncSession):
+    from cpvt_database_models.models.views.incremental import _RECOMPUTE_SQL
+
+    await setup_variant_view_incremental(view_session)
+
+    # the tables are empty, so only an index scan on the dirty variant_ids
+    # (or their individuals) can beat a full scan
+    await view_session.execute(text("SET LOCAL enable_seqscan = off"))
+    (plan,) = (
+        await view_session.execute(
+            text(f"EXPLAIN (FORMAT JSON) {_RECOMPUTE_SQL}"), {"variant_ids": [1]}
+        )
+    ).scalar()
+
+    def nodes(node: dict):
+        yield node
+
+        for child in node.get("Plans", ()):
+            yield from nodes(child)
+
+    individual_scans = [
+        node
+        for node in nodes(plan["Plan"])
+        if node.get("Relation Name")
+        in ("individual_variant", "individual_condition", "treatment_record")
+    ]
+
+    assert individual_scans
+    # only the individuals of the dirty variants are read: every scan is keyed
+    # (a bitmap heap scan reports its key as the recheck condition)
+    assert all(
+        node.get("Index Cond") or node.get("Recheck Cond") for node in individual_scans
+    )
+    assert all(
+        "dirty.variant_id" in (node.get("Index Cond") or node["Recheck Cond"])
+        for node in individual_scans
+        if node["Relation Name"] == "individual_variant"
+    )
+    assert not any(
+        node.get("Subplan Name", "").startswith("CTE") for node in nodes(plan["Plan"])
+    )
@@ -0,0 +1,242 @@
+import asyncio
+import datetime
+import json
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import Connection, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from cpvt_database_models.cache import KVCache
+from cpvt_database_models.cache.codec import Codec
+
+
+@pytest_asyncio.fixture()
+async def cache(get_engine: AsyncEngine) -> KVCache:
+    def _add_models(_conn: Connection):
+        from cpvt_database_models.database import BaseBase
+        from cpvt_database_models.models import load_models
+
+        load_models()
+
+        _conn.execute(text("CREATE SCHEMA IF NOT EXISTS uta;"))
+        BaseBase.metadata.create_all(_conn)
+
+    async with get_engine.begin() as conn:
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS citext;"))
+        await conn.run_sync(_add_models)
+        await conn.execute(text("DELETE FROM kv_store"))
+
+    yield KVCache(get_engine)
+
+
+async def test_get_set(cache: KVCache):
+    assert await cache.get("missing") is None
+    assert await cache.get("missing", "default") == "default"
+
+    await cache.set("a", {"value": 1})
+    await cache.mset({"b": [1, 2], "c": None})
+    await cache.set("a", {"value": 2})
+
+    assert await cache.get("a") == {"value": 2}
+    assert await cache.mget(["a", "b", "c", "missing"]) == {
+        "a": {"value": 2},
+        "b": [1, 2],
+        "c": None,
+    }
+
+    await cache.delete("a", "b")
+    assert await cache.mget(["a", "b", "c"]) == {"c": None}
+
+    # keys are namespaced by the prefix
+    async with cache.engine.connect() as conn:
+        keys = (await conn.execute(text("SELECT key FROM kv_store"))).scalars().all()
+
+    assert keys == ["cache:c"]
+
+
+async def test_ttl(cache: KVCache):
+    await cache.set("expired", 1, ttl=-1)
+    await cache.set("expires", 1, ttl=datetime.timedelta(hours=1))
+    await cache.set("forever", 1)
+
+    assert await cache.mget(["expired", "expires", "forever"]) == {
+        "expires": 1,
+        "forever": 1,
+    }
+
+
+async def test_get_or_compute_single_flight(cache: KVCache):
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.2)
+        return {"computed": calls}
+
+    values = await asyncio.gather(
+        *[cache.get_or_compute("cold", compute, ttl=60) for _ in range(4)]
+    )
+
+    assert calls == 1
+    assert values == [{"computed": 1}] * 4
+
+
+async def test_sweep(cache: KVCache, get_engine: AsyncEngine):
+    async with get_engine.begin() as conn:
+        await conn.execute(
+            text(
+                """
+                INSERT INTO kv_store (key, value, updated_at, expires_at)
+                VALUES ('filters:variants', '[]', now() - interval '30 days', NULL),
+                       ('cache:expired', '1', now(), now() - interval '1 second'),
+                       ('cache:old', '1', now() - interval '2 days', NULL),
+                       ('cache:1', '1', now() - interval '3 hours', NULL),
+                       ('cache:2', '1', now() - interval '2 hours', NULL),
+                       ('cache:3', '1', now() - interval '1 hours', NULL)
+                """
+            )
+        )
+
+    assert await cache.sweep(max_age=datetime.timedelta(days=1), max_rows=2) == 3
+
+    async with get_engine.connect() as conn:
+        keys = (
+            (await conn.execute(text("SELECT key FROM kv_store ORDER BY key")))
+            .scalars()
+            .all()
+        )
+
+    # the least recently written cache entry is evicted, other keys are kept
+    assert keys == ["cache:2", "cache:3", "filters:variants"]
+
+
+async def test_sweep_max_rows_ties(cache: KVCache, get_engine: AsyncEngine):
+    # written in one transaction, so they all have the same updated_at
+    await cache.mset({"a": 1, "b": 2, "c": 3})
+
+    assert await cache.sweep(max_rows=2) == 1
+    assert await cache.mget(["a", "b", "c"]) == {"b": 2, "c": 3}
+
+
+def test_lru_cache():
+    from cpvt_database_models.cache import LRUCache
+
+    lru = LRUCache(max_bytes=10)
+    lru.put("a", 1, size=4)
+    lru.put("b", 2, size=4)
+    assert lru.get("a") == 1
+
+    # b is the least recently used
+    lru.put("c", 3, size=4)
+    assert "b" not in lru
+    assert lru.nbytes == 8
+
+    lru.put("big", 4, size=11)
+    assert "big" not in lru
+
+    lru.put("expired", 5, size=1, ttl=-1)
+    assert lru.get("expired") is None
+    assert lru.nbytes == 8
+
+
+async def test_tiered_cache_invalidation(cache: KVCache, get_engine: AsyncEngine):
+    from cpvt_database_models.cache import LRUCache, TieredKVCache
+
+    tiered = TieredKVCache(get_engine, l1=LRUCache(max_bytes=1024), binary_threshold=32)
+    listener = asyncio.create_task(tiered.listen())
+
+    try:
+        await asyncio.wait_for(tiered.listening.wait(), timeout=5)
+
+        await cache.set("filters", {"value": 1})
+        assert await tiered.get("filters") == {"value": 1}
+        assert tiered.l1.get("filters") == {"value": 1}
+
+        # another process writes the key
+        await cache.set("filters", {"value": 2})
+
+        for _ in range(50):
+            if "filters" not in tiered.l1:
+                break
+
+            await asyncio.sleep(0.1)
+
+        assert await tiered.get("filters") == {"value": 2}
+
+        # its own writes stay cached
+        await tiered.set("own", [1])
+        await asyncio.sleep(0.2)
+        assert tiered.l1.get("own") == [1]
+
+        # sized by the JSON that was stored, compressed above binary_threshold
+        nbytes = tiered.l1.nbytes
+        large = {"variants": list(range(20))}
+        await tiered.set("large", large)
+        assert tiered.l1.nbytes - nbytes == len(
+            json.dumps(large, separators=(",", ":"))
+        )
+
+        async with get_engine.connect() as conn:
+            assert (
+                await conn.execute(
+                    text(
+                        "SELECT value_bytes IS NOT NULL FROM kv_store "
+                        "WHERE key = 'cache:large'"
+                    )
+                )
+            ).scalar()
+    finally:
+        listener.cancel()
+        await asyncio.gather(listener, return_exceptions=True)
+
+    assert not tiered.listening.is_set()
+    assert len(tiered.l1) == 0
+
+
+@pytest.mark.parametrize("codec", [Codec.NONE, Codec.ZLIB])
+def test_codec(codec: Codec):
+    from cpvt_database_models.cache import codec as value_codec
+
+    json_bytes = value_codec.dumps_json({"variants": list(range(100))})
+    data = value_codec.encode(json_bytes, codec)
+
+    assert data[:2] == bytes([value_codec.FORMAT_VERSION, codec])
+    assert value_codec.decode(data) == json_bytes
+
+    with pytest.raises(ValueError):
+        value_codec.decode(bytes([0]) + data[1:])
+
+
+async def test_binary_values(cache: KVCache, get_engine: AsyncEngine):
+    binary_cache = KVCache(get_engine, binary_threshold=100)
+    page = {"variants": [{"variant_id": i} for i in range(100)]}
+
+    await binary_cache.mset({"page": page, "small": {"a": 1}})
+
+    async with get_engine.connect() as conn:
+        stored = dict(
+            (
+                await conn.execute(
+                    text(
+                        "SELECT key, value IS NULL AND value_bytes IS NOT NULL "
+                        "FROM kv_store"
+                    )
+                )
+            ).all()
+        )
+
+    assert stored == {"cache:page": True, "cache:small": False}
+
+    assert await binary_cache.mget(["page", "small"]) == {
+        "page": page,
+        "small": {"a": 1},
+    }
+    assert json.loads(await binary_cache.get_json("page")) == page
+    assert json.loads(await binary_cache.get_json("small")) == {"a": 1}
+    assert await binary_cache.get_json("missing") is None
+
+    # shrinking a value stores it as JSONB again
+    await binary_cache.set("page", {"variants": []})
+    assert await cache.get("page") == {"variants": []}
@@ -0,0 +1,65 @@
+"""
+The add_views and add_filters entry points, on committed tables.
+"""
+
+import json
+
+from sqlalchemy import Connection, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from cpvt_database_models.filters import add_filters
+from cpvt_database_models.models.kv_store import VIEWS_VERSION_KEY
+from cpvt_database_models.models.views import add_views
+
+
+async def test_main_reports(get_engine: AsyncEngine, monkeypatch, tmp_path):
+    def _add_models(_conn: Connection):
+        from cpvt_database_models.database import BaseBase
+        from cpvt_database_models.models import load_models
+
+        load_models()
+
+        _conn.execute(text("CREATE SCHEMA IF NOT EXISTS uta;"))
+        BaseBase.metadata.create_all(_conn)
+
+    async with get_engine.begin() as conn:
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS citext;"))
+        await conn.run_sync(_add_models)
+
+    monkeypatch.setattr(add_views, "get_async_engine", lambda: get_engine)
+    monkeypatch.setattr(add_filters, "get_async_engine", lambda: get_engine)
+
+    views_report = tmp_path / "views.json"
+    filters_report = tmp_path / "filters.json"
+
+    await add_views.add_views_main(report_path=str(views_report))
+    await add_filters.add_filters_main(report_path=str(filters_report))
+
+    for report_path in (views_report, filters_report):
+        report = json.loads(report_path.read_text())
+
+        assert report["server_version"]
+        assert report["statements"]
+
+    # the builds were committed
+    async with get_engine.connect() as conn:
+        keys = (
+            (
+                await conn.execute(
+                    text(
+                        "SELECT key FROM kv_store WHERE key LIKE 'filters:%' ORDER BY key"
+                    )
+                )
+            )
+            .scalars()
+            .all()
+        )
+        views_version = (
+            await conn.execute(
+                text("SELECT updated_at FROM kv_store WHERE key = :key"),
+                {"key": VIEWS_VERSION_KEY},
+            )
+        ).scalar()
+
+    assert keys == ["filters:individuals", "filters:proteins", "filters:variants"]
+    assert views_version is not None
@@ -0,0 +1,164 @@
+import pytest
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from cpvt_database_models.models import (
+    EditType,
+    SequenceVariantDb,
+    edit_type_ids,
+)
+
+_batch = [
+    "NC_000001.11:g.1234del",
+    {
+        "g": "NC_000001.11:g.1234del",
+        "c": "NM_001035.3(RYR2):c.14876G>A",
+        "p": "NP_003997.1:p.Trp24Ter",
+        "sequence_variant_id": 10,
+    },
+    "not an hgvs string",
+    {"c": "NP_003997.1:p.Trp24Ter"},
+    {},
+]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_from_hgvs_batch(workers: int):
+    result = SequenceVariantDb.from_hgvs_batch(_batch, workers=workers)
+
+    assert len(result.rows) == 2
+    assert [error.row_index for error in result.errors] == [2, 3, 4]
+
+    genomic, combined = result.rows
+
+    assert genomic["g_hgvs_string"] == "NC_000001.11:g.1234del"
+    assert "c_hgvs_string" not in genomic
+    assert combined["sequence_variant_id"] == 10
+    assert combined["c_hgvs_string"] == "NM_001035.3(RYR2):c.14876G>A"
+    assert combined["p_hgvs_string"] == "NP_003997.1:p.Trp24Ter"
+
+
+async def test_from_hgvs_batch_insert(session: AsyncSession):
+    session.add_all(
+        [
+            EditType(edit_type_id=edit_type_id, name=edit_type)
+            for edit_type, edit_type_id in edit_type_ids().items()
+        ]
+    )
+    await session.flush()
+
+    result = SequenceVariantDb.from_hgvs_batch(_batch, workers=1)
+    await session.execute(insert(SequenceVariantDb), result.rows)
+
+    inserted = (await session.execute(select(SequenceVariantDb))).scalars().all()
+
+    assert len(inserted) == len(result.rows)
+
+
+def test_sequence_variant_parse_cache():
+    from cpvt_database_models.models.variants.hgvs_variant import (
+        clear_parse_cache,
+        configure_parse_cache,
+        parse_cache_info,
+    )
+    from cpvt_database_models.models.variants.hgvs_variant.parse_cache import (
+        DEFAULT_PARSE_CACHE_SIZE,
+    )
+
+    clear_parse_cache()
+    sv = SequenceVariantDb(p_hgvs_string="NP_003997.1:p.Trp24Ter")
+
+    first = sv.sequence_variant(sv_type="p")
+    second = sv.sequence_variant(sv_type="p")
+
+    assert first == second
+    assert parse_cache_info().hits == 1
+    assert parse_cache_info().misses == 1
+
+    # every caller gets its own copy of the cached variant
+    assert first is not second
+    first.ac = "NP_000000.1"
+    assert sv.sequence_variant(sv_type="p").ac == "NP_003997.1"
+
+    # opt out per call and globally
+    assert sv.sequence_variant(sv_type="p", use_cache=False) is not first
+
+    configure_parse_cache(enabled=False)
+    try:
+        assert sv.sequence_variant(sv_type="p") is not first
+    finally:
+        configure_parse_cache(enabled=True)
+
+    configure_parse_cache(maxsize=1)
+    try:
+        assert parse_cache_info().maxsize == 1
+        assert parse_cache_info().currsize == 0
+    finally:
+        configure_parse_cache(maxsize=DEFAULT_PARSE_CACHE_SIZE)
+
+
+@pytest.mark.parametrize(
+    ["posedit_aa3", "posedit_aa1"],
+    [
+        ("Trp24Ter", "W24*"),
+        ("Arg33GlnfsTer12", "R33Qfs*12"),
+        ("Met1ext-5", "M1ext-5"),
+        ("Arg12_Gly14delinsTrpVal", "R12_G14delinsWV"),
+        ("Sec12Xaa", "U12X"),
+        ("=", "="),
+    ],
+)
+def test_posedit_aa3_to_aa1(posedit_aa3: str, posedit_aa1: str):
+    from cpvt_database_models.models.variants.hgvs_variant import (
+        posedit_aa3_to_aa1,
+    )
+
+    assert posedit_aa3_to_aa1(posedit_aa3) == posedit_aa1
+
+
+def test_posedit_aa3_to_aa1_invalid():
+    from cpvt_database_models.models.variants.hgvs_variant import (
+        posedit_aa3_to_aa1,
+    )
+
+    with pytest.raises(ValueError):
+        posedit_aa3_to_aa1("Foo12Ter")
+
+
+async def test_protein_consequence_bulk_from_db(session: AsyncSession):
+    from cpvt_database_models.models import ProteinConsequence
+
+    session.add_all(
+        [
+            EditType(edit_type_id=edit_type_id, name=edit_type)
+            for edit_type, edit_type_id in edit_type_ids().items()
+        ]
+    )
+    await session.flush()
+
+    result = SequenceVariantDb.from_hgvs_batch(
+        [
+            {"p": "NP_003997.1:p.Trp24Ter", "sequence_variant_id": 1},
+            {"p": "NP_003997.1:p.Arg33fs", "sequence_variant_id": 2},
+            {"p": "NP_003997.1:p.(Arg12del)", "sequence_variant_id": 3},
+            {"c": "NM_001035.3(RYR2):c.14876G>A", "sequence_variant_id": 4},
+        ],
+        workers=1,
+    )
+    await session.execute(insert(SequenceVariantDb), result.rows)
+
+    assert await ProteinConsequence.bulk_from_db(session, batch_size=2) == 3
+
+    consequences = {
+        pc.protein_consequence_id: (pc.posedit_aa3, pc.posedit_aa1)
+        for pc in (await session.execute(select(ProteinConsequence))).scalars()
+    }
+
+    assert consequences == {
+        1: ("Trp24Ter", "W24*"),
+        2: ("Arg33fsTer", "R33fs*"),
+        3: ("Arg12del", "R12del"),
+    }
+
+    # running it again updates in place
+    assert await ProteinConsequence.bulk_from_db(session) == 3
@@ -0,0 +1,102 @@
+import multiprocessing
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import ometa.grammar
+import pytest
+
+from cpvt_database_models.models.variants.hgvs_variant import typed_grammar
+
+
+def _label(grammar, variant_no_accn: str) -> str:
+    return grammar(variant_no_accn).typed_posedit()[1]
+
+
+def _grammar_source() -> str:
+    with open(typed_grammar.GRAMMAR_FILE) as f:
+        return f.read()
+
+
+def test_get_typed_grammar(monkeypatch, tmp_path):
+    grammar = typed_grammar.get_typed_grammar()
+
+    assert typed_grammar.get_typed_grammar() is grammar
+    assert _label(grammar, "c.1234del") == "Deletion"
+    assert _label(grammar, "p.Arg33fs") == "Frameshift"
+
+    # compiled once, however many threads ask for it at the same time
+    monkeypatch.setattr(typed_grammar, "_typed_grammar", None)
+    make_typed_grammar = typed_grammar._make_typed_grammar
+    calls = []
+    barrier = threading.Barrier(8)
+
+    def _make_typed_grammar(cache_dir):
+        calls.append(cache_dir)
+        return make_typed_grammar(cache_dir)
+
+    def _get_typed_grammar(_):
+        barrier.wait()
+        return typed_grammar.get_typed_grammar(str(tmp_path))
+
+    monkeypatch.setattr(typed_grammar, "_make_typed_grammar", _make_typed_grammar)
+
+    with ThreadPoolExecutor(8) as executor:
+        grammars = list(executor.map(_get_typed_grammar, range(8)))
+
+    assert calls == [str(tmp_path)]
+    assert all(g is grammars[0] for g in grammars)
+    assert _label(grammars[0], "c.1234del") == "Deletion"
+
+
+def test_typed_grammar_cache(monkeypatch, tmp_path, capsys):
+    source = _grammar_source()
+    cache_dir = tmp_path / "grammar"
+
+    code = typed_grammar._parser_code(source, str(cache_dir))
+    (cache_path,) = cache_dir.iterdir()
+
+    # the next processes load the bytecode without parsing the grammar
+    def _no_parse(*args, **kwargs):
+        raise AssertionError("The grammar should not be parsed")
+
+    with monkeypatch.context() as m:
+        m.setattr(ometa.grammar, "OMeta", _no_parse)
+
+        assert typed_grammar._parser_code(source, str(cache_dir)) == code
+
+    # a corrupt cache is compiled again
+    cache_path.write_bytes(b"not bytecode")
+    assert typed_grammar._parser_code(source, str(cache_dir)) == code
+
+    # the cache is only an optimization
+    not_a_dir = tmp_path / "file"
+    not_a_dir.write_text("")
+    assert typed_grammar._parser_code(source, str(not_a_dir)) == code
+    assert "Could not cache the compiled grammar" in capsys.readouterr().out
+
+    # a failed write leaves no part file behind
+    def _disk_full(*args):
+        raise OSError("No space left on device")
+
+    cache_path.unlink()
+    monkeypatch.setattr(typed_grammar.marshal, "dump", _disk_full)
+
+    assert typed_grammar._parser_code(source, str(cache_dir)) == code
+    assert list(cache_dir.iterdir()) == []
+
+
+def _child_grammar() -> tuple[bool, str]:
+    inherited = typed_grammar._typed_grammar is not None
+
+    return inherited, _label(typed_grammar.get_typed_grammar(), "c.1234del")
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(),
+    reason="fork is not available",
+)
+def test_warm_up_typed_grammar_fork():
+    typed_grammar.warm_up_typed_grammar()
+
+    with multiprocessing.get_context("fork").Pool(1) as pool:
+        assert pool.apply(_child_grammar) == (True, "Deletion")
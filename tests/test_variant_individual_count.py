@@ -0,0 +1,111 @@
+from sqlalchemy import delete, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from cpvt_database_models.models import (
+    Individual,
+    IndividualVariant,
+    Variant,
+    VariantIndividualCount,
+)
+
+
+async def _counts(session: AsyncSession) -> dict[int, int]:
+    rows = await session.execute(
+        select(
+            VariantIndividualCount.variant_id, VariantIndividualCount.num_individuals
+        )
+    )
+
+    return {variant_id: count for variant_id, count in rows}
+
+
+async def _aggregate(session: AsyncSession) -> dict[int, int]:
+    """
+    What variant_num_individuals_v used to compute.
+    """
+    rows = await session.execute(
+        text(
+            """
+            SELECT variant.variant_id, COUNT(DISTINCT individual_id)
+            FROM variant
+                     LEFT JOIN individual_variant
+                               ON variant.variant_id = individual_variant.variant_id
+            GROUP BY variant.variant_id
+            """
+        )
+    )
+
+    return {variant_id: count for variant_id, count in rows}
+
+
+async def test_variant_individual_count(session: AsyncSession):
+    session.add_all(
+        [
+            Variant(variant_id=1, hgvs_string="NM_001035.3(RYR2):c.1A>G"),
+            Variant(variant_id=2, hgvs_string="NM_001035.3(RYR2):c.2A>G"),
+            Variant(variant_id=3, hgvs_string="NM_001035.3(RYR2):c.3A>G"),
+            *[Individual(individual_id=i) for i in range(1, 5)],
+        ]
+    )
+    await session.flush()
+
+    assert await _counts(session) == {1: 0, 2: 0, 3: 0}
+
+    session.add_all(
+        [
+            IndividualVariant(individual_id=1, variant_id=1),
+            IndividualVariant(individual_id=2, variant_id=1),
+            IndividualVariant(individual_id=3, variant_id=1),
+            IndividualVariant(individual_id=3, variant_id=2),
+        ]
+    )
+    await session.flush()
+
+    assert await _counts(session) == {1: 3, 2: 1, 3: 0}
+
+    # moving individuals between variants
+    await session.execute(
+        update(IndividualVariant)
+        .where(IndividualVariant.individual_id.in_([1, 2]))
+        .values(variant_id=3)
+    )
+    await session.execute(
+        delete(IndividualVariant).where(IndividualVariant.variant_id == 2)
+    )
+
+    assert await _counts(session) == {1: 1, 2: 0, 3: 2}
+    assert await _counts(session) == await _aggregate(session)
+
+    await session.execute(
+        delete(IndividualVariant).where(IndividualVariant.variant_id == 3)
+    )
+    await session.execute(delete(Variant).where(Variant.variant_id == 3))
+
+    assert await _counts(session) == {1: 1, 2: 0}
+
+    await session.execute(text("TRUNCATE individual_variant CASCADE"))
+
+    assert await _counts(session) == {1: 0, 2: 0}
+    assert await _counts(session) == await _aggregate(session)
+
+
+async def test_variant_num_individuals_v(view_session: AsyncSession):
+    view_session.add_all(
+        [
+            Variant(variant_id=1, hgvs_string="NM_001035.3(RYR2):c.1A>G"),
+            Variant(variant_id=2, hgvs_string="NM_001035.3(RYR2):c.2A>G"),
+            Individual(individual_id=1),
+        ]
+    )
+    await view_session.flush()
+    view_session.add(IndividualVariant(individual_id=1, variant_id=2))
+    await view_session.flush()
+
+    rows = await view_session.execute(
+        text(
+            "SELECT variant_id, num_individuals "
+            "FROM variant_num_individuals_v ORDER BY variant_id"
+        )
+    )
+
+    assert rows.all() == [(1, 0), (2, 1)]